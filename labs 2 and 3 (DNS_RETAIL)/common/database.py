@@ -0,0 +1,127 @@
+# database.py — общая фабрика движков SQLAlchemy для API (lab2) и ETL (lab3).
+# Настройки берутся из окружения:
+#   DATABASE_URL          основная база (по умолчанию локальный SQL Server)
+#   DATABASE_REPLICA_URL  реплика для чтения (по умолчанию — основная база)
+#   DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_ECHO
+import os
+import threading
+import time
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+DEFAULT_DATABASE_URL = (
+    "mssql+pyodbc://@MSI\\SQLEXPRESS/DNS_RETAIL"
+    "?driver=ODBC+Driver+17+for+SQL+Server"
+    "&trusted_connection=yes"
+    "&TrustServerCertificate=yes"
+)
+
+DATABASE_URL = os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
+REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+
+# Асинхронный драйвер для того же сервера
+ASYNC_DRIVERS = {
+    "mssql+pyodbc": "mssql+aioodbc",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg"
+}
+
+
+def env_bool(name, default):
+    value = os.getenv(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_settings():
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", False)
+    }
+
+
+class PoolStats:
+    """Сколько раз брали соединение из пула и сколько ждали."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, seconds, timeout=False):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += timeout
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def as_dict(self):
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3)
+        }
+
+
+def timed_pool(base):
+    # Свой класс на каждый движок: Pool.recreate() после dispose() сохранит ту же статистику
+    class TimedPool(base):
+        stats = PoolStats()
+
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                self.stats.record(time.perf_counter() - start, timeout=True)
+                raise
+            self.stats.record(time.perf_counter() - start)
+            return connection
+
+    return TimedPool
+
+
+def engine_options(url, pool_class, **overrides):
+    options = {"echo": env_bool("DB_ECHO", False)}
+    url = make_url(url)
+    # In-memory SQLite живёт в одном соединении, пул ему не настраивается
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(pool_settings(), poolclass=timed_pool(pool_class))
+    options.update(overrides)
+    return options
+
+
+def make_engine(url=None, **overrides):
+    url = url or DATABASE_URL
+    return create_engine(url, **engine_options(url, QueuePool, **overrides))
+
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def make_async_engine(url=None, **overrides):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_url(url or DATABASE_URL)
+    return create_async_engine(url, **engine_options(url, AsyncAdaptedQueuePool, **overrides))
+
+
+def pool_status(engine):
+    pool = getattr(engine, "sync_engine", engine).pool
+    status = {"pool": type(pool).__bases__[0].__name__ if hasattr(pool, "stats") else type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if hasattr(pool, "stats"):
+        status.update(pool.stats.as_dict())
+    return status
@@ -0,0 +1,6 @@
+# keys.py — натуральные ключи, общие для API (lab2), ETL (lab3) и миграций
+
+
+def name_key(name):
+    """Название без учёта регистра и лишних пробелов: "Ноутбук  Модель 1" и "ноутбук модель 1" — один товар."""
+    return " ".join(name.split()).casefold()
@@ -0,0 +1,431 @@
+# migrations.py — версии схемы DNS_RETAIL, общие для API (lab2) и ETL (lab3).
+# upgrade(engine) применяет по порядку версии, которых ещё нет в SchemaVersion; каждая
+# версия идёт в своей транзакции вместе с записью о ней. Таблицы здесь описаны так, как их
+# создаёт версия 1, и дальше не меняются: новые колонки и индексы — только новой версией.
+# Из каталога "labs 2 and 3":
+#   python -m common.migrations [status] [--url URL]
+import argparse
+import logging
+from datetime import datetime
+from sqlalchemy import (Column, Date, DateTime, DECIMAL, ForeignKey, Index, Integer, MetaData, String, Table,
+                        bindparam, delete, exc, func, inspect, insert, select, text, update)
+from common.keys import name_key
+
+metadata = MetaData()
+
+Table("ProductCategory", metadata,
+      Column("CategoryID", Integer, primary_key=True),
+      Column("Name", String(100), nullable=False))
+
+Table("EmployeePosition", metadata,
+      Column("PositionID", Integer, primary_key=True),
+      Column("Name", String(100), nullable=False))
+
+Table("Store", metadata,
+      Column("StoreID", Integer, primary_key=True),
+      Column("Name", String(100), nullable=False),
+      Column("Address", String(255), nullable=False))
+
+Table("Employee", metadata,
+      Column("EmployeeID", Integer, primary_key=True),
+      Column("FullName", String(150), nullable=False),
+      Column("PositionID", Integer, ForeignKey("EmployeePosition.PositionID")),
+      Column("StoreID", Integer, ForeignKey("Store.StoreID")))
+
+Table("Customer", metadata,
+      Column("CustomerID", Integer, primary_key=True),
+      Column("FullName", String(150)),
+      Column("Phone", String(20)))
+
+Table("Product", metadata,
+      Column("ProductID", Integer, primary_key=True),
+      Column("Name", String(150), nullable=False),
+      Column("Price", DECIMAL(10, 2), nullable=False),
+      Column("CategoryID", Integer, ForeignKey("ProductCategory.CategoryID")))
+
+Table("Sale", metadata,
+      Column("SaleID", Integer, primary_key=True),
+      Column("SaleDate", DateTime, nullable=False),
+      Column("StoreID", Integer, ForeignKey("Store.StoreID")),
+      Column("EmployeeID", Integer, ForeignKey("Employee.EmployeeID")),
+      Column("CustomerID", Integer, ForeignKey("Customer.CustomerID")))
+
+Table("SaleItem", metadata,
+      Column("SaleItemID", Integer, primary_key=True),
+      Column("SaleID", Integer, ForeignKey("Sale.SaleID")),
+      Column("ProductID", Integer, ForeignKey("Product.ProductID")),
+      Column("Quantity", Integer, nullable=False),
+      Column("Price", DECIMAL(10, 2), nullable=False))
+
+Table("Supplier", metadata,
+      Column("SupplierID", Integer, primary_key=True),
+      Column("Name", String(150), nullable=False))
+
+Table("Supply", metadata,
+      Column("SupplyID", Integer, primary_key=True),
+      Column("SupplierID", Integer, ForeignKey("Supplier.SupplierID")),
+      Column("ProductID", Integer, ForeignKey("Product.ProductID")),
+      Column("SupplyDate", Date, nullable=False),
+      Column("Quantity", Integer, nullable=False))
+
+Table("Inventory", metadata,
+      Column("InventoryID", Integer, primary_key=True),
+      Column("StoreID", Integer, ForeignKey("Store.StoreID")),
+      Column("ProductID", Integer, ForeignKey("Product.ProductID")),
+      Column("Quantity", Integer, nullable=False))
+
+# Агрегаты продаж lab2/rollup.py
+Table("SalesDailyStore", metadata,
+      Column("SaleDay", Date, primary_key=True),
+      Column("StoreID", Integer, primary_key=True),
+      Column("Revenue", DECIMAL(14, 2), nullable=False),
+      Column("Units", Integer, nullable=False),
+      Column("Receipts", Integer, nullable=False))
+
+Table("SalesDailyCategory", metadata,
+      Column("SaleDay", Date, primary_key=True),
+      Column("StoreID", Integer, primary_key=True),
+      Column("CategoryID", Integer, primary_key=True),
+      Column("Revenue", DECIMAL(14, 2), nullable=False),
+      Column("Units", Integer, nullable=False))
+
+# Журнал загрузок lab3/etl/ledger.py
+Table("ImportFile", metadata,
+      Column("FileHash", String(64), primary_key=True),
+      Column("FileName", String(255)),
+      Column("ChunkSize", Integer),
+      Column("Writers", Integer),
+      Column("Status", String(20)),
+      Column("StartedAt", DateTime),
+      Column("FinishedAt", DateTime))
+
+Table("ImportChunk", metadata,
+      Column("FileHash", String(64), ForeignKey("ImportFile.FileHash"), primary_key=True),
+      Column("ChunkNumber", Integer, primary_key=True),
+      Column("Part", Integer, primary_key=True),
+      Column("RowsHash", String(64)),
+      Column("Rows", Integer),
+      Column("LoadedAt", DateTime))
+
+# Колонки, добавленные версией 4; в описании таблицы — только то, что нужно миграции
+product_name_key = Table("Product", MetaData(),
+                         Column("ProductID", Integer, primary_key=True),
+                         Column("Name", String(150), nullable=False),
+                         Column("NameKey", String(300)),
+                         Column("CategoryID", Integer))
+
+schema_version = Table("SchemaVersion", MetaData(),
+                       Column("Version", Integer, primary_key=True),
+                       Column("Name", String(100), nullable=False),
+                       Column("AppliedAt", DateTime, nullable=False))
+
+# Индексы, которые create_all делал по index=True в lab2/models.py: на первичных ключах
+# они дублируют сам ключ, на внешних ключах их заменяют индексы версии 2
+OLD_INDEXES = {
+    "ProductCategory": ["CategoryID"],
+    "EmployeePosition": ["PositionID"],
+    "Store": ["StoreID"],
+    "Employee": ["EmployeeID", "PositionID", "StoreID"],
+    "Customer": ["CustomerID"],
+    "Product": ["ProductID", "CategoryID"],
+    "Sale": ["SaleID", "SaleDate", "StoreID", "EmployeeID", "CustomerID"],
+    "SaleItem": ["SaleItemID", "SaleID", "ProductID"],
+    "Supplier": ["SupplierID"],
+    "Supply": ["SupplyID", "SupplierID", "ProductID", "SupplyDate"],
+    "Inventory": ["InventoryID", "StoreID", "ProductID"]
+}
+
+# (имя, таблица, колонки); колонки после ключа поиска делают индекс покрывающим
+INDEXES = [
+    # Позиции чека и пересчёт агрегатов читают только индекс
+    ("IX_SaleItem_Sale", "SaleItem", ["SaleID", "ProductID", "Quantity", "Price"]),
+    ("IX_SaleItem_Product", "SaleItem", ["ProductID"]),
+    # Продажи магазина за период; фильтр только по дате — второй индекс
+    ("IX_Sale_Store_Date", "Sale", ["StoreID", "SaleDate"]),
+    ("IX_Sale_Date", "Sale", ["SaleDate"]),
+    ("IX_Sale_Employee", "Sale", ["EmployeeID"]),
+    ("IX_Sale_Customer", "Sale", ["CustomerID"]),
+    ("IX_Supply_Product_Date", "Supply", ["ProductID", "SupplyDate"]),
+    ("IX_Supply_Supplier", "Supply", ["SupplierID"]),
+    ("IX_Supply_Date", "Supply", ["SupplyDate"]),
+    ("IX_Inventory_Product", "Inventory", ["ProductID"]),
+    ("IX_Product_Category", "Product", ["CategoryID"]),
+    ("IX_Employee_Store", "Employee", ["StoreID"]),
+    ("IX_Employee_Position", "Employee", ["PositionID"])
+]
+
+# Натуральные ключи: на них опираются справочники ETL (вставка с повтором при
+# IntegrityError), ON CONFLICT / MERGE остатков и списание в lab2/stock.py.
+# Порядок важен: слияние категорий и магазинов порождает дубли товаров и остатков.
+UNIQUE_KEYS = [
+    ("UQ_ProductCategory_Name", "ProductCategory", ["Name"]),
+    ("UQ_Store_Name", "Store", ["Name"]),
+    ("UQ_Supplier_Name", "Supplier", ["Name"]),
+    ("UQ_Product_Name_Category", "Product", ["Name", "CategoryID"]),
+    ("UQ_Inventory_Store_Product", "Inventory", ["StoreID", "ProductID"])
+]
+
+# Таблицы, где при слиянии строк с одним ключом количества складываются: (ключ, суммы)
+SUMS = {
+    "Inventory": (["StoreID", "ProductID"], ["Quantity"]),
+    "SalesDailyStore": (["SaleDay", "StoreID"], ["Revenue", "Units", "Receipts"]),
+    "SalesDailyCategory": (["SaleDay", "StoreID", "CategoryID"], ["Revenue", "Units"])
+}
+
+# Ссылки без внешнего ключа: агрегаты lab2/rollup.py
+ROLLUP_REFERENCES = {
+    "Store": [("SalesDailyStore", "StoreID"), ("SalesDailyCategory", "StoreID")],
+    "ProductCategory": [("SalesDailyCategory", "CategoryID")]
+}
+
+# Сколько конфликтующих ключей показывать в ошибке миграции
+SHOWN_DUPLICATES = 10
+
+
+def table_of(table):
+    # Имя таблицы версии 1 или описание с колонками более поздней версии
+    return metadata.tables[table] if isinstance(table, str) else table
+
+
+def index(name, table, columns, unique=False):
+    table = table_of(table)
+    created = Index(name, *(table.c[column] for column in columns), unique=unique)
+    # Index по колонкам прикрепляется к таблице, и create_tables на другой базе в том же
+    # процессе создал бы его в версии 1 — раньше слияния дублей
+    table.indexes.discard(created)
+    return created
+
+
+def existing_keys(connection, table):
+    """Имена индексов и уникальных ограничений таблицы и списки их колонок."""
+    inspector = inspect(connection)
+    keys = inspector.get_indexes(table) + inspector.get_unique_constraints(table)
+    return {key["name"] for key in keys}, [key["column_names"] for key in keys if key.get("unique", True)]
+
+
+def create_tables(connection):
+    # Таблицы, уже созданные create_all или скриптом lab1, не трогаются
+    metadata.create_all(connection, checkfirst=True)
+
+
+def create_indexes(connection):
+    for table, columns in OLD_INDEXES.items():
+        names, _ = existing_keys(connection, table)
+        for column in columns:
+            name = f"ix_{table}_{column}"
+            if name in names:
+                index(name, table, [column]).drop(connection)
+    for name, table, columns in INDEXES:
+        if name not in existing_keys(connection, table)[0]:
+            index(name, table, columns).create(connection)
+
+
+def duplicate_ids(connection, table, columns):
+    """{ID дубля: ID остающейся строки} — остаётся строка с меньшим ID, NULL равен NULL."""
+    table = table_of(table)
+    key = table.primary_key.columns[0]
+    keys = [table.c[column] for column in columns]
+    moved = {}
+    previous, survivor = None, None
+    # Сортировка по ключу ставит дубли рядом: в памяти только найденные дубли
+    for id_, *values in connection.execute(select(key, *keys).order_by(*keys, key)):
+        if values == previous:
+            moved[id_] = survivor
+        else:
+            previous, survivor = values, id_
+    return moved
+
+
+def repoint(connection, table, column, moved):
+    table = metadata.tables[table]
+    connection.execute(
+        update(table).where(table.c[column] == bindparam("old")).values({column: bindparam("new")}),
+        [{"old": old, "new": new} for old, new in moved.items()]
+    )
+
+
+def fold(connection, table, column, moved):
+    # Уникальный ключ таблицы-суммы включает column: строку дубля прибавляем к строке остающегося
+    table = metadata.tables[table]
+    keys, sums = SUMS[table.name]
+    for old, new in moved.items():
+        for row in connection.execute(select(table).where(table.c[column] == old)).mappings().all():
+            target = [table.c[key] == (new if key == column else row[key]) for key in keys]
+            added = connection.execute(
+                update(table).where(*target).values({name: table.c[name] + row[name] for name in sums})
+            ).rowcount
+            this_row = [key == row[key.name] for key in table.primary_key.columns]
+            if added:
+                connection.execute(delete(table).where(*this_row))
+            else:
+                connection.execute(update(table).where(*this_row).values({column: new}))
+
+
+def merge_sums(connection, table):
+    """Строки с одним ключом в таблице-сумме сливаются в строку с меньшим ID."""
+    keys, sums = SUMS[table]
+    moved = duplicate_ids(connection, table, keys)
+    if not moved:
+        return 0
+    table = metadata.tables[table]
+    key = table.primary_key.columns[0]
+    totals = {}
+    for old, new in moved.items():
+        row = connection.execute(select(*(table.c[name] for name in sums)).where(key == old)).one()
+        totals[new] = [total + value for total, value in zip(totals.get(new, [0] * len(sums)), row)]
+    connection.execute(
+        update(table).where(key == bindparam("id")).values({name: table.c[name] + bindparam(name) for name in sums}),
+        [{"id": id_, **dict(zip(sums, values))} for id_, values in totals.items()]
+    )
+    connection.execute(delete(table).where(key == bindparam("id")), [{"id": id_} for id_ in moved])
+    return len(moved)
+
+
+def merge_duplicates(connection, table, columns):
+    """Сливает строки с одинаковым натуральным ключом; возвращает число удалённых строк."""
+    table = table_of(table)
+    if table.name in SUMS:
+        return merge_sums(connection, table.name)
+    moved = duplicate_ids(connection, table, columns)
+    if not moved:
+        return 0
+    for child in metadata.sorted_tables:
+        for foreign_key in child.foreign_keys:
+            if foreign_key.column.table.name != table.name:
+                continue
+            # Пока у остатков нет уникального ключа, дубли пар сливает merge_sums после
+            if child.name in SUMS and SUMS[child.name][0] in existing_keys(connection, child.name)[1]:
+                fold(connection, child.name, foreign_key.parent.name, moved)
+            else:
+                repoint(connection, child.name, foreign_key.parent.name, moved)
+    for child, column in ROLLUP_REFERENCES.get(table.name, []):
+        fold(connection, child, column, moved)
+    key = table.primary_key.columns[0]
+    connection.execute(delete(table).where(key == bindparam("id")), [{"id": id_} for id_ in moved])
+    return len(moved)
+
+
+def duplicates(connection, table, columns):
+    """Ключи, которые повторяются по правилам самой БД (регистр и NULL — как у индекса)."""
+    table = table_of(table)
+    keys = [table.c[column] for column in columns]
+    return connection.execute(
+        select(*keys, func.count()).group_by(*keys).having(func.count() > 1).limit(SHOWN_DUPLICATES)
+    ).all()
+
+
+def create_unique_key(connection, name, table, columns):
+    table_name = table_of(table).name
+    names, unique = existing_keys(connection, table_name)
+    if name in names or columns in unique:
+        return
+    # Старый загрузчик lab3 писал товары дважды: ссылки переводятся на оставшуюся строку
+    merged = merge_duplicates(connection, table, columns)
+    if merged:
+        logging.info(f"Миграция: {table_name}: слито дублей по {', '.join(columns)}: {merged}")
+    # Остаются дубли, которые БД считает равными, а Python нет (например, регистр в SQL Server)
+    conflicts = duplicates(connection, table, columns)
+    if conflicts:
+        shown = "; ".join(f"{tuple(row[:-1])} x{row[-1]}" for row in conflicts)
+        raise RuntimeError(
+            f"Нельзя создать {name}: в {table_name} повторяются ({', '.join(columns)}): {shown}. "
+            f"Слейте эти строки вручную и повторите миграцию"
+        )
+    index(name, table, columns, unique=True).create(connection)
+
+
+def create_unique_keys(connection):
+    for name, table, columns in UNIQUE_KEYS:
+        create_unique_key(connection, name, table, columns)
+
+
+def add_product_name_key(connection):
+    # Товар в ETL и API — это (название без регистра и лишних пробелов, категория), а
+    # UQ_Product_Name_Category сравнивал Name как есть: параллельные загрузки вставляли
+    # "Ноутбук  Модель 1" и "ноутбук модель 1". Ключ хранится в NameKey и уникален с категорией.
+    product = product_name_key
+    if "NameKey" not in {column["name"] for column in inspect(connection).get_columns("Product")}:
+        quote = connection.dialect.identifier_preparer.quote
+        column_type = product.c.NameKey.type.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {quote('Product')} ADD {quote('NameKey')} {column_type} NULL"))
+
+    # Правило то же, что у ETL и API (common/keys.py); если оно изменится — нужна новая версия
+    rows = connection.execute(select(product.c.ProductID, product.c.Name).where(product.c.NameKey.is_(None))).all()
+    if rows:
+        connection.execute(
+            update(product).where(product.c.ProductID == bindparam("id")).values(NameKey=bindparam("key")),
+            [{"id": id_, "key": name_key(name)} for id_, name in rows]
+        )
+    create_unique_key(connection, "UQ_Product_NameKey_Category", product, ["NameKey", "CategoryID"])
+
+    # Старый ключ следует из нового и только замедлял бы вставку товаров
+    if "UQ_Product_Name_Category" in {key["name"] for key in inspect(connection).get_indexes("Product")}:
+        index("UQ_Product_Name_Category", "Product", ["Name", "CategoryID"], unique=True).drop(connection)
+
+
+# Номер версии, название, функция(connection); номера только растут
+MIGRATIONS = [
+    (1, "base tables", create_tables),
+    (2, "foreign key and filter indexes", create_indexes),
+    (3, "unique natural keys", create_unique_keys),
+    (4, "product name key", add_product_name_key)
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def applied(engine):
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(schema_version.name):
+            return set()
+        return set(connection.scalars(select(schema_version.c.Version)))
+
+
+def upgrade(engine):
+    """Применяет недостающие версии; возвращает номера применённых этим вызовом."""
+    schema_version.create(engine, checkfirst=True)
+    done = applied(engine)
+    new = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            with engine.begin() as connection:
+                migrate(connection)
+                connection.execute(insert(schema_version).values(
+                    Version=version, Name=name, AppliedAt=datetime.now()
+                ))
+        except exc.DBAPIError:
+            # Параллельный процесс (другой воркер API или ETL) мог применить ту же версию
+            if version not in applied(engine):
+                raise
+            logging.info(f"Миграция {version} ({name}) уже применена другим процессом")
+            continue
+        logging.info(f"Миграция {version} ({name}) применена")
+        new.append(version)
+    return new
+
+
+def status(engine):
+    done = applied(engine)
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+
+def main():
+    from common.database import make_engine
+
+    parser = argparse.ArgumentParser(description="Миграции схемы DNS_RETAIL")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    parser.add_argument("--url", help="по умолчанию DATABASE_URL")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = make_engine(args.url)
+    if args.command == "upgrade":
+        upgrade(engine)
+    for version, name, done in status(engine):
+        print(f"{version:>3}  {'+' if done else '-'}  {name}")
+
+
+if __name__ == "__main__":
+    main()
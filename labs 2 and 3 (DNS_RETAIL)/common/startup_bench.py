@@ -0,0 +1,136 @@
+# Время запуска точек входа API (lab2) и ETL (lab3) по python -X importtime.
+# Из каталога "labs 2 and 3":
+#   python -m common.startup_bench [--repeat 5] [--output startup.json] [--baseline old.json --tolerance 0.25]
+# Каждая цель — новый интерпретатор в каталоге своей лабы, база — несуществующий файл SQLite
+# во временном каталоге. Код выхода 1, если цель импортирует запрещённый для неё модуль,
+# при импорте создаёт или меняет файлы (база, api.log, etl.log), падает или стала медленнее
+# --baseline больше чем на --tolerance.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Название: (каталог, аргументы python, окружение, модули, которых не должно быть в импортах)
+TARGETS = {
+    "python -c pass": (ROOT, ["-c", "pass"], {}, []),
+    "lab2: import main (sync)": ("lab2", ["-c", "import main"], {"API_MODE": "sync"}, ["matplotlib", "pandas"]),
+    "lab2: import main (async)": ("lab2", ["-c", "import main"], {"API_MODE": "async"}, ["matplotlib", "pandas"]),
+    "lab3: main.py --help": ("lab3", ["main.py", "--help"], {}, ["matplotlib", "pandas", "sqlalchemy"]),
+    "lab3: import main": ("lab3", ["-c", "import main"], {}, ["matplotlib", "pandas", "sqlalchemy"]),
+    # Сама загрузка: без неё ETL не работает, поэтому только для сравнения
+    "lab3: import etl.pipeline": ("lab3", ["-c", "import etl.pipeline"], {}, ["matplotlib"])
+}
+
+
+def parse_importtime(stderr):
+    """Строки "import time: self | cumulative | модуль" -> [(модуль, глубина, cumulative мкс)]."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(cumulative)))
+    return modules
+
+
+def files(directory):
+    # Только файлы верхнего уровня: __pycache__ и данные лабы не в счёт
+    return {
+        entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(directory) if entry.is_file()
+    }
+
+
+def run_target(name, workdir, repeat):
+    directory, arguments, env, forbidden = TARGETS[name]
+    directory = os.path.join(ROOT, directory)
+    environment = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        API_LOG_FILE=os.path.join(workdir, "api.log"),
+        PYTHONWARNINGS="ignore",
+        **env
+    )
+    before = files(directory), files(workdir)
+
+    walls, totals, problems, modules = [], [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=directory,
+                                 env=environment, capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if process.returncode:
+            problems.append(f"код выхода {process.returncode}: {process.stderr.strip().splitlines()[-1]}")
+            break
+        modules = parse_importtime(process.stderr)
+        totals.append(sum(cumulative for _, depth, cumulative in modules if depth == 0))
+
+    imported = {module for module, _, _ in modules}
+    problems += [f"импортирован {module}" for module in forbidden
+                 if any(name == module or name.startswith(module + ".") for name in imported)]
+    after = files(directory), files(workdir)
+    for place, old, new in zip((directory, workdir), before, after):
+        problems += [f"создан или изменён {os.path.join(place, file)}"
+                     for file in sorted(new) if old.get(file) != new[file]]
+
+    top = sorted(((cumulative, module) for module, depth, cumulative in modules if depth == 0), reverse=True)[:3]
+    return {
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "imports_ms": round(statistics.median(totals) / 1000, 1) if totals else None,
+        "modules": len(imported),
+        "top": {module: round(cumulative / 1000, 1) for cumulative, module in top},
+        "problems": problems
+    }
+
+
+def regressions(report, args):
+    if not args.baseline:
+        return []
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["targets"]
+    problems = []
+    for name, stats in report.items():
+        old = baseline.get(name)
+        if old and stats["wall_ms"] > old["wall_ms"] * (1 + args.tolerance):
+            problems.append(f"{name}: {stats['wall_ms']} мс против {old['wall_ms']} мс в {args.baseline}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--target", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--output", help="JSON отчёт")
+    parser.add_argument("--baseline", help="прошлый отчёт для сравнения времени запуска")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.target:
+            report[name] = stats = run_target(name, workdir, args.repeat)
+            top = ", ".join(f"{module} {ms:.0f}" for module, ms in stats["top"].items())
+            imports = f"{stats['imports_ms']:7.1f}" if stats["imports_ms"] is not None else "      -"
+            print(f"{name:>28}: {stats['wall_ms']:7.1f} мс, импорты {imports} мс, "
+                  f"модулей {stats['modules']:4}  [{top}]")
+            for problem in stats["problems"]:
+                print(f"{'':>30}{problem}")
+
+    problems = [f"{name}: {problem}" for name, stats in report.items() for problem in stats["problems"]]
+    problems += regressions(report, args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"targets": report, "problems": problems}, f, ensure_ascii=False, indent=2)
+    print(f"Проблем: {len(problems)}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
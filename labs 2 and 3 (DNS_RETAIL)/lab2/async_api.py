@@ -0,0 +1,149 @@
+# async_api.py — те же CRUD-эндпоинты на AsyncSession (API_MODE=async)
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import cache
+import expansion
+import listing
+import models, schemas
+import rollup
+import search
+import stock
+from async_db import AsyncReadSessionLocal, AsyncSessionLocal
+from export import EXPORTS
+from pagination import Page, paginate_rows_async
+
+router = APIRouter()
+
+
+def hooks(entity):
+    """(created, updated, deleted): списание остатков, затем агрегаты продаж; None — нечего вызывать."""
+    found = [module.HOOKS[entity] for module in (stock, rollup) if entity in module.HOOKS]
+
+    def chain(calls):
+        calls = [call for call in calls if call]
+        if not calls:
+            return None
+
+        def run(db, *args):
+            for call in calls:
+                call(db, *args)
+        return run
+
+    return tuple(chain(calls) for calls in zip(*found)) if found else (None, None, None)
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def register(entity, model, create_schema, read_schema, name, deleted="Deleted", cached=False,
+             expanded_schema=None):
+    key = model.__mapper__.primary_key[0]
+    filters = EXPORTS[entity]
+    not_found = f"{name} not found"
+    # Остатки и агрегаты продаж — синхронный код, поэтому через run_sync
+    on_create, on_update, on_delete = hooks(entity)
+    # Поисковый индекс меняется только после commit
+    on_saved, on_deleted = search.HOOKS.get(entity, (None, None))
+
+    async def get_or_404(db, id):
+        obj = await db.get(model, id)
+        if not obj:
+            raise HTTPException(404, not_found)
+        return obj
+
+    async def create(item: create_schema, db: AsyncSession = Depends(get_db)):
+        obj = model(**item.dict())
+        db.add(obj)
+        if on_create:
+            await db.run_sync(on_create, obj)
+        await db.commit()
+        await db.refresh(obj)
+        if on_saved:
+            await db.run_sync(on_saved, obj)
+        return obj
+
+    async def list_all(request: Request, response: Response, page: Page = Depends(),
+                       where=Depends(filters.list_filters), db: AsyncSession = Depends(get_read_db)):
+        # Те же типизированные фильтры, что у синхронного списка
+        query = where(listing.statement(model, read_schema))
+        rows = await paginate_rows_async(db, query, key, page, response)
+        if cached:
+            return cache.conditional(request, response, listing.body(rows))
+        return listing.respond(response, rows)
+
+    async def get(id: int, db: AsyncSession = Depends(get_read_db)):
+        if not cached:
+            return await get_or_404(db, id)
+        value = cache.reads.get(entity, id)
+        if value is None:
+            value = cache.reads.put(entity, id, cache.serialize(read_schema, await get_or_404(db, id)))
+        return value
+
+    async def get_expanded(id: int, expand: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+        tree = expansion.parse(model, expand)
+        obj = await db.get(model, id, options=expansion.loader_options(model, tree))
+        if not obj:
+            raise HTTPException(404, not_found)
+        return expansion.serialize(obj, tree)
+
+    async def update(id: int, item: create_schema, db: AsyncSession = Depends(get_db)):
+        obj = await get_or_404(db, id)
+        old = rollup.snapshot(obj)
+        for k, v in item.dict().items():
+            setattr(obj, k, v)
+        if on_update:
+            await db.run_sync(on_update, obj, old)
+        await db.commit()
+        cache.reads.invalidate(entity, id)
+        if on_saved:
+            await db.run_sync(on_saved, obj, old)
+        return obj
+
+    async def delete(id: int, db: AsyncSession = Depends(get_db)):
+        obj = await get_or_404(db, id)
+        old = rollup.snapshot(obj)
+        if on_delete:
+            await db.run_sync(on_delete, obj)
+        # Дочерние карточки в кэше, где внешний ключ станет NULL
+        stale = await db.run_sync(cache.nulled_on_delete, entity, id)
+        await db.delete(obj)
+        await db.commit()
+        cache.reads.invalidate(entity, id)
+        for child, child_id in stale:
+            cache.reads.invalidate(child, child_id)
+        if on_deleted:
+            await db.run_sync(on_deleted, old)
+        return {"detail": deleted}
+
+    prefix = f"/{entity}"
+    router.add_api_route(f"{prefix}/", create, methods=["POST"], response_model=read_schema)
+    router.add_api_route(f"{prefix}/", list_all, methods=["GET"], response_model=list[read_schema])
+    if expanded_schema:
+        router.add_api_route(f"{prefix}/{{id}}", get_expanded, methods=["GET"], response_model=expanded_schema,
+                             response_model_exclude_unset=True)
+    else:
+        router.add_api_route(f"{prefix}/{{id}}", get, methods=["GET"], response_model=read_schema)
+    router.add_api_route(f"{prefix}/{{id}}", update, methods=["PUT"], response_model=read_schema)
+    router.add_api_route(f"{prefix}/{{id}}", delete, methods=["DELETE"])
+
+
+register("categories", models.ProductCategory, schemas.ProductCategoryCreate, schemas.ProductCategoryRead,
+         "Category", deleted="Category deleted", cached=True)
+register("positions", models.EmployeePosition, schemas.EmployeePositionCreate, schemas.EmployeePositionRead,
+         "Position", cached=True)
+register("stores", models.Store, schemas.StoreCreate, schemas.StoreRead, "Store", cached=True)
+register("employees", models.Employee, schemas.EmployeeCreate, schemas.EmployeeRead, "Employee")
+register("customers", models.Customer, schemas.CustomerCreate, schemas.CustomerRead, "Customer")
+register("products", models.Product, schemas.ProductCreate, schemas.ProductRead, "Product", cached=True)
+register("sales", models.Sale, schemas.SaleCreate, schemas.SaleRead, "Sale", expanded_schema=schemas.SaleExpanded)
+register("sale-items", models.SaleItem, schemas.SaleItemCreate, schemas.SaleItemRead, "Sale item")
+register("supplies", models.Supply, schemas.SupplyCreate, schemas.SupplyRead, "Supply")
+register("inventory", models.Inventory, schemas.InventoryCreate, schemas.InventoryRead, "Inventory")
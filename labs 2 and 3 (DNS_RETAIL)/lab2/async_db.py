@@ -0,0 +1,14 @@
+# async_db.py
+import os
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from common.database import REPLICA_URL, async_url, make_async_engine
+from db import SQLALCHEMY_DATABASE_URL
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(SQLALCHEMY_DATABASE_URL)
+
+
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+async_read_engine = make_async_engine(REPLICA_URL) if REPLICA_URL else async_engine
+# После commit объекты отдаются в ответ, поэтому не сбрасываем их атрибуты
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
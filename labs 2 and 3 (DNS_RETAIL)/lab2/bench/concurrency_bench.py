@@ -0,0 +1,133 @@
+# Пропускная способность API в режимах sync и async при 10/100/1000 одновременных клиентах.
+# Запуск из каталога lab2:
+#   python -m bench.concurrency_bench [--clients 10 100 1000] [--requests 1000] [--output bench.json]
+# Каждый режим — отдельный процесс на одной и той же SQLite; запросы идут через ASGI-транспорт
+# httpx в том же процессе, так что сеть не мешает сравнивать обработку запросов.
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["sync", "async"]
+PRODUCTS = 5000
+
+# Ожидание соединения из пула: по умолчанию 30 с, в бенчмарке ошибка видна быстрее
+POOL_TIMEOUT = 5
+
+
+def seed(database):
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    from sqlalchemy import insert
+    import models
+    from db import SessionLocal, engine
+    from common import migrations
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.ProductCategory), [{"Name": f"Категория {i}"} for i in range(50)])
+        db.execute(insert(models.Product), [
+            {"Name": f"Товар {i}", "Price": 100 + i % 900, "CategoryID": i % 50 + 1}
+            for i in range(PRODUCTS)
+        ])
+        db.commit()
+
+
+async def client(http, count, latencies, errors):
+    for _ in range(count):
+        # Карточка товара и страница каталога категории
+        if random.random() < 0.8:
+            url = f"/products/{random.randint(1, PRODUCTS)}"
+        else:
+            url = f"/products/?limit=20&CategoryID={random.randint(1, 50)}"
+        start = time.perf_counter()
+        try:
+            response = await http.get(url)
+            response.raise_for_status()
+        except Exception as e:
+            # Например, исчерпан пул соединений: считаем, но не прерываем замер
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure(app, clients, requests):
+    import httpx
+
+    latencies = []
+    errors = {}
+    per_client = max(1, requests // clients)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 limits=limits) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http, per_client, latencies, errors) for _ in range(clients)))
+        seconds = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [float("nan")] * 99
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2)
+    }
+
+
+def child(levels, requests):
+    import logging
+    import main
+
+    # api.log искажает замер одинаково, но сильно
+    logging.disable(logging.INFO)
+
+    async def measure_all():
+        # Один цикл событий на все уровни: соединения aiosqlite привязаны к нему
+        return [await measure(main.app, clients, requests) for clients in levels]
+
+    random.seed(0)
+    print(json.dumps(asyncio.run(measure_all())))
+
+
+def run_mode(mode, database, levels, requests):
+    # Пул в обоих режимах одинаковый (по умолчанию 5 + 10), меняется только тайм-аут
+    env = dict(os.environ, API_MODE=mode, DATABASE_URL=f"sqlite:///{database}", DB_POOL_TIMEOUT=str(POOL_TIMEOUT))
+    result = subprocess.run(
+        [sys.executable, "-m", "bench.concurrency_bench", "--child",
+         "--clients", *map(str, levels), "--requests", str(requests)],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--requests", type=int, default=1000, help="запросов на каждый уровень")
+    parser.add_argument("--output")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.clients, args.requests)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            database = os.path.join(workdir, "api.db")
+            seed(database)
+            report = {mode: run_mode(mode, database, args.clients, args.requests) for mode in MODES}
+
+        for mode, results in report.items():
+            for result in results:
+                print(f"{mode:>5}  {result['clients']:>5} клиентов: {result['rps']:>8} req/s  "
+                      f"p50 {result['p50_ms']} мс  p95 {result['p95_ms']} мс  ошибки {result['errors'] or 0}")
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,344 @@
+# Нагрузочный тест API: смесь запросов кассы с заданной частотой, задержки по маршрутам в JSON.
+# Запуск из каталога lab2 (сеть не нужна):
+#   python -m bench.load_test [--mode sync async] [--rate 200] [--duration 30]
+#       [--mix sale=15,product=30,search=10,inventory=20,sales=10,products=15]
+#       [--output report.json] [--baseline old.json --tolerance 0.25] [--max-error-rate 0.01]
+# Каждый режим API — отдельный процесс на своей копии засеянной SQLite; запросы идут через
+# ASGI-транспорт httpx в том же процессе. Запросы отправляются по расписанию (open loop):
+# если API не успевает, задержка считается от запланированного момента, а не от фактической
+# отправки, поэтому очередь на стороне клиента не прячет медленные ответы.
+# Код выхода 1 — есть регрессия: доля ошибок выше --max-error-rate, p99 выше --max-p99-ms или
+# p99 маршрута хуже, чем в --baseline, больше чем на --tolerance.
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["sync", "async"]
+
+STORES = 20
+EMPLOYEES_PER_STORE = 5
+CATEGORIES = 50
+# Остаток заведомо больше, чем продаст тест: 409 означал бы ошибку списания
+STOCK = 1_000_000
+WORDS = ["Смартфон", "Ноутбук", "Планшет", "Телевизор", "Наушники", "Монитор", "Мышь", "Клавиатура"]
+BRANDS = ["Samsung", "Apple", "Xiaomi", "ASUS", "Lenovo", "Sony", "LG", "Dexp"]
+
+# Сценарий -> маршрут в отчёте
+ROUTES = {
+    "sale": "POST /sales/batch",
+    "product": "GET /products/{id}",
+    "search": "GET /products/search",
+    "inventory": "GET /inventory/",
+    "sales": "GET /sales/",
+    "products": "GET /products/"
+}
+DEFAULT_MIX = "sale=15,product=30,search=10,inventory=20,sales=10,products=15"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ROUTES:
+            raise SystemExit(f"Неизвестный сценарий {name!r}, есть: {', '.join(ROUTES)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def seed(database, products, sales):
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    import models
+    from db import SessionLocal, engine
+    from common import migrations
+
+    rnd = random.Random(0)
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.ProductCategory), [{"Name": f"Категория {i}"} for i in range(CATEGORIES)])
+        db.execute(insert(models.EmployeePosition), [{"Name": "Продавец"}])
+        db.execute(insert(models.Store), [{"Name": f"Магазин {i}", "Address": f"Улица {i}"} for i in range(STORES)])
+        db.execute(insert(models.Employee), [
+            {"FullName": f"Сотрудник {i}", "PositionID": 1, "StoreID": i // EMPLOYEES_PER_STORE + 1}
+            for i in range(STORES * EMPLOYEES_PER_STORE)
+        ])
+        db.execute(insert(models.Product), [
+            {"Name": f"{rnd.choice(WORDS)} {rnd.choice(BRANDS)} {i}", "Price": 100 + i % 900,
+             "CategoryID": i % CATEGORIES + 1}
+            for i in range(products)
+        ])
+        db.execute(insert(models.Inventory), [
+            {"StoreID": store, "ProductID": product, "Quantity": STOCK}
+            for store in range(1, STORES + 1) for product in range(1, products + 1)
+        ])
+        # История продаж для списков; агрегаты и остатки она не трогает
+        start = datetime(2024, 1, 1)
+        db.execute(insert(models.Sale), [
+            {"SaleDate": start + timedelta(minutes=10 * i), "StoreID": i % STORES + 1,
+             "EmployeeID": i % (STORES * EMPLOYEES_PER_STORE) + 1}
+            for i in range(sales)
+        ])
+        db.execute(insert(models.SaleItem), [
+            {"SaleID": i // 2 + 1, "ProductID": rnd.randint(1, products), "Quantity": 1, "Price": 100}
+            for i in range(sales * 2)
+        ])
+        db.commit()
+
+
+class Traffic:
+    """Случайные запросы кассы: (method, url, json) для каждого сценария."""
+
+    def __init__(self, products, rnd):
+        self.count = products
+        self.rnd = rnd
+
+    def sale(self):
+        store = self.rnd.randint(1, STORES)
+        items = [
+            {"ProductID": self.rnd.randint(1, self.count), "Quantity": self.rnd.randint(1, 3), "Price": 100}
+            for _ in range(self.rnd.randint(1, 3))
+        ]
+        receipt = {
+            "SaleDate": time.strftime("%Y-%m-%dT%H:%M:%S"), "StoreID": store, "CustomerID": None,
+            "EmployeeID": (store - 1) * EMPLOYEES_PER_STORE + self.rnd.randint(1, EMPLOYEES_PER_STORE),
+            "items": items
+        }
+        return "POST", "/sales/batch", [receipt]
+
+    def product(self):
+        return "GET", f"/products/{self.rnd.randint(1, self.count)}", None
+
+    def search(self):
+        query = self.rnd.choice([self.rnd.choice(WORDS)[:4], self.rnd.choice(BRANDS), str(self.rnd.randint(1, 999))])
+        return "GET", f"/products/search?q={query}", None
+
+    def inventory(self):
+        store, product = self.rnd.randint(1, STORES), self.rnd.randint(1, self.count)
+        return "GET", f"/inventory/?StoreID={store}&ProductID={product}", None
+
+    def sales(self):
+        return "GET", f"/sales/?StoreID={self.rnd.randint(1, STORES)}&limit=50", None
+
+    def products(self):
+        return "GET", f"/products/?CategoryID={self.rnd.randint(1, CATEGORIES)}&limit=50", None
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def summary(latencies, statuses, seconds):
+    # latencies — секунды, statuses — {код или исключение: число}
+    count = sum(statuses.values())
+    errors = sum(number for status, number in statuses.items() if not str(status).startswith(("2", "3")))
+    return {
+        "requests": count,
+        # Пропускная способность — только успешные ответы: таймауты и 5xx её не увеличивают
+        "rps": round((count - errors) / seconds, 1),
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0,
+        "statuses": {str(status): number for status, number in sorted(statuses.items(), key=str)},
+        **{f"p{q}_ms": round(percentile(latencies, q) * 1000, 2) if latencies else None for q in (50, 95, 99)},
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None
+    }
+
+
+async def drive(app, mix, rate, duration, warmup, max_in_flight, timeout, products):
+    import httpx
+
+    rnd = random.Random(1)
+    traffic = Traffic(products, rnd)
+    names, weights = list(mix), list(mix.values())
+    latencies = {name: [] for name in names}
+    statuses = {name: {} for name in names}
+    in_flight = asyncio.Semaphore(max_in_flight)
+    loop = asyncio.get_running_loop()
+    # Запросы, не ответившие за timeout: их не отменяем — отмена посреди синхронного
+    # обработчика закрывает его сессию из другого потока, пока поток ещё работает с ней
+    abandoned = set()
+
+    def left(scheduled):
+        # timeout отсчитывается от запланированного момента, включая ожидание свободного места
+        return max(0.0, scheduled + timeout - loop.time())
+
+    async def send(http, name, scheduled, recorded):
+        method, url, body = getattr(traffic, name)()
+        try:
+            await asyncio.wait_for(in_flight.acquire(), left(scheduled))
+        except asyncio.TimeoutError:
+            status = "Timeout"
+        else:
+            request = asyncio.ensure_future(http.request(method, url, json=body))
+            try:
+                response = await asyncio.wait_for(asyncio.shield(request), left(scheduled))
+                status = response.status_code
+                # /sales/batch отвечает 200, даже если чек отклонён (нет товара, остатка)
+                if status == 200 and method == "POST" and response.json().get("failed"):
+                    status = "rejected"
+            except asyncio.TimeoutError:
+                status = "Timeout"
+                abandoned.add(request)
+            except Exception as e:
+                status = type(e).__name__
+            finally:
+                in_flight.release()
+        if recorded:
+            # От запланированного момента: ожидание свободного места тоже задержка
+            latencies[name].append(loop.time() - scheduled)
+            statuses[name][status] = statuses[name].get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load",
+                                 limits=limits, timeout=None) as http:
+        tasks = []
+        total = int(rate * (warmup + duration))
+        start = loop.time()
+        for number in range(total):
+            scheduled = start + number / rate
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = rnd.choices(names, weights)[0]
+            tasks.append(asyncio.create_task(send(http, name, scheduled, number >= rate * warmup)))
+        late = max(0.0, loop.time() - (start + total / rate))
+        await asyncio.gather(*tasks)
+        seconds = loop.time() - start - warmup
+        if abandoned:
+            await asyncio.wait(abandoned, timeout=timeout)
+
+    everything = {}
+    for name in names:
+        for status, number in statuses[name].items():
+            everything[status] = everything.get(status, 0) + number
+    return {
+        "target_rps": rate,
+        "duration_s": duration,
+        # Насколько генератор сам отстал от расписания: большое значение — упёрлись в клиент
+        "schedule_lag_s": round(late, 3),
+        # Не ответили и за удвоенный timeout: API, скорее всего, завис
+        "unfinished": sum(not request.done() for request in abandoned),
+        **summary(sorted(value for name in names for value in latencies[name]), everything, seconds),
+        "routes": {
+            ROUTES[name]: summary(sorted(latencies[name]), statuses[name], seconds)
+            for name in names if statuses[name]
+        }
+    }
+
+
+def child(args):
+    import logging
+    import main
+
+    # api.log — во временном каталоге (API_LOG_FILE); строка httpx на каждый запрос теста там не нужна
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def run():
+        # startup-обработчики (индекс поиска) — как при запуске под uvicorn
+        async with main.app.router.lifespan_context(main.app):
+            report = await drive(main.app, parse_mix(args.mix), args.rate, args.duration, args.warmup,
+                                 args.max_in_flight, args.timeout, args.products)
+        if report["unfinished"]:
+            # Иначе asyncio.run() отменит зависшие запросы при выходе — см. abandoned в drive()
+            print(json.dumps(report), flush=True)
+            os._exit(0)
+        return report
+
+    print(json.dumps(asyncio.run(run())), flush=True)
+
+
+def run_mode(mode, database, workdir, args):
+    copy = os.path.join(workdir, f"{mode}.db")
+    shutil.copy(database, copy)
+    env = dict(os.environ, API_MODE=mode, DATABASE_URL=f"sqlite:///{copy}",
+               API_LOG_FILE=os.path.join(workdir, f"{mode}.log"))
+    command = [sys.executable, "-m", "bench.load_test", "--child", "--mix", args.mix,
+               "--rate", str(args.rate), "--duration", str(args.duration), "--warmup", str(args.warmup),
+               "--max-in-flight", str(args.max_in_flight), "--timeout", str(args.timeout),
+               "--products", str(args.products)]
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise SystemExit(f"{mode}: процесс теста упал\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def regressions(report, args):
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["modes"]
+
+    problems = []
+    for mode, result in report.items():
+        if result["error_rate"] > args.max_error_rate:
+            problems.append(f"{mode}: доля ошибок {result['error_rate']} > {args.max_error_rate}")
+        for route, stats in result["routes"].items():
+            if args.max_p99_ms is not None and stats["p99_ms"] > args.max_p99_ms:
+                problems.append(f"{mode} {route}: p99 {stats['p99_ms']} мс > {args.max_p99_ms} мс")
+            old = baseline.get(mode, {}).get("routes", {}).get(route)
+            if old and old["p99_ms"] and stats["p99_ms"] > old["p99_ms"] * (1 + args.tolerance):
+                problems.append(f"{mode} {route}: p99 {stats['p99_ms']} мс, было {old['p99_ms']} мс")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--rate", type=float, default=200, help="запросов в секунду")
+    parser.add_argument("--duration", type=float, default=30, help="секунд замера")
+    parser.add_argument("--warmup", type=float, default=2, help="секунд без замера в начале")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"веса сценариев: {', '.join(ROUTES)}")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="одновременных запросов")
+    parser.add_argument("--timeout", type=float, default=10, help="секунд на ответ, дальше — ошибка Timeout")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--sales", type=int, default=20000, help="продаж в истории")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline", help="прошлый отчёт для сравнения p99 по маршрутам")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    if args.child:
+        child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, "seed.db")
+        subprocess.run([sys.executable, "-c", "import sys; from bench.load_test import seed; "
+                        "seed(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))",
+                        database, str(args.products), str(args.sales)],
+                       env=dict(os.environ, API_LOG_FILE=os.path.join(workdir, "seed.log")), check=True)
+        modes = {mode: run_mode(mode, database, workdir, args) for mode in args.mode}
+
+    problems = regressions(modes, args)
+    report = {
+        "mix": parse_mix(args.mix),
+        "products": args.products,
+        "modes": modes,
+        "regressions": problems
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Сколько стоит logging.info() в потоке запроса: прежний FileHandler против очереди из logs.py.
+# Запуск из каталога lab2:
+#   python -m bench.logging_bench [--records 20000] [--threads 8]
+# Пишется во временный файл; каждый вариант — в отдельном процессе, чтобы настройка
+# корневого логгера одного не влияла на другой.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+VARIANTS = ["file", "queue"]
+
+
+def child(variant, records, threads, filename):
+    import logging
+
+    if variant == "file":
+        # Как было в main.py до logs.py
+        logging.basicConfig(filename=filename, level=logging.INFO, format="%(asctime)s %(message)s")
+    else:
+        import logs
+        logs.setup(filename)
+
+    timings = []
+
+    def worker():
+        local = []
+        for number in range(records // threads):
+            start = time.perf_counter()
+            logging.info(f"GET /categories/{number}")
+            local.append(time.perf_counter() - start)
+        timings.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    if variant == "queue":
+        logs.shutdown()
+    timings.sort()
+    return {
+        "variant": variant,
+        "records": len(timings),
+        "threads": threads,
+        "call_us_p50": round(statistics.median(timings) * 1e6, 2),
+        "call_us_p99": round(timings[int(len(timings) * 0.99)] * 1e6, 2),
+        "calls_per_s": round(len(timings) / seconds),
+        "lines_written": sum(1 for _ in open(filename, encoding="utf-8"))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--variant", choices=VARIANTS)
+    parser.add_argument("--file")
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(child(args.variant, args.records, args.threads, args.file)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        for variant in VARIANTS:
+            filename = os.path.join(directory, f"{variant}.log")
+            output = subprocess.run(
+                [sys.executable, "-m", "bench.logging_bench", "--variant", variant, "--file", filename,
+                 "--records", str(args.records), "--threads", str(args.threads)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output)
+            print(f"{variant:>6}: p50 {result['call_us_p50']} мкс  p99 {result['call_us_p99']} мкс  "
+                  f"{result['calls_per_s']} вызовов/с  строк в файле {result['lines_written']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# Планы горячих запросов на SQLite после common/migrations.py: каждый должен идти по своему индексу.
+# Запуск из каталога lab2:
+#   python -m bench.query_plans [--sales 20000] [--verbose]
+# SQL не переписан вручную: его выдают те же функции, что вызывают обработчики API и ETL
+# (stock, rollup, pagination + listing, справочники lab3). Перехваченные запросы
+# прогоняются через EXPLAIN QUERY PLAN после ANALYZE на синтетических данных.
+# Код выхода 1, если какой-то запрос не использует ожидаемый индекс или читает таблицу целиком.
+# Те же проверки идут в наборе тестов: tests/test_query_plans.py.
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+
+SALES = 20_000
+STORES = 20
+PRODUCTS = 2000
+CATEGORIES = 40
+SUPPLIERS = 30
+
+# Полный проход по таблице без индекса: "SCAN Sale", но не "SCAN Sale USING INDEX ..."
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def seed(sales):
+    from datetime import date, datetime, timedelta
+    from decimal import Decimal
+    from sqlalchemy import insert, text
+    import models
+    from db import SessionLocal, engine
+    from common import migrations
+
+    rnd = random.Random(0)
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.ProductCategory), [{"Name": f"Категория {i}"} for i in range(CATEGORIES)])
+        db.execute(insert(models.EmployeePosition), [{"Name": "Продавец"}])
+        db.execute(insert(models.Store), [{"Name": f"Магазин {i}", "Address": f"Адрес {i}"} for i in range(STORES)])
+        db.execute(insert(models.Employee), [
+            {"FullName": f"Сотрудник {i}", "PositionID": 1, "StoreID": i % STORES + 1} for i in range(STORES * 5)
+        ])
+        db.execute(insert(models.Customer), [{"FullName": f"Клиент {i}", "Phone": None} for i in range(1000)])
+        db.execute(insert(models.Product), [
+            {"Name": f"Товар {i}", "Price": Decimal(100 + i), "CategoryID": i % CATEGORIES + 1} for i in range(PRODUCTS)
+        ])
+        db.execute(insert(models.Supplier), [{"Name": f"Поставщик {i}"} for i in range(SUPPLIERS)])
+        db.execute(insert(models.Inventory), [
+            {"StoreID": store, "ProductID": product, "Quantity": 1000}
+            for store in range(1, STORES + 1) for product in range(1, PRODUCTS + 1, 4)
+        ])
+        db.execute(insert(models.Supply), [
+            {"SupplierID": rnd.randint(1, SUPPLIERS), "ProductID": rnd.randint(1, PRODUCTS),
+             "SupplyDate": date(2024, 1, 1) + timedelta(days=rnd.randrange(365)), "Quantity": 10}
+            for _ in range(sales // 4)
+        ])
+        store_of = {}
+        rows = []
+        for sale_id in range(1, sales + 1):
+            store_of[sale_id] = rnd.randint(1, STORES)
+            rows.append({"SaleDate": datetime(2024, 1, 1) + timedelta(minutes=rnd.randrange(365 * 24 * 60)),
+                         "StoreID": store_of[sale_id], "EmployeeID": rnd.randint(1, STORES * 5),
+                         "CustomerID": rnd.choice([None, rnd.randint(1, 1000)])})
+        db.execute(insert(models.Sale), rows)
+        db.execute(insert(models.SaleItem), [
+            {"SaleID": sale_id, "ProductID": rnd.randint(1, PRODUCTS), "Quantity": rnd.randint(1, 3),
+             "Price": Decimal("99.90")}
+            for sale_id in range(1, sales + 1) for _ in range(rnd.randint(1, 4))
+        ])
+        db.commit()
+    with engine.begin() as connection:
+        import rollup
+        with SessionLocal(bind=connection) as db:
+            rollup.rebuild(db)
+        # Статистика для планировщика, как после наполнения рабочей базы
+        connection.execute(text("ANALYZE"))
+
+
+def listing_query(model, schema, key, filters=None, **values):
+    # Как в list_* из main.py: фильтры, диапазон дат и keyset-страница
+    from fastapi import Response
+    from pagination import Page, apply_filters, apply_range, paginate_rows
+    import listing
+
+    def run(db):
+        query = apply_filters(listing.statement(model, schema), model, **values)
+        if filters is not None:
+            query = apply_range(query, *filters)
+        paginate_rows(db, query, key, Page(limit=100, cursor=None), Response())
+
+    return run
+
+
+def cases():
+    """(название, функция(db), индексы, которые должны быть в плане, разрешён ли полный проход)."""
+    from datetime import date, datetime
+    from sqlalchemy import select
+    import models, schemas
+    import rollup
+    import stock
+
+    sale_range = (models.Sale.SaleDate, datetime(2024, 3, 1), datetime(2024, 3, 8))
+    supply_range = (models.Supply.SupplyDate, date(2024, 3, 1), date(2024, 3, 31))
+    names = [f"Магазин {i}" for i in range(3)]
+    products = [f"товар {i}" for i in range(3)]
+
+    return [
+        ("списание остатка (stock.take)",
+         lambda db: stock.take(db, 1, 1, 1), ["UQ_Inventory_Store_Product"], False),
+        ("возврат на склад (rollup.increment)",
+         lambda db: stock.put_back(db, 1, 1, 1), ["UQ_Inventory_Store_Product"], False),
+        ("позиции чека (rollup.sale_items)",
+         lambda db: rollup.sale_items(db, 1), ["COVERING INDEX IX_SaleItem_Sale"], False),
+        ("агрегаты продажи (rollup.add_items)",
+         lambda db: rollup.add_items(db, rollup.sale_items(db, 1)),
+         ["COVERING INDEX IX_SaleItem_Sale", "sqlite_autoindex_SalesDailyStore_1",
+          "sqlite_autoindex_SalesDailyCategory_1"], False),
+        ("GET /sales/?StoreID&date_from&date_to",
+         listing_query(models.Sale, schemas.SaleRead, models.Sale.SaleID, sale_range, StoreID=1),
+         ["IX_Sale_Store_Date"], False),
+        ("GET /sales/?date_from&date_to",
+         listing_query(models.Sale, schemas.SaleRead, models.Sale.SaleID, sale_range), ["IX_Sale_Date"], False),
+        ("GET /sales/?EmployeeID",
+         listing_query(models.Sale, schemas.SaleRead, models.Sale.SaleID, EmployeeID=1), ["IX_Sale_Employee"], False),
+        ("GET /sale-items/?SaleID",
+         listing_query(models.SaleItem, schemas.SaleItemRead, models.SaleItem.SaleItemID, SaleID=1),
+         ["IX_SaleItem_Sale"], False),
+        ("GET /sale-items/?ProductID",
+         listing_query(models.SaleItem, schemas.SaleItemRead, models.SaleItem.SaleItemID, ProductID=1),
+         ["IX_SaleItem_Product"], False),
+        ("GET /supplies/?ProductID&date_from&date_to",
+         listing_query(models.Supply, schemas.SupplyRead, models.Supply.SupplyID, supply_range, ProductID=1),
+         ["IX_Supply_Product_Date"], False),
+        ("GET /supplies/?SupplierID",
+         listing_query(models.Supply, schemas.SupplyRead, models.Supply.SupplyID, SupplierID=1),
+         ["IX_Supply_Supplier"], False),
+        ("GET /inventory/?StoreID",
+         listing_query(models.Inventory, schemas.InventoryRead, models.Inventory.InventoryID, StoreID=1),
+         ["UQ_Inventory_Store_Product"], False),
+        ("GET /inventory/?ProductID",
+         listing_query(models.Inventory, schemas.InventoryRead, models.Inventory.InventoryID, ProductID=1),
+         ["IX_Inventory_Product"], False),
+        ("GET /products/?CategoryID",
+         listing_query(models.Product, schemas.ProductRead, models.Product.ProductID, CategoryID=1),
+         ["IX_Product_Category"], False),
+        ("GET /employees/?StoreID",
+         listing_query(models.Employee, schemas.EmployeeRead, models.Employee.EmployeeID, StoreID=1),
+         ["IX_Employee_Store"], False),
+        # lab3/etl/dimensions.py: DimensionCache.select и ProductIndex.select
+        ("справочник ETL: магазины по Name",
+         lambda db: db.execute(select(models.Store.Name, models.Store.StoreID).where(models.Store.Name.in_(names))).all(),
+         ["COVERING INDEX UQ_Store_Name"], False),
+        ("справочник ETL: товары по NameKey",
+         lambda db: db.execute(
+             select(models.Product.ProductID, models.Product.NameKey, models.Product.CategoryID, models.Product.Price)
+             .where(models.Product.NameKey.in_(products))
+         ).all(), ["UQ_Product_NameKey_Category"], False),
+        # Полный пересчёт читает все продажи; позиции к ним — по индексу
+        ("пересчёт агрегатов (rollup.rebuild)",
+         lambda db: rollup.rebuild(db), ["COVERING INDEX IX_SaleItem_Sale"], True)
+    ]
+
+
+def capture(engine, run, db):
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "INSERT", "DELETE")):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        run(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain(connection, statement, parameters):
+    return [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+def plan_problems(run, expected, full_scan):
+    """([(запрос, строки плана)], [проблемы]) для одного случая из cases()."""
+    from db import SessionLocal, engine
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        # Запросы, меняющие данные, откатываются: следующий случай видит ту же базу
+        db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+        statements = capture(engine, run, db)
+        plans = [(statement, explain(connection, statement, parameters)) for statement, parameters in statements]
+        db.close()
+        transaction.rollback()
+
+    details = [line for _, plan in plans for line in plan]
+    problems = [f"нет {index}" for index in expected if not any(index in line for line in details)]
+    if not full_scan:
+        problems += [f"полный проход: {line}" for line in details if FULL_SCAN.match(line)]
+    return plans, problems
+
+
+def check(verbose):
+    failed = 0
+    for name, run, expected, full_scan in cases():
+        plans, problems = plan_problems(run, expected, full_scan)
+        failed += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':>4}  {name}" + (f": {'; '.join(problems)}" if problems else ""))
+        if verbose or problems:
+            for statement, plan in plans:
+                print(f"        {' '.join(statement.split())[:120]}")
+                for line in plan:
+                    print(f"          {line}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sales", type=int, default=SALES)
+    parser.add_argument("--verbose", action="store_true", help="печатать планы всех запросов")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+        seed(args.sales)
+        failed = check(args.verbose)
+    print(f"Запросов не по индексу: {failed}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
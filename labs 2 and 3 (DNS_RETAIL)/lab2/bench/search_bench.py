@@ -0,0 +1,105 @@
+# Задержка поиска по индексу search.SearchIndex на синтетическом каталоге.
+# Запуск из каталога lab2:
+#   python -m bench.search_bench [--products 1000000] [--queries 2000]
+# Меряется только индекс в памяти: чтение найденных строк из БД в /products/search
+# добавляет один запрос по первичному ключу на страницу результатов.
+import argparse
+import os
+import random
+import resource
+import statistics
+import time
+
+BRANDS = ["Samsung", "Apple", "Xiaomi", "ASUS", "Lenovo", "HP", "Acer", "Huawei", "Honor", "Realme",
+          "Sony", "LG", "Philips", "Bosch", "Dexp", "MSI", "Gigabyte", "Logitech", "Redmi", "Poco"]
+SERIES = ["Galaxy", "iPhone", "Redmi Note", "VivoBook", "ZenBook", "IdeaPad", "ThinkPad", "Pavilion",
+          "Aspire", "Nitro", "MateBook", "MagicBook", "Bravia", "OLED", "Serie", "Katana", "Aorus",
+          "Tab", "Watch", "Buds", "Pad", "Book", "Pro", "Air", "Mini"]
+SUFFIXES = ["", "Ultra", "Plus", "Lite", "Max", "FE", "5G", "128 ГБ", "256 ГБ", "черный", "белый", "синий"]
+CATEGORIES = ["Смартфоны", "Ноутбуки", "Планшеты", "Телевизоры", "Наушники", "Умные часы",
+              "Мониторы", "Клавиатуры", "Мыши", "Бытовая техника"]
+
+# Запросы продавцов: начало модели, бренд и серия, подстрока и одна короткая буква
+QUERIES = {
+    "модель": ["galaxy s2", "vivobook 15", "redmi note 1", "iphone 1", "thinkpad x", "matebook d"],
+    "бренд+категория": ["samsung смартф", "asus ноут", "sony телев", "xiaomi науш"],
+    "подстрока": ["ivobo", "enboo", "hinkpa"],
+    "одно слово": ["galaxy", "vivobook", "смартфоны"],
+    "одна буква": ["s", "а"]
+}
+
+
+def catalog(count, seed=0):
+    rnd = random.Random(seed)
+    for product_id in range(1, count + 1):
+        model = f"{rnd.choice('SAXMGZTDK')}{rnd.randint(1, 99)}"
+        name = f"{rnd.choice(BRANDS)} {rnd.choice(SERIES)} {model} {rnd.choice(SUFFIXES)}".strip()
+        yield product_id, name, rnd.randint(1, len(CATEGORIES))
+
+
+def rss_mb():
+    # ru_maxrss в Linux — КБ
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timings(function, arguments):
+    result = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        result.append(time.perf_counter() - start)
+    return result
+
+
+def summary(values):
+    values = sorted(values)
+    return (f"p50 {statistics.median(values) * 1000:.3f} мс  "
+            f"p99 {values[int(len(values) * 0.99)] * 1000:.3f} мс  "
+            f"max {values[-1] * 1000:.3f} мс")
+
+
+def main():
+    # search импортирует models, а с ними движок; сама база бенчмарку не нужна
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    import search
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000, help="запросов на каждую группу")
+    parser.add_argument("--limit", type=int, default=search.DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    index = search.SearchIndex()
+    before = rss_mb()
+    start = time.perf_counter()
+    index.load(catalog(args.products), enumerate(CATEGORIES, 1))
+    print(f"Построение: {args.products} товаров за {time.perf_counter() - start:.1f} с, "
+          f"+{rss_mb() - before:.0f} МБ, {index.stats()}")
+
+    rnd = random.Random(1)
+    for group, queries in QUERIES.items():
+        sample = [rnd.choice(queries) for _ in range(args.queries)]
+        found = statistics.mean(len(index.search(query, args.limit)) for query in queries)
+        print(f"{group:>16}: {summary(timings(lambda q: index.search(q, args.limit), sample))}  "
+              f"найдено в среднем {found:.1f}")
+
+    # Правки товаров обработчиками: удалить старое название и добавить новое
+    products = list(catalog(args.queries))
+    next_id = args.products + 1
+
+    def rename(row):
+        product_id, name, category_id = row
+        index.remove(product_id, name, category_id)
+        index.add(product_id, name + " обновлен", category_id)
+
+    def create(row):
+        nonlocal next_id
+        index.add(next_id, row[1], row[2])
+        next_id += 1
+
+    print(f"{'изменение товара':>16}: {summary(timings(rename, products))}")
+    print(f"{'новый товар':>16}: {summary(timings(create, products))}")
+
+
+if __name__ == "__main__":
+    main()
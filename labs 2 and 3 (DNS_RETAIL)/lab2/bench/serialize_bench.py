@@ -0,0 +1,111 @@
+# Сериализация большого списка SaleItemRead: ORM + response_model против listing.py.
+# Запуск из каталога lab2:
+#   python -m bench.serialize_bench [--rows 100000] [--repeat 5] [--stdlib-json]
+# ORM-путь повторяет то, что FastAPI делает с ответом эндпоинта: объекты из Session,
+# проверка через response_model (fastapi.routing.serialize_response) и JSONResponse.
+# Быстрый путь — Row-кортежи из select() колонок и listing.body(). Оба читают одну SQLite.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def seed(rows):
+    from decimal import Decimal
+    from datetime import datetime
+    from sqlalchemy import insert
+    import models
+    from db import SessionLocal, engine
+    from common import migrations
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.Product), [
+            {"Name": f"Товар {i}", "Price": 100 + i, "CategoryID": None} for i in range(1000)
+        ])
+        db.execute(insert(models.Sale), [
+            {"SaleDate": datetime(2024, 1, 1 + i % 28, 10), "StoreID": None} for i in range(rows // 4)
+        ])
+        db.execute(insert(models.SaleItem), [
+            {"SaleID": i // 4 + 1, "ProductID": i % 1000 + 1, "Quantity": i % 5 + 1,
+             "Price": Decimal(100 + i % 1000) + Decimal("0.99")}
+            for i in range(rows)
+        ])
+        db.commit()
+
+
+def orm_path(db):
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    import models, schemas
+
+    field = create_response_field(name="Response", type_=list[schemas.SaleItemRead])
+
+    def fetch():
+        db.expunge_all()
+        return db.query(models.SaleItem).order_by(models.SaleItem.SaleItemID).all()
+
+    def serialize(rows):
+        content = asyncio.run(serialize_response(field=field, response_content=rows))
+        return JSONResponse(content).body
+
+    return fetch, serialize
+
+
+def fast_path(db):
+    import listing
+    import models, schemas
+
+    query = listing.statement(models.SaleItem, schemas.SaleItemRead).order_by(models.SaleItem.SaleItemID)
+
+    def fetch():
+        return db.execute(query).all()
+
+    return fetch, listing.body
+
+
+def measure(fetch, serialize, repeat):
+    fetched, serialized = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fetch()
+        middle = time.perf_counter()
+        body = serialize(rows)
+        fetched.append(middle - start)
+        serialized.append(time.perf_counter() - middle)
+    return statistics.median(fetched), statistics.median(serialized), body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stdlib-json", action="store_true", help="быстрый путь без orjson")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        import listing
+        from db import SessionLocal
+
+        if args.stdlib_json:
+            listing.orjson = None
+        seed(args.rows)
+        print(f"{args.rows} строк SaleItemRead, JSON: {'orjson' if listing.orjson else 'json'}")
+        bodies = {}
+        with SessionLocal() as db:
+            for name, path in (("ORM + response_model", orm_path), ("Core + listing", fast_path)):
+                fetched, serialized, bodies[name] = measure(*path(db), args.repeat)
+                print(f"{name:>20}: выборка {fetched * 1000:7.1f} мс  сериализация {serialized * 1000:7.1f} мс  "
+                      f"всего {(fetched + serialized) * 1000:7.1f} мс  {len(bodies[name]) / 1e6:.1f} МБ")
+
+        same = len({json.dumps(json.loads(body)) for body in bodies.values()}) == 1
+        print(f"Ответы совпадают: {same}")
+
+
+if __name__ == "__main__":
+    main()
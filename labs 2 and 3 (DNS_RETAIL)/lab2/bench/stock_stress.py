@@ -0,0 +1,113 @@
+# Пропускная способность параллельных продаж одного товара в одном магазине.
+# Запуск из каталога lab2:
+#   python -m bench.stock_stress [--sales 3000] [--stock 2000] [--clients 32]
+# Все кассы продают по 1 шт. товара 1 в магазине 1; продаж больше, чем остаток, поэтому часть
+# получает 409. Каждый режим API — отдельный процесс на своей SQLite. Что остаток не теряет
+# списаний и не уходит в минус, проверяет tests/test_stock.py.
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["sync", "async"]
+
+
+def seed(database, stock):
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    from datetime import datetime
+    import models
+    from db import SessionLocal, engine
+    from common import migrations
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        db.add_all([
+            models.ProductCategory(Name="Категория"),
+            models.Store(Name="Магазин", Address="Адрес"),
+            models.Product(Name="Товар", Price=100, CategoryID=1),
+            models.Inventory(StoreID=1, ProductID=1, Quantity=stock),
+            models.Sale(SaleDate=datetime(2024, 1, 1, 10), StoreID=1)
+        ])
+        db.commit()
+
+
+def totals():
+    from sqlalchemy import func, select
+    import models
+    from db import SessionLocal
+
+    with SessionLocal() as db:
+        return (
+            db.scalar(select(models.Inventory.Quantity).where(models.Inventory.InventoryID == 1)),
+            db.scalar(select(func.coalesce(func.sum(models.SaleItem.Quantity), 0)))
+        )
+
+
+async def fire(app, sales, clients):
+    import httpx
+
+    statuses = {}
+    semaphore = asyncio.Semaphore(clients)
+    item = {"SaleID": 1, "ProductID": 1, "Quantity": 1, "Price": 100}
+
+    async def sell(http):
+        async with semaphore:
+            try:
+                status = (await http.post("/sale-items/", json=item)).status_code
+            except Exception as e:
+                status = type(e).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 limits=limits) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(sell(http) for _ in range(sales)))
+        return statuses, time.perf_counter() - start
+
+
+def child(sales, clients):
+    import logging
+    import main
+
+    logging.disable(logging.INFO)
+    statuses, seconds = asyncio.run(fire(main.app, sales, clients))
+    quantity, sold = totals()
+    print(json.dumps({"statuses": statuses, "seconds": round(seconds, 3), "quantity": quantity, "sold": sold}))
+
+
+def run_mode(mode, sales, stock, clients):
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, "api.db")
+        env = dict(os.environ, API_MODE=mode, DATABASE_URL=f"sqlite:///{database}")
+        subprocess.run([sys.executable, "-m", "bench.stock_stress", "--seed", database, "--stock", str(stock)],
+                       env=env, check=True)
+        result = subprocess.run(
+            [sys.executable, "-m", "bench.stock_stress", "--child", "--sales", str(sales), "--clients", str(clients)],
+            env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sales", type=int, default=3000)
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=32, help="одновременных запросов")
+    parser.add_argument("--seed")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed, args.stock)
+    elif args.child:
+        child(args.sales, args.clients)
+    else:
+        for mode in MODES:
+            result = run_mode(mode, args.sales, args.stock, args.clients)
+            print(f"{mode:>5}: {result['statuses']}  остаток {result['quantity']}  продано {result['sold']}  "
+                  f"{result['seconds']} с  {args.sales / result['seconds']:.0f} продаж/с")
@@ -0,0 +1,143 @@
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+import models
+import rollup
+import stock
+
+# Больше строк за запрос не принимаем
+MAX_BULK_SIZE = 1000
+
+# SQL Server принимает не больше 2100 параметров в запросе
+IN_BATCH_SIZE = 1000
+
+# Поле -> столбец, на который оно ссылается
+REFERENCES = {
+    models.Sale: {
+        "StoreID": models.Store.StoreID,
+        "EmployeeID": models.Employee.EmployeeID,
+        "CustomerID": models.Customer.CustomerID
+    },
+    models.SaleItem: {"ProductID": models.Product.ProductID},
+    models.Supply: {"SupplierID": models.Supplier.SupplierID, "ProductID": models.Product.ProductID},
+    models.Inventory: {"StoreID": models.Store.StoreID, "ProductID": models.Product.ProductID}
+}
+
+
+def existing(db, column, ids):
+    ids = sorted({id_ for id_ in ids if id_ is not None})
+    found = set()
+    for start in range(0, len(ids), IN_BATCH_SIZE):
+        found.update(db.scalars(select(column).where(column.in_(ids[start:start + IN_BATCH_SIZE]))))
+    return found
+
+
+def check_references(db, model, rows):
+    """{индекс строки: ошибка} для строк, ссылающихся на несуществующие записи."""
+    errors = {}
+    for field, column in REFERENCES[model].items():
+        found = existing(db, column, (row[field] for row in rows))
+        for i, row in enumerate(rows):
+            if row[field] is not None and row[field] not in found:
+                errors.setdefault(i, f"{field} {row[field]} not found")
+    return errors
+
+
+def insert_returning(db, model, rows):
+    # Один executemany; ID приходят в порядке строк
+    key = model.__mapper__.primary_key[0]
+    return db.scalars(insert(model).returning(key, sort_by_parameter_order=True), rows).all()
+
+
+def result(rows, ids, errors):
+    results = [
+        {"index": i, "id": ids.get(i), "error": errors.get(i)}
+        for i in range(len(rows))
+    ]
+    return {"created": len(ids), "failed": len(errors), "results": results}
+
+
+def insert_many(db, rows, write):
+    """Пишет rows пачкой; если пачка не прошла, повторяет построчно в savepoint'ах.
+
+    write(db, rows) -> список ID. Возвращает ({индекс: ID}, {индекс: ошибка}).
+    """
+    ids, errors = {}, {}
+    if not rows:
+        return ids, errors
+
+    try:
+        with db.begin_nested():
+            return dict(enumerate(write(db, rows))), errors
+    except (SQLAlchemyError, stock.OutOfStock):
+        pass
+
+    # Ошибку нашла только база (ограничение, триггер) — ищем виноватую строку
+    for i, row in enumerate(rows):
+        try:
+            with db.begin_nested():
+                ids[i] = write(db, [row])[0]
+        except SQLAlchemyError as e:
+            errors[i] = str(e.orig or e).splitlines()[0]
+        except stock.OutOfStock as e:
+            errors[i] = e.detail
+    return ids, errors
+
+
+def create_rows(db, model, rows):
+    errors = check_references(db, model, rows)
+    valid = [i for i in range(len(rows)) if i not in errors]
+
+    ids, failed = insert_many(db, [rows[i] for i in valid],
+                              lambda db, batch: insert_returning(db, model, batch))
+    db.commit()
+
+    errors.update({valid[i]: error for i, error in failed.items()})
+    return result(rows, {valid[i]: id_ for i, id_ in ids.items()}, errors)
+
+
+def write_sales(db, sales):
+    sale_ids = insert_returning(db, models.Sale, [sale["sale"] for sale in sales])
+    items = [
+        {**item, "SaleID": sale_id}
+        for sale, sale_id in zip(sales, sale_ids)
+        for item in sale["items"]
+    ]
+    if items:
+        stores = {sale_id: sale["sale"]["StoreID"] for sale, sale_id in zip(sales, sale_ids)}
+        stock.apply(db, stock.items_changes(db, items, stores=stores))
+        db.execute(insert(models.SaleItem), items)
+
+    receipts = {sale_id: (sale["sale"]["SaleDate"], sale["sale"]["StoreID"]) for sale, sale_id in zip(sales, sale_ids)}
+    rollup.add_sales(db, receipts.values())
+    rollup.add_items(db, items, sales=receipts)
+    return sale_ids
+
+
+def create_sales(db, receipts):
+    """Чеки с позициями: плохой чек (в том числе без остатка) попадает в отчёт,
+    остальные сохраняются одной транзакцией."""
+    sales = [{"sale": receipt.dict(exclude={"items"}),
+              "items": [item.dict() for item in receipt.items]} for receipt in receipts]
+
+    errors = check_references(db, models.Sale, [sale["sale"] for sale in sales])
+
+    items = [(i, item) for i, sale in enumerate(sales) for item in sale["items"]]
+    item_errors = check_references(db, models.SaleItem, [item for _, item in items])
+    for n, (i, item) in enumerate(items):
+        if n in item_errors:
+            errors.setdefault(i, item_errors[n])
+        elif item["Quantity"] <= 0:
+            errors.setdefault(i, "Quantity must be positive")
+        elif item["Price"] < 0:
+            errors.setdefault(i, "Price must not be negative")
+
+    for i, sale in enumerate(sales):
+        if not sale["items"]:
+            errors.setdefault(i, "Receipt has no items")
+
+    valid = [i for i in range(len(sales)) if i not in errors]
+    ids, failed = insert_many(db, [sales[i] for i in valid], write_sales)
+    db.commit()
+
+    errors.update({valid[i]: error for i, error in failed.items()})
+    return result(sales, {valid[i]: id_ for i, id_ in ids.items()}, errors)
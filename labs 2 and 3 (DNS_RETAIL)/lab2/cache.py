@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Response
+from sqlalchemy import select
+import models
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "10000"))
+
+# Удаление записи обнуляет внешний ключ на неё в дочерних строках (relationship без cascade).
+# Здесь — только дочерние сущности с карточками в кэше: сущность -> [(сущность карточки, ключ, ID)]
+NULLED_ON_DELETE = {
+    "categories": [("products", models.Product.CategoryID, models.Product.ProductID)]
+}
+
+
+class LRUBackend:
+    """Хранилище в памяти процесса: LRU по числу ключей + TTL на запись.
+
+    Другое хранилище (например, Redis) должно уметь get/set/delete/clear/len.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.items[key] = (value, time.monotonic() + ttl)
+            self.items.move_to_end(key)
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class ReadCache:
+    """Read-through кэш карточек справочников: (сущность, ID) -> сериализованная запись."""
+
+    def __init__(self, backend=None, ttl=CACHE_TTL):
+        self.backend = backend if backend is not None else LRUBackend()
+        self.ttl = ttl
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, entity, id):
+        value = self.backend.get((entity, id))
+        counter = self.misses if value is None else self.hits
+        counter[entity] = counter.get(entity, 0) + 1
+        return value
+
+    def put(self, entity, id, value):
+        self.backend.set((entity, id), value, self.ttl)
+        return value
+
+    def invalidate(self, entity, id):
+        self.backend.delete((entity, id))
+
+    def clear(self):
+        self.backend.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self):
+        entities = {}
+        for entity in sorted(self.hits.keys() | self.misses.keys()):
+            hits, misses = self.hits.get(entity, 0), self.misses.get(entity, 0)
+            entities[entity] = {"hits": hits, "misses": misses, "hit_ratio": round(hits / (hits + misses), 4)}
+
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "size": len(self.backend),
+            "ttl": self.ttl,
+            "entities": entities
+        }
+
+
+reads = ReadCache()
+
+
+def nulled_on_delete(db, entity, id):
+    """Карточки (сущность, ID), в которых удаление записи обнулит внешний ключ; собирать до commit."""
+    return [
+        (child, child_id)
+        for child, column, key in NULLED_ON_DELETE.get(entity, [])
+        for child_id in db.scalars(select(key).where(column == id))
+    ]
+
+
+def serialize(schema, obj):
+    # JSON-совместимый dict: его можно положить в любое хранилище
+    return schema.model_validate(obj, from_attributes=True).model_dump(mode="json")
+
+
+def etag(body, response):
+    # Хэш тела страницы и курсора следующей: совпал — клиенту нечего скачивать
+    body += response.headers.get("X-Next-Cursor", "").encode()
+    return 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def conditional(request, response, body):
+    """JSON-тело списка с заголовком ETag или пустой 304, если If-None-Match совпал."""
+    tag = etag(body, response)
+    response.headers["ETag"] = tag
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and {tag, "*"} & {value.strip() for value in if_none_match.split(",")}:
+        return Response(status_code=304, headers=dict(response.headers))
+    return Response(body, media_type="application/json", headers=dict(response.headers))
@@ -1,16 +1,21 @@
 # db.py
-from sqlalchemy import create_engine
+import os
+import sys
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+# Общая с lab3 фабрика движков лежит в ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.database import DATABASE_URL, REPLICA_URL, make_engine
 
-SQLALCHEMY_DATABASE_URL = (
-    "mssql+pyodbc://@MSI\\SQLEXPRESS/DNS_RETAIL"
-    "?driver=ODBC+Driver+17+for+SQL+Server"
-    "&trusted_connection=yes"
-    "&TrustServerCertificate=yes"
-)
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
 
+# sync — обработчики в пуле потоков, async — AsyncSession (см. async_db.py)
+API_MODE = os.getenv("API_MODE", "sync")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+
+engine = make_engine()
+# GET-обработчики читают с реплики, если она задана
+read_engine = make_engine(REPLICA_URL) if REPLICA_URL else engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
@@ -0,0 +1,61 @@
+# expansion.py — вложенные связи в ответе (?expand=items.product.category) за фиксированное число запросов
+from fastapi import HTTPException
+from sqlalchemy.orm import joinedload, selectinload
+import cache
+import models, schemas
+
+# Какие связи можно раскрывать; обратные коллекции вроде Store.sales — нет
+EXPANDABLE = {
+    models.Sale: ["items", "store", "employee", "customer"],
+    models.SaleItem: ["product"],
+    models.Product: ["category"],
+    models.Inventory: ["product", "store"],
+    models.Employee: ["position", "store"]
+}
+
+READ_SCHEMAS = {
+    models.Sale: schemas.SaleRead,
+    models.SaleItem: schemas.SaleItemRead,
+    models.Product: schemas.ProductRead,
+    models.ProductCategory: schemas.ProductCategoryRead,
+    models.Store: schemas.StoreRead,
+    models.Employee: schemas.EmployeeRead,
+    models.EmployeePosition: schemas.EmployeePositionRead,
+    models.Customer: schemas.CustomerRead,
+    models.Inventory: schemas.InventoryRead
+}
+
+
+def parse(model, expand):
+    """'items.product,store' -> {'items': {'product': {}}, 'store': {}} с проверкой путей."""
+    tree = {}
+    for path in filter(None, (part.strip() for part in (expand or "").split(","))):
+        node, current = tree, model
+        for name in path.split("."):
+            if name not in EXPANDABLE.get(current, []):
+                raise HTTPException(400, f"Cannot expand {path}")
+            node = node.setdefault(name, {})
+            current = current.__mapper__.relationships[name].mapper.class_
+    return tree
+
+
+def loader_options(model, tree):
+    # Коллекции — selectinload (один IN-запрос на уровень), ссылки — joinedload в тот же запрос
+    options = []
+    for name, children in tree.items():
+        relationship = model.__mapper__.relationships[name]
+        attribute = getattr(model, name)
+        option = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+        target = relationship.mapper.class_
+        options += [option.options(*loader_options(target, children))] if children else [option]
+    return options
+
+
+def serialize(obj, tree):
+    if obj is None:
+        return None
+    data = cache.serialize(READ_SCHEMAS[type(obj)], obj)
+    for name, children in tree.items():
+        value = getattr(obj, name)
+        data[name] = [serialize(item, children) for item in value] if isinstance(value, list) else serialize(value, children)
+    return data
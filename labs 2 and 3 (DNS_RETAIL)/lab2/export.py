@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import DateTime, select
+import models
+from db import read_engine
+from pagination import list_filters
+
+# Сколько строк забирать из курсора и отдавать клиенту за раз
+BATCH_SIZE = 5000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class Export:
+    def __init__(self, model, filters=(), date_column=None):
+        self.table = model.__table__
+        self.filters = filters
+        self.date_column = date_column
+        # Те же фильтры параметрами запроса для списочных эндпоинтов
+        self.list_filters = list_filters(model, filters, date_column)
+
+    def statement(self, params):
+        """SELECT с теми же фильтрами, что и у списочного эндпоинта."""
+        columns = [column for column in self.table.columns if not column.info.get("internal")]
+        return self.where(select(*columns), params).order_by(*self.table.primary_key.columns)
+
+    def where(self, query, params):
+        for name in self.filters:
+            if name in params:
+                query = query.where(self.table.c[name] == parse(params[name], int, name))
+
+        if self.date_column:
+            column = self.table.c[self.date_column]
+            parser = datetime.fromisoformat if isinstance(column.type, DateTime) else date.fromisoformat
+            if "date_from" in params:
+                query = query.where(column >= parse(params["date_from"], parser, "date_from"))
+            if "date_to" in params:
+                query = query.where(column <= parse(params["date_to"], parser, "date_to"))
+
+        return query
+
+
+EXPORTS = {
+    "categories": Export(models.ProductCategory),
+    "positions": Export(models.EmployeePosition),
+    "stores": Export(models.Store),
+    "employees": Export(models.Employee, ["StoreID", "PositionID"]),
+    "customers": Export(models.Customer),
+    "products": Export(models.Product, ["CategoryID"]),
+    "sales": Export(models.Sale, ["StoreID", "EmployeeID", "CustomerID"], "SaleDate"),
+    "sale-items": Export(models.SaleItem, ["SaleID", "ProductID"]),
+    "supplies": Export(models.Supply, ["SupplierID", "ProductID"], "SupplyDate"),
+    "inventory": Export(models.Inventory, ["StoreID", "ProductID"])
+}
+
+
+def parse(value, parser, name):
+    try:
+        return parser(value)
+    except ValueError:
+        raise HTTPException(400, f"Invalid value for {name}")
+
+
+def to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def batches(statement):
+    # Отдельное соединение (с реплики, если задана) живёт, пока клиент читает ответ
+    with read_engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=BATCH_SIZE).execute(statement)
+        yield list(result.keys())
+        for rows in result.partitions():
+            yield rows
+
+
+def ndjson_lines(statement):
+    rows = batches(statement)
+    columns = next(rows)
+    for batch in rows:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=to_json, ensure_ascii=False) + "\n"
+            for row in batch
+        )
+
+
+def csv_lines(statement):
+    rows = batches(statement)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(next(rows))
+    for batch in rows:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Заголовок пустой выгрузки
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream(entity, params, format):
+    export = EXPORTS.get(entity)
+    if export is None:
+        raise HTTPException(404, "Unknown export entity")
+
+    # Ошибки фильтров проверяются до начала ответа, а не посреди потока
+    statement = export.statement(params)
+    lines = ndjson_lines(statement) if format == "ndjson" else csv_lines(statement)
+    return StreamingResponse(
+        lines,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{format}"'}
+    )
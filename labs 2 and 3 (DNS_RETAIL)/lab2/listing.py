@@ -0,0 +1,47 @@
+# listing.py — быстрый путь для списков: кортежи колонок из SQLAlchemy Core сразу в байты JSON,
+# без ORM-объектов и без проверки каждой строки через response_model.
+# Колонки берутся по полям Read-схемы в её порядке, поэтому ответ тот же, что описан в OpenAPI:
+# Decimal отдаётся числом, даты — в ISO 8601 (как в /export).
+import json
+from fastapi import Response
+from sqlalchemy import Float, Numeric, select, type_coerce
+from export import to_json
+
+try:
+    import orjson
+except ImportError:
+    # Без orjson — стандартный json с теми же настройками, что у JSONResponse FastAPI
+    orjson = None
+
+MEDIA_TYPE = "application/json"
+
+
+def column(model, schema, name):
+    column = model.__table__.c[name]
+    # Поле float из DECIMAL читается сразу как float: без Decimal на каждую строку
+    if schema.model_fields[name].annotation is float and isinstance(column.type, Numeric):
+        return type_coerce(column, Float).label(name)
+    return column
+
+
+def statement(model, schema):
+    """SELECT колонок модели, названных как поля схемы, в порядке полей."""
+    return select(*(column(model, schema, name) for name in schema.model_fields))
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=to_json)
+    return json.dumps(value, default=to_json, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def body(rows):
+    if not rows:
+        return b"[]"
+    names = rows[0]._fields
+    return dumps([dict(zip(names, row)) for row in rows])
+
+
+def respond(response, rows):
+    # Заголовки (X-Next-Cursor) выставлены на response из Depends — переносим их в ответ
+    return Response(body(rows), media_type=MEDIA_TYPE, headers=dict(response.headers))
@@ -0,0 +1,122 @@
+# logs.py — логирование API без файлового ввода-вывода в потоке запроса.
+# Обработчик пишет запись в очередь (QueueHandler), в api.log её пишет
+# отдельный поток QueueListener — одной JSON-строкой на запись.
+# Настройки из окружения:
+#   API_LOG_FILE         файл лога (по умолчанию api.log)
+#   API_LOG_LEVEL        уровень корневого логгера (INFO)
+#   API_LOG_SAMPLE_RATE  доля сохраняемых записей ниже WARNING, 0..1 (1 — все)
+#   API_LOG_SQL          1 — SQL SQLAlchemy в тот же лог через очередь (вместо DB_ECHO)
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FILE = os.getenv("API_LOG_FILE", "api.log")
+LOG_LEVEL = os.getenv("API_LOG_LEVEL", "INFO").upper()
+SAMPLE_RATE = float(os.getenv("API_LOG_SAMPLE_RATE", "1"))
+LOG_SQL = os.getenv("API_LOG_SQL", "0").strip().lower() in ("1", "true", "yes", "on")
+
+# Стандартные атрибуты LogRecord; всё остальное пришло через extra=
+RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_FIELDS)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей ниже WARNING; предупреждения и ошибки — всегда."""
+
+    def __init__(self, rate=SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+        self.passed = 0
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate:
+            self.passed += 1
+            return True
+        self.dropped += 1
+        return False
+
+
+class RecordQueueHandler(QueueHandler):
+    # Стандартный prepare() форматирует запись в потоке запроса;
+    # здесь только фиксируем сообщение, JSON собирает поток записи
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+log_queue = queue.SimpleQueue()
+sampling = SamplingFilter()
+listener = None
+lock = threading.Lock()
+
+
+def setup(filename=LOG_FILE, level=LOG_LEVEL):
+    """Переключает корневой логгер на очередь; повторный вызов ничего не делает."""
+    global listener
+    with lock:
+        if listener is not None:
+            return listener
+
+        handler = RecordQueueHandler(log_queue)
+        handler.addFilter(sampling)
+        root = logging.getLogger()
+        root.handlers[:] = [handler]
+        root.setLevel(level)
+        if LOG_SQL:
+            logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+        file_handler = logging.FileHandler(filename, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        atexit.register(shutdown)
+        return listener
+
+
+def shutdown():
+    # Дописывает оставшиеся в очереди записи и закрывает файл
+    global listener
+    with lock:
+        if listener is None:
+            return
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+
+def stats():
+    return {
+        "queued": log_queue.qsize(),
+        "passed": sampling.passed,
+        "dropped": sampling.dropped,
+        "sample_rate": sampling.rate
+    }
@@ -1,14 +1,30 @@
-from fastapi import FastAPI, HTTPException, Depends
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import models, schemas
-from db import SessionLocal, engine
+from db import API_MODE, ReadSessionLocal, SessionLocal, engine, read_engine
+from pagination import Page, paginate, paginate_rows
+import bulk
+import cache
+import expansion
+import export
+import listing
+import rollup
+import search
+import stock
 import logging
+import logs
+import metrics
+from common import migrations
+from common.database import env_bool, pool_status
 
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="DNS_RETAIL API")
-
-logging.basicConfig(filename="api.log", level=logging.INFO, format="%(asctime)s %(message)s")
+# CRUD-обработчики; в режиме async вместо него подключается router из async_api.py
+router = APIRouter()
+# Остальные маршруты (поиск, экспорт, отчёты, пакеты, метрики) общие для обоих режимов
+service = APIRouter()
 
 
 def get_db():
@@ -19,55 +35,81 @@ def get_db():
         db.close()
 
 
-@app.post("/categories/", response_model=schemas.ProductCategoryRead)
+def get_read_db():
+    # Только для GET: при заданной DATABASE_REPLICA_URL читает с реплики
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("/categories/", response_model=schemas.ProductCategoryRead)
 def create_category(category: schemas.ProductCategoryCreate, db: Session = Depends(get_db)):
     logging.info(f"POST /categories/ {category}")
     db_category = models.ProductCategory(Name=category.Name)
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    search.category_saved(db, db_category)
     return db_category
 
 
-@app.get("/categories/{category_id}", response_model=schemas.ProductCategoryRead)
-def read_category(category_id: int, db: Session = Depends(get_db)):
+@router.get("/categories/{category_id}", response_model=schemas.ProductCategoryRead)
+def read_category(category_id: int, db: Session = Depends(get_read_db)):
     logging.info(f"GET /categories/{category_id}")
+    cached = cache.reads.get("categories", category_id)
+    if cached is not None:
+        return cached
     db_category = db.query(models.ProductCategory).filter(models.ProductCategory.CategoryID == category_id).first()
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return db_category
+    return cache.reads.put("categories", category_id, cache.serialize(schemas.ProductCategoryRead, db_category))
 
 
-@app.get("/categories/", response_model=list[schemas.ProductCategoryRead])
-def list_categories(db: Session = Depends(get_db)):
+@router.get("/categories/", response_model=list[schemas.ProductCategoryRead])
+def list_categories(request: Request, response: Response, page: Page = Depends(), db: Session = Depends(get_read_db)):
     logging.info("GET /categories/")
-    return db.query(models.ProductCategory).all()
+    query = listing.statement(models.ProductCategory, schemas.ProductCategoryRead)
+    rows = paginate_rows(db, query, models.ProductCategory.CategoryID, page, response)
+    return cache.conditional(request, response, listing.body(rows))
 
 
-@app.put("/categories/{category_id}", response_model=schemas.ProductCategoryRead)
+@router.put("/categories/{category_id}", response_model=schemas.ProductCategoryRead)
 def update_category(category_id: int, category: schemas.ProductCategoryCreate, db: Session = Depends(get_db)):
     logging.info(f"PUT /categories/{category_id} {category}")
     db_category = db.query(models.ProductCategory).filter(models.ProductCategory.CategoryID == category_id).first()
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
+    old = rollup.snapshot(db_category)
     db_category.Name = category.Name
     db.commit()
+    cache.reads.invalidate("categories", category_id)
     db.refresh(db_category)
+    search.category_saved(db, db_category, old)
     return db_category
 
 
-@app.delete("/categories/{category_id}")
+@router.delete("/categories/{category_id}")
 def delete_category(category_id: int, db: Session = Depends(get_db)):
     logging.info(f"DELETE /categories/{category_id}")
     db_category = db.query(models.ProductCategory).filter(models.ProductCategory.CategoryID == category_id).first()
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
+    old = rollup.snapshot(db_category)
+    # Товары категории остаются с CategoryID = NULL — их карточки в кэше тоже устарели
+    stale = cache.nulled_on_delete(db, "categories", category_id)
+    rollup.category_deleted(db, db_category)
     db.delete(db_category)
     db.commit()
+    cache.reads.invalidate("categories", category_id)
+    for child, child_id in stale:
+        cache.reads.invalidate(child, child_id)
+    search.category_deleted(db, old)
     return {"detail": "Category deleted"}
 
 
-@app.post("/positions/", response_model=schemas.EmployeePositionRead)
+@router.post("/positions/", response_model=schemas.EmployeePositionRead)
 def create_position(position: schemas.EmployeePositionCreate, db: Session = Depends(get_db)):
     logging.info(f"POST /positions/ {position}")
     obj = models.EmployeePosition(**position.dict())
@@ -77,40 +119,47 @@ def create_position(position: schemas.EmployeePositionCreate, db: Session = Depe
     return obj
 
 
-@app.get("/positions/", response_model=list[schemas.EmployeePositionRead])
-def list_positions(db: Session = Depends(get_db)):
-    return db.query(models.EmployeePosition).all()
+@router.get("/positions/", response_model=list[schemas.EmployeePositionRead])
+def list_positions(request: Request, response: Response, page: Page = Depends(), db: Session = Depends(get_read_db)):
+    query = listing.statement(models.EmployeePosition, schemas.EmployeePositionRead)
+    rows = paginate_rows(db, query, models.EmployeePosition.PositionID, page, response)
+    return cache.conditional(request, response, listing.body(rows))
 
 
-@app.get("/positions/{id}", response_model=schemas.EmployeePositionRead)
-def get_position(id: int, db: Session = Depends(get_db)):
+@router.get("/positions/{id}", response_model=schemas.EmployeePositionRead)
+def get_position(id: int, db: Session = Depends(get_read_db)):
+    cached = cache.reads.get("positions", id)
+    if cached is not None:
+        return cached
     obj = db.query(models.EmployeePosition).get(id)
     if not obj:
         raise HTTPException(404, "Position not found")
-    return obj
+    return cache.reads.put("positions", id, cache.serialize(schemas.EmployeePositionRead, obj))
 
 
-@app.put("/positions/{id}", response_model=schemas.EmployeePositionRead)
+@router.put("/positions/{id}", response_model=schemas.EmployeePositionRead)
 def update_position(id: int, position: schemas.EmployeePositionCreate, db: Session = Depends(get_db)):
     obj = db.query(models.EmployeePosition).get(id)
     if not obj:
         raise HTTPException(404, "Position not found")
     obj.Name = position.Name
     db.commit()
+    cache.reads.invalidate("positions", id)
     return obj
 
 
-@app.delete("/positions/{id}")
+@router.delete("/positions/{id}")
 def delete_position(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.EmployeePosition).get(id)
     if not obj:
         raise HTTPException(404, "Position not found")
     db.delete(obj)
     db.commit()
+    cache.reads.invalidate("positions", id)
     return {"detail": "Deleted"}
 
 
-@app.post("/stores/", response_model=schemas.StoreRead)
+@router.post("/stores/", response_model=schemas.StoreRead)
 def create_store(store: schemas.StoreCreate, db: Session = Depends(get_db)):
     obj = models.Store(**store.dict())
     db.add(obj)
@@ -119,20 +168,24 @@ def create_store(store: schemas.StoreCreate, db: Session = Depends(get_db)):
     return obj
 
 
-@app.get("/stores/", response_model=list[schemas.StoreRead])
-def list_stores(db: Session = Depends(get_db)):
-    return db.query(models.Store).all()
+@router.get("/stores/", response_model=list[schemas.StoreRead])
+def list_stores(request: Request, response: Response, page: Page = Depends(), db: Session = Depends(get_read_db)):
+    rows = paginate_rows(db, listing.statement(models.Store, schemas.StoreRead), models.Store.StoreID, page, response)
+    return cache.conditional(request, response, listing.body(rows))
 
 
-@app.get("/stores/{id}", response_model=schemas.StoreRead)
-def get_store(id: int, db: Session = Depends(get_db)):
+@router.get("/stores/{id}", response_model=schemas.StoreRead)
+def get_store(id: int, db: Session = Depends(get_read_db)):
+    cached = cache.reads.get("stores", id)
+    if cached is not None:
+        return cached
     obj = db.query(models.Store).get(id)
     if not obj:
         raise HTTPException(404, "Store not found")
-    return obj
+    return cache.reads.put("stores", id, cache.serialize(schemas.StoreRead, obj))
 
 
-@app.put("/stores/{id}", response_model=schemas.StoreRead)
+@router.put("/stores/{id}", response_model=schemas.StoreRead)
 def update_store(id: int, store: schemas.StoreCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Store).get(id)
     if not obj:
@@ -140,20 +193,23 @@ def update_store(id: int, store: schemas.StoreCreate, db: Session = Depends(get_
     obj.Name = store.Name
     obj.Address = store.Address
     db.commit()
+    cache.reads.invalidate("stores", id)
     return obj
 
 
-@app.delete("/stores/{id}")
+@router.delete("/stores/{id}")
 def delete_store(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Store).get(id)
     if not obj:
         raise HTTPException(404, "Store not found")
+    rollup.store_deleted(db, obj)
     db.delete(obj)
     db.commit()
+    cache.reads.invalidate("stores", id)
     return {"detail": "Deleted"}
 
 
-@app.post("/employees/", response_model=schemas.EmployeeRead)
+@router.post("/employees/", response_model=schemas.EmployeeRead)
 def create_employee(emp: schemas.EmployeeCreate, db: Session = Depends(get_db)):
     obj = models.Employee(**emp.dict())
     db.add(obj)
@@ -162,20 +218,22 @@ def create_employee(emp: schemas.EmployeeCreate, db: Session = Depends(get_db)):
     return obj
 
 
-@app.get("/employees/", response_model=list[schemas.EmployeeRead])
-def list_employees(db: Session = Depends(get_db)):
-    return db.query(models.Employee).all()
+@router.get("/employees/", response_model=list[schemas.EmployeeRead])
+def list_employees(response: Response, page: Page = Depends(), where=Depends(export.EXPORTS["employees"].list_filters),
+                   db: Session = Depends(get_read_db)):
+    query = where(listing.statement(models.Employee, schemas.EmployeeRead))
+    return listing.respond(response, paginate_rows(db, query, models.Employee.EmployeeID, page, response))
 
 
-@app.get("/employees/{id}", response_model=schemas.EmployeeRead)
-def get_employee(id: int, db: Session = Depends(get_db)):
+@router.get("/employees/{id}", response_model=schemas.EmployeeRead)
+def get_employee(id: int, db: Session = Depends(get_read_db)):
     obj = db.query(models.Employee).get(id)
     if not obj:
         raise HTTPException(404, "Employee not found")
     return obj
 
 
-@app.put("/employees/{id}", response_model=schemas.EmployeeRead)
+@router.put("/employees/{id}", response_model=schemas.EmployeeRead)
 def update_employee(id: int, emp: schemas.EmployeeCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Employee).get(id)
     if not obj:
@@ -186,7 +244,7 @@ def update_employee(id: int, emp: schemas.EmployeeCreate, db: Session = Depends(
     return obj
 
 
-@app.delete("/employees/{id}")
+@router.delete("/employees/{id}")
 def delete_employee(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Employee).get(id)
     if not obj:
@@ -196,7 +254,7 @@ def delete_employee(id: int, db: Session = Depends(get_db)):
     return {"detail": "Deleted"}
 
 
-@app.post("/customers/", response_model=schemas.CustomerRead)
+@router.post("/customers/", response_model=schemas.CustomerRead)
 def create_customer(c: schemas.CustomerCreate, db: Session = Depends(get_db)):
     obj = models.Customer(**c.dict())
     db.add(obj)
@@ -205,20 +263,21 @@ def create_customer(c: schemas.CustomerCreate, db: Session = Depends(get_db)):
     return obj
 
 
-@app.get("/customers/", response_model=list[schemas.CustomerRead])
-def list_customers(db: Session = Depends(get_db)):
-    return db.query(models.Customer).all()
+@router.get("/customers/", response_model=list[schemas.CustomerRead])
+def list_customers(response: Response, page: Page = Depends(), db: Session = Depends(get_read_db)):
+    query = listing.statement(models.Customer, schemas.CustomerRead)
+    return listing.respond(response, paginate_rows(db, query, models.Customer.CustomerID, page, response))
 
 
-@app.get("/customers/{id}", response_model=schemas.CustomerRead)
-def get_customer(id: int, db: Session = Depends(get_db)):
+@router.get("/customers/{id}", response_model=schemas.CustomerRead)
+def get_customer(id: int, db: Session = Depends(get_read_db)):
     obj = db.query(models.Customer).get(id)
     if not obj:
         raise HTTPException(404, "Customer not found")
     return obj
 
 
-@app.put("/customers/{id}", response_model=schemas.CustomerRead)
+@router.put("/customers/{id}", response_model=schemas.CustomerRead)
 def update_customer(id: int, c: schemas.CustomerCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Customer).get(id)
     if not obj:
@@ -229,7 +288,7 @@ def update_customer(id: int, c: schemas.CustomerCreate, db: Session = Depends(ge
     return obj
 
 
-@app.delete("/customers/{id}")
+@router.delete("/customers/{id}")
 def delete_customer(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Customer).get(id)
     if not obj:
@@ -239,145 +298,179 @@ def delete_customer(id: int, db: Session = Depends(get_db)):
     return {"detail": "Deleted"}
 
 
-@app.post("/products/", response_model=schemas.ProductRead)
+@router.post("/products/", response_model=schemas.ProductRead)
 def create_product(p: schemas.ProductCreate, db: Session = Depends(get_db)):
     obj = models.Product(**p.dict())
     db.add(obj)
     db.commit()
     db.refresh(obj)
+    search.product_saved(db, obj)
     return obj
 
 
-@app.get("/products/", response_model=list[schemas.ProductRead])
-def list_products(db: Session = Depends(get_db)):
-    return db.query(models.Product).all()
+@router.get("/products/", response_model=list[schemas.ProductRead])
+def list_products(request: Request, response: Response, page: Page = Depends(),
+                  where=Depends(export.EXPORTS["products"].list_filters), db: Session = Depends(get_read_db)):
+    query = where(listing.statement(models.Product, schemas.ProductRead))
+    rows = paginate_rows(db, query, models.Product.ProductID, page, response)
+    return cache.conditional(request, response, listing.body(rows))
 
 
-@app.get("/products/{id}", response_model=schemas.ProductRead)
-def get_product(id: int, db: Session = Depends(get_db)):
+@router.get("/products/{id}", response_model=schemas.ProductRead)
+def get_product(id: int, db: Session = Depends(get_read_db)):
+    cached = cache.reads.get("products", id)
+    if cached is not None:
+        return cached
     obj = db.query(models.Product).get(id)
     if not obj:
         raise HTTPException(404, "Product not found")
-    return obj
+    return cache.reads.put("products", id, cache.serialize(schemas.ProductRead, obj))
 
 
-@app.put("/products/{id}", response_model=schemas.ProductRead)
+@router.put("/products/{id}", response_model=schemas.ProductRead)
 def update_product(id: int, p: schemas.ProductCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Product).get(id)
     if not obj:
         raise HTTPException(404, "Product not found")
+    old = rollup.snapshot(obj)
     for k, v in p.dict().items():
         setattr(obj, k, v)
+    rollup.product_updated(db, obj, old)
     db.commit()
+    cache.reads.invalidate("products", id)
+    search.product_saved(db, obj, old)
     return obj
 
 
-@app.delete("/products/{id}")
+@router.delete("/products/{id}")
 def delete_product(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Product).get(id)
     if not obj:
         raise HTTPException(404, "Product not found")
+    old = rollup.snapshot(obj)
+    rollup.product_deleted(db, obj)
     db.delete(obj)
     db.commit()
+    cache.reads.invalidate("products", id)
+    search.product_deleted(db, old)
     return {"detail": "Deleted"}
 
 
-@app.post("/sales/", response_model=schemas.SaleRead)
+@router.post("/sales/", response_model=schemas.SaleRead)
 def create_sale(s: schemas.SaleCreate, db: Session = Depends(get_db)):
     obj = models.Sale(**s.dict())
     db.add(obj)
+    rollup.sale_created(db, obj)
     db.commit()
     db.refresh(obj)
     return obj
 
 
-@app.post("/sales/", response_model=schemas.SaleRead)
+@router.post("/sales/", response_model=schemas.SaleRead)
 def create_sale(s: schemas.SaleCreate, db: Session = Depends(get_db)):
     obj = models.Sale(**s.dict())
     db.add(obj)
+    rollup.sale_created(db, obj)
     db.commit()
     db.refresh(obj)
     return obj
 
 
-@app.get("/sales/", response_model=list[schemas.SaleRead])
-def list_sales(db: Session = Depends(get_db)):
-    return db.query(models.Sale).all()
+@router.get("/sales/", response_model=list[schemas.SaleRead])
+def list_sales(response: Response, page: Page = Depends(), where=Depends(export.EXPORTS["sales"].list_filters),
+               db: Session = Depends(get_read_db)):
+    query = where(listing.statement(models.Sale, schemas.SaleRead))
+    return listing.respond(response, paginate_rows(db, query, models.Sale.SaleID, page, response))
 
 
-@app.get("/sales/{id}", response_model=schemas.SaleRead)
-def get_sale(id: int, db: Session = Depends(get_db)):
-    obj = db.query(models.Sale).get(id)
+@router.get("/sales/{id}", response_model=schemas.SaleExpanded, response_model_exclude_unset=True)
+def get_sale(id: int, expand: Optional[str] = None, db: Session = Depends(get_read_db)):
+    tree = expansion.parse(models.Sale, expand)
+    obj = db.query(models.Sale).options(*expansion.loader_options(models.Sale, tree)).get(id)
     if not obj:
         raise HTTPException(404, "Sale not found")
-    return obj
+    return expansion.serialize(obj, tree)
 
 
-@app.put("/sales/{id}", response_model=schemas.SaleRead)
+@router.put("/sales/{id}", response_model=schemas.SaleRead)
 def update_sale(id: int, s: schemas.SaleCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Sale).get(id)
     if not obj:
         raise HTTPException(404, "Sale not found")
+    old = rollup.snapshot(obj)
     for k, v in s.dict().items():
         setattr(obj, k, v)
+    stock.sale_updated(db, obj, old)
+    rollup.sale_updated(db, obj, old)
     db.commit()
     return obj
 
 
-@app.delete("/sales/{id}")
+@router.delete("/sales/{id}")
 def delete_sale(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Sale).get(id)
     if not obj:
         raise HTTPException(404, "Sale not found")
+    stock.sale_deleted(db, obj)
+    rollup.sale_deleted(db, obj)
     db.delete(obj)
     db.commit()
     return {"detail": "Deleted"}
 
 
-@app.post("/sale-items/", response_model=schemas.SaleItemRead)
+@router.post("/sale-items/", response_model=schemas.SaleItemRead)
 def create_sale_item(si: schemas.SaleItemCreate, db: Session = Depends(get_db)):
     obj = models.SaleItem(**si.dict())
     db.add(obj)
+    stock.item_created(db, obj)
+    rollup.item_created(db, obj)
     db.commit()
     db.refresh(obj)
     return obj
 
 
-@app.get("/sale-items/", response_model=list[schemas.SaleItemRead])
-def list_sale_items(db: Session = Depends(get_db)):
-    return db.query(models.SaleItem).all()
+@router.get("/sale-items/", response_model=list[schemas.SaleItemRead])
+def list_sale_items(response: Response, page: Page = Depends(),
+                    where=Depends(export.EXPORTS["sale-items"].list_filters), db: Session = Depends(get_read_db)):
+    query = where(listing.statement(models.SaleItem, schemas.SaleItemRead))
+    return listing.respond(response, paginate_rows(db, query, models.SaleItem.SaleItemID, page, response))
 
 
-@app.get("/sale-items/{id}", response_model=schemas.SaleItemRead)
-def get_sale_item(id: int, db: Session = Depends(get_db)):
+@router.get("/sale-items/{id}", response_model=schemas.SaleItemRead)
+def get_sale_item(id: int, db: Session = Depends(get_read_db)):
     obj = db.query(models.SaleItem).get(id)
     if not obj:
         raise HTTPException(404, "Sale item not found")
     return obj
 
 
-@app.put("/sale-items/{id}", response_model=schemas.SaleItemRead)
+@router.put("/sale-items/{id}", response_model=schemas.SaleItemRead)
 def update_sale_item(id: int, si: schemas.SaleItemCreate, db: Session = Depends(get_db)):
     obj = db.query(models.SaleItem).get(id)
     if not obj:
         raise HTTPException(404, "Sale item not found")
+    old = rollup.snapshot(obj)
     for k, v in si.dict().items():
         setattr(obj, k, v)
+    stock.item_updated(db, obj, old)
+    rollup.item_updated(db, obj, old)
     db.commit()
     return obj
 
 
-@app.delete("/sale-items/{id}")
+@router.delete("/sale-items/{id}")
 def delete_sale_item(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.SaleItem).get(id)
     if not obj:
         raise HTTPException(404, "Sale item not found")
+    stock.item_deleted(db, obj)
+    rollup.item_deleted(db, obj)
     db.delete(obj)
     db.commit()
     return {"detail": "Deleted"}
 
 
-@app.post("/supplies/", response_model=schemas.SupplyRead)
+@router.post("/supplies/", response_model=schemas.SupplyRead)
 def create_supply(s: schemas.SupplyCreate, db: Session = Depends(get_db)):
     obj = models.Supply(**s.dict())
     db.add(obj)
@@ -386,20 +479,22 @@ def create_supply(s: schemas.SupplyCreate, db: Session = Depends(get_db)):
     return obj
 
 
-@app.get("/supplies/", response_model=list[schemas.SupplyRead])
-def list_supplies(db: Session = Depends(get_db)):
-    return db.query(models.Supply).all()
+@router.get("/supplies/", response_model=list[schemas.SupplyRead])
+def list_supplies(response: Response, page: Page = Depends(), where=Depends(export.EXPORTS["supplies"].list_filters),
+                  db: Session = Depends(get_read_db)):
+    query = where(listing.statement(models.Supply, schemas.SupplyRead))
+    return listing.respond(response, paginate_rows(db, query, models.Supply.SupplyID, page, response))
 
 
-@app.get("/supplies/{id}", response_model=schemas.SupplyRead)
-def get_supply(id: int, db: Session = Depends(get_db)):
+@router.get("/supplies/{id}", response_model=schemas.SupplyRead)
+def get_supply(id: int, db: Session = Depends(get_read_db)):
     obj = db.query(models.Supply).get(id)
     if not obj:
         raise HTTPException(404, "Supply not found")
     return obj
 
 
-@app.put("/supplies/{id}", response_model=schemas.SupplyRead)
+@router.put("/supplies/{id}", response_model=schemas.SupplyRead)
 def update_supply(id: int, s: schemas.SupplyCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Supply).get(id)
     if not obj:
@@ -410,7 +505,7 @@ def update_supply(id: int, s: schemas.SupplyCreate, db: Session = Depends(get_db
     return obj
 
 
-@app.delete("/supplies/{id}")
+@router.delete("/supplies/{id}")
 def delete_supply(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Supply).get(id)
     if not obj:
@@ -420,7 +515,7 @@ def delete_supply(id: int, db: Session = Depends(get_db)):
     return {"detail": "Deleted"}
 
 
-@app.post("/inventory/", response_model=schemas.InventoryRead)
+@router.post("/inventory/", response_model=schemas.InventoryRead)
 def create_inventory(i: schemas.InventoryCreate, db: Session = Depends(get_db)):
     obj = models.Inventory(**i.dict())
     db.add(obj)
@@ -429,20 +524,22 @@ def create_inventory(i: schemas.InventoryCreate, db: Session = Depends(get_db)):
     return obj
 
 
-@app.get("/inventory/", response_model=list[schemas.InventoryRead])
-def list_inventory(db: Session = Depends(get_db)):
-    return db.query(models.Inventory).all()
+@router.get("/inventory/", response_model=list[schemas.InventoryRead])
+def list_inventory(response: Response, page: Page = Depends(), where=Depends(export.EXPORTS["inventory"].list_filters),
+                   db: Session = Depends(get_read_db)):
+    query = where(listing.statement(models.Inventory, schemas.InventoryRead))
+    return listing.respond(response, paginate_rows(db, query, models.Inventory.InventoryID, page, response))
 
 
-@app.get("/inventory/{id}", response_model=schemas.InventoryRead)
-def get_inventory(id: int, db: Session = Depends(get_db)):
+@router.get("/inventory/{id}", response_model=schemas.InventoryRead)
+def get_inventory(id: int, db: Session = Depends(get_read_db)):
     obj = db.query(models.Inventory).get(id)
     if not obj:
         raise HTTPException(404, "Inventory not found")
     return obj
 
 
-@app.put("/inventory/{id}", response_model=schemas.InventoryRead)
+@router.put("/inventory/{id}", response_model=schemas.InventoryRead)
 def update_inventory(id: int, i: schemas.InventoryCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Inventory).get(id)
     if not obj:
@@ -453,7 +550,7 @@ def update_inventory(id: int, i: schemas.InventoryCreate, db: Session = Depends(
     return obj
 
 
-@app.delete("/inventory/{id}")
+@router.delete("/inventory/{id}")
 def delete_inventory(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Inventory).get(id)
     if not obj:
@@ -462,3 +559,140 @@ def delete_inventory(id: int, db: Session = Depends(get_db)):
     db.commit()
     return {"detail": "Deleted"}
 
+
+def migrate():
+    # DB_MIGRATE=0 — схему обновляют отдельно: python -m common.migrations
+    if env_bool("DB_MIGRATE", True):
+        migrations.upgrade(engine)
+
+
+def integrity_error(request: Request, e: IntegrityError):
+    # Повтор уникального ключа (UQ_* в common/migrations.py) или ссылка на несуществующую строку
+    logging.warning(f"{request.method} {request.url.path}: {e.orig}")
+    return JSONResponse(status_code=409, content={"detail": "Conflicts with existing data"})
+
+
+def build_search_index():
+    # Иначе индекс строится при первом поиске
+    with ReadSessionLocal() as db:
+        search.build(db)
+    logging.info(f"Search index: {search.products.stats()}")
+
+
+@service.get("/products/search", response_model=list[schemas.ProductRead])
+def search_products(q: str, limit: int = Query(search.DEFAULT_LIMIT, ge=1, le=search.MAX_LIMIT),
+                    db: Session = Depends(get_read_db)):
+    # service подключается раньше router, иначе "search" разбирался бы как id из /products/{id}
+    ids = search.search(db, q, limit)
+    rows = {row.ProductID: row for row in db.query(models.Product).filter(models.Product.ProductID.in_(ids))}
+    return [rows[id] for id in ids if id in rows]
+
+
+@service.get("/export/{entity}")
+def export_entity(entity: str, request: Request, format: Literal["ndjson", "csv"] = "ndjson"):
+    logging.info(f"GET /export/{entity} {request.query_params}")
+    return export.stream(entity, request.query_params, format)
+
+
+@service.get("/stores/{id}/inventory", response_model=list[schemas.InventoryExpanded], response_model_exclude_unset=True)
+def get_store_inventory(id: int, response: Response, page: Page = Depends(), expand: str = "product",
+                        db: Session = Depends(get_read_db)):
+    logging.info(f"GET /stores/{id}/inventory")
+    if not db.query(models.Store).get(id):
+        raise HTTPException(404, "Store not found")
+    tree = expansion.parse(models.Inventory, expand)
+    query = db.query(models.Inventory).options(*expansion.loader_options(models.Inventory, tree))
+    rows = paginate(query.filter(models.Inventory.StoreID == id), models.Inventory.InventoryID, page, response)
+    return [expansion.serialize(row, tree) for row in rows]
+
+
+@service.get("/db/pool")
+def db_pool():
+    pools = {"primary": pool_status(engine)}
+    if read_engine is not engine:
+        pools["replica"] = pool_status(read_engine)
+    if API_MODE == "async":
+        import async_db
+        pools["async_primary"] = pool_status(async_db.async_engine)
+        if async_db.async_read_engine is not async_db.async_engine:
+            pools["async_replica"] = pool_status(async_db.async_read_engine)
+    return pools
+
+
+@service.get("/metrics")
+async def read_metrics():
+    # В цикле событий, как и MetricsMiddleware: счётчики не меняются во время чтения
+    return Response(metrics.prometheus(db_pool(), logs.stats()), media_type="text/plain; version=0.0.4")
+
+
+@service.get("/cache/stats")
+def cache_stats():
+    return cache.reads.stats()
+
+
+@service.get("/reports/sales/{by}", response_model=list[schemas.SalesReportRow])
+def sales_report(by: Literal["store", "category", "day"], date_from: Optional[date] = None,
+                 date_to: Optional[date] = None, StoreID: Optional[int] = None,
+                 CategoryID: Optional[int] = None, db: Session = Depends(get_read_db)):
+    logging.info(f"GET /reports/sales/{by}")
+    return rollup.report(db, by, date_from, date_to, StoreID, CategoryID)
+
+
+def check_bulk_size(rows):
+    if len(rows) > bulk.MAX_BULK_SIZE:
+        raise HTTPException(413, f"At most {bulk.MAX_BULK_SIZE} rows per request")
+
+
+@service.post("/sales/batch", response_model=schemas.BulkResult)
+def create_sales_batch(receipts: list[schemas.SaleWithItemsCreate], db: Session = Depends(get_db)):
+    logging.info(f"POST /sales/batch {len(receipts)} receipts")
+    check_bulk_size(receipts)
+    return bulk.create_sales(db, receipts)
+
+
+@service.post("/supplies/bulk", response_model=schemas.BulkResult)
+def create_supplies_bulk(rows: list[schemas.SupplyCreate], db: Session = Depends(get_db)):
+    logging.info(f"POST /supplies/bulk {len(rows)} rows")
+    check_bulk_size(rows)
+    return bulk.create_rows(db, models.Supply, [row.dict() for row in rows])
+
+
+@service.post("/inventory/bulk", response_model=schemas.BulkResult)
+def create_inventory_bulk(rows: list[schemas.InventoryCreate], db: Session = Depends(get_db)):
+    logging.info(f"POST /inventory/bulk {len(rows)} rows")
+    check_bulk_size(rows)
+    return bulk.create_rows(db, models.Inventory, [row.dict() for row in rows])
+
+
+@service.post("/inventory/{id}/adjust", response_model=schemas.InventoryRead)
+def adjust_inventory(id: int, a: schemas.InventoryAdjust, db: Session = Depends(get_db)):
+    # Приход/списание относительно текущего остатка, в отличие от PUT с абсолютным Quantity
+    logging.info(f"POST /inventory/{id}/adjust {a}")
+    stock.adjust(db, id, a.Delta)
+    db.commit()
+    return db.query(models.Inventory).get(id)
+
+
+def create_app():
+    """Приложение API. Импорт модуля и вызов create_app() не трогают ни базу, ни файлы:
+    лог, миграции и индекс поиска — в startup, при запуске под uvicorn или TestClient.
+    """
+    app = FastAPI(title="DNS_RETAIL API")
+    app.add_middleware(metrics.MetricsMiddleware)
+    # JSON в api.log пишет отдельный поток, обработчик только кладёт запись в очередь
+    app.add_event_handler("startup", logs.setup)
+    app.add_event_handler("startup", migrate)
+    app.add_event_handler("startup", build_search_index)
+    app.add_exception_handler(IntegrityError, integrity_error)
+    app.include_router(service)
+    # Синхронные обработчики или их async-версии из async_api.py
+    if API_MODE == "async":
+        from async_api import router as crud
+    else:
+        crud = router
+    app.include_router(crud)
+    return app
+
+
+# uvicorn main:app (или uvicorn --factory main:create_app)
+app = create_app()
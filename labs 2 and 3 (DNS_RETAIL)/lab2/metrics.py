@@ -0,0 +1,157 @@
+# metrics.py — задержки по маршрутам и число запросов в работе, формат Prometheus для /metrics.
+# Счётчики живут в памяти процесса: при нескольких воркерах uvicorn у каждого свои.
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+# Границы корзин гистограммы задержки, с
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Запросы дольше порога пишутся в лог как WARNING и не попадают под сэмплирование
+SLOW_REQUEST_MS = float(os.getenv("API_SLOW_REQUEST_MS", "1000"))
+
+# Путь без совпавшего маршрута (404) — одной меткой, чтобы не плодить серии
+UNMATCHED = "<unmatched>"
+
+POOL_METRICS = [
+    ("checked_out", "api_db_pool_checked_out", "Соединений выдано из пула"),
+    ("checkouts", "api_db_pool_checkouts", "Выдач соединений с запуска"),
+    ("timeouts", "api_db_pool_timeouts", "Тайм-аутов ожидания соединения"),
+    ("wait_seconds", "api_db_pool_wait_seconds", "Суммарное ожидание соединения, с")
+]
+
+LOG_METRICS = [
+    ("queued", "api_log_queue_size", "Записей лога в очереди на запись"),
+    ("passed", "api_log_records", "Записей лога прошло сэмплирование"),
+    ("dropped", "api_log_records_dropped", "Записей лога отброшено сэмплированием")
+]
+
+access_log = logging.getLogger("api.access")
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestMetrics:
+    """Обновляется только из цикла событий (middleware), поэтому без блокировок."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latency = defaultdict(Histogram)
+        self.responses = defaultdict(int)
+        # Маршрут известен только после роутинга, поэтому запросы в работе считаются общим числом
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def start(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finish(self, method, route, status, seconds):
+        self.in_flight -= 1
+        self.latency[method, route].observe(seconds)
+        self.responses[method, route, status] += 1
+
+
+requests = RequestMetrics()
+
+
+def route_of(scope):
+    # APIRoute кладёт себя в scope при совпадении пути
+    return getattr(scope.get("route"), "path", UNMATCHED)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержка считается до отправки последнего байта ответа (важно для /export)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+        requests.start()
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            seconds = time.perf_counter() - started
+            method, route = scope["method"], route_of(scope)
+            requests.finish(method, route, status, seconds)
+            ms = round(seconds * 1000, 3)
+            access_log.log(
+                logging.WARNING if ms >= SLOW_REQUEST_MS else logging.INFO,
+                f"{method} {scope['path']} {status} {ms} ms",
+                extra={"method": method, "route": route, "status": status, "ms": ms}
+            )
+
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus(pools=None, log_stats=None):
+    """Текст для /metrics; pools — {имя: pool_status()}, log_stats — logs.stats()."""
+    lines = [
+        "# HELP api_requests_in_flight Запросов в обработке",
+        "# TYPE api_requests_in_flight gauge",
+        f"api_requests_in_flight {requests.in_flight}",
+        "# HELP api_requests_in_flight_max Максимум одновременных запросов с запуска",
+        "# TYPE api_requests_in_flight_max gauge",
+        f"api_requests_in_flight_max {requests.max_in_flight}",
+        "# HELP api_requests_total Ответов по маршруту и статусу",
+        "# TYPE api_requests_total counter"
+    ]
+    for (method, route, status), count in sorted(requests.responses.items()):
+        lines.append(f'api_requests_total{{method="{method}",route="{label(route)}",status="{status}"}} {count}')
+
+    lines += [
+        "# HELP api_request_duration_seconds Задержка ответа по маршруту, с",
+        "# TYPE api_request_duration_seconds histogram"
+    ]
+    for (method, route), histogram in sorted(requests.latency.items()):
+        labels = f'method="{method}",route="{label(route)}"'
+        for bound, total in histogram.cumulative():
+            le = "+Inf" if bound == float("inf") else bound
+            lines.append(f'api_request_duration_seconds_bucket{{{labels},le="{le}"}} {total}')
+        lines.append(f"api_request_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+        lines.append(f"api_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+    for key, metric, help_ in POOL_METRICS if pools else []:
+        lines += [f"# HELP {metric} {help_}", f"# TYPE {metric} gauge"]
+        lines += [f'{metric}{{engine="{name}"}} {status[key]}' for name, status in pools.items() if key in status]
+
+    if log_stats is not None:
+        for key, metric, help_ in LOG_METRICS:
+            lines += [f"# HELP {metric} {help_}", f"# TYPE {metric} gauge", f"{metric} {log_stats[key]}"]
+
+    return "\n".join(lines) + "\n"
@@ -1,19 +1,25 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, ForeignKey, DateTime, Date
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DECIMAL, ForeignKey, DateTime, Date, UniqueConstraint
+from sqlalchemy.orm import relationship, validates
 from db import Base
+from common.keys import name_key
+
+
+def name_key_default(context):
+    # Вставки через Core (bulk, наполнение в бенчмарках) идут мимо validates
+    return name_key(context.get_current_parameters()["Name"])
 
 
 # Справочники
 class ProductCategory(Base):
     __tablename__ = "ProductCategory"
-    CategoryID = Column(Integer, primary_key=True, index=True)
+    CategoryID = Column(Integer, primary_key=True)
     Name = Column(String(100), nullable=False)
     products = relationship("Product", back_populates="category")
 
 
 class EmployeePosition(Base):
     __tablename__ = "EmployeePosition"
-    PositionID = Column(Integer, primary_key=True, index=True)
+    PositionID = Column(Integer, primary_key=True)
     Name = Column(String(100), nullable=False)
     employees = relationship("Employee", back_populates="position")
 
@@ -21,7 +27,7 @@ class EmployeePosition(Base):
 # Магазины
 class Store(Base):
     __tablename__ = "Store"
-    StoreID = Column(Integer, primary_key=True, index=True)
+    StoreID = Column(Integer, primary_key=True)
     Name = Column(String(100), nullable=False)
     Address = Column(String(255), nullable=False)
     employees = relationship("Employee", back_populates="store")
@@ -32,7 +38,7 @@ class Store(Base):
 # Сотрудники
 class Employee(Base):
     __tablename__ = "Employee"
-    EmployeeID = Column(Integer, primary_key=True, index=True)
+    EmployeeID = Column(Integer, primary_key=True)
     FullName = Column(String(150), nullable=False)
     PositionID = Column(Integer, ForeignKey("EmployeePosition.PositionID"))
     StoreID = Column(Integer, ForeignKey("Store.StoreID"))
@@ -44,7 +50,7 @@ class Employee(Base):
 # Клиенты
 class Customer(Base):
     __tablename__ = "Customer"
-    CustomerID = Column(Integer, primary_key=True, index=True)
+    CustomerID = Column(Integer, primary_key=True)
     FullName = Column(String(150))
     Phone = Column(String(20))
     sales = relationship("Sale", back_populates="customer")
@@ -53,8 +59,13 @@ class Customer(Base):
 # Товары
 class Product(Base):
     __tablename__ = "Product"
-    ProductID = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        UniqueConstraint("NameKey", "CategoryID", name="UQ_Product_NameKey_Category"),
+    )
+    ProductID = Column(Integer, primary_key=True)
     Name = Column(String(150), nullable=False)
+    # Служебная колонка (common/keys.py): в ответы и выгрузки не попадает
+    NameKey = Column(String(300), default=name_key_default, info={"internal": True})
     Price = Column(DECIMAL(10,2), nullable=False)
     CategoryID = Column(Integer, ForeignKey("ProductCategory.CategoryID"))
     category = relationship("ProductCategory", back_populates="products")
@@ -62,11 +73,16 @@ class Product(Base):
     supplies = relationship("Supply", back_populates="product")
     inventories = relationship("Inventory", back_populates="product")
 
+    @validates("Name")
+    def set_name_key(self, key, name):
+        self.NameKey = name_key(name)
+        return name
+
 
 # Продажи
 class Sale(Base):
     __tablename__ = "Sale"
-    SaleID = Column(Integer, primary_key=True, index=True)
+    SaleID = Column(Integer, primary_key=True)
     SaleDate = Column(DateTime, nullable=False)
     StoreID = Column(Integer, ForeignKey("Store.StoreID"))
     EmployeeID = Column(Integer, ForeignKey("Employee.EmployeeID"))
@@ -80,7 +96,7 @@ class Sale(Base):
 # Позиции чеков
 class SaleItem(Base):
     __tablename__ = "SaleItem"
-    SaleItemID = Column(Integer, primary_key=True, index=True)
+    SaleItemID = Column(Integer, primary_key=True)
     SaleID = Column(Integer, ForeignKey("Sale.SaleID"))
     ProductID = Column(Integer, ForeignKey("Product.ProductID"))
     Quantity = Column(Integer, nullable=False)
@@ -92,7 +108,7 @@ class SaleItem(Base):
 # Поставщики
 class Supplier(Base):
     __tablename__ = "Supplier"
-    SupplierID = Column(Integer, primary_key=True, index=True)
+    SupplierID = Column(Integer, primary_key=True)
     Name = Column(String(150), nullable=False)
     supplies = relationship("Supply", back_populates="supplier")
 
@@ -100,7 +116,7 @@ class Supplier(Base):
 # Поставки
 class Supply(Base):
     __tablename__ = "Supply"
-    SupplyID = Column(Integer, primary_key=True, index=True)
+    SupplyID = Column(Integer, primary_key=True)
     SupplierID = Column(Integer, ForeignKey("Supplier.SupplierID"))
     ProductID = Column(Integer, ForeignKey("Product.ProductID"))
     SupplyDate = Column(Date, nullable=False)
@@ -112,9 +128,32 @@ class Supply(Base):
 # Остатки
 class Inventory(Base):
     __tablename__ = "Inventory"
-    InventoryID = Column(Integer, primary_key=True, index=True)
+    # Одна строка остатка на пару: на это опирается списание в stock.py
+    __table_args__ = (
+        UniqueConstraint("StoreID", "ProductID", name="UQ_Inventory_Store_Product"),
+    )
+    InventoryID = Column(Integer, primary_key=True)
     StoreID = Column(Integer, ForeignKey("Store.StoreID"))
     ProductID = Column(Integer, ForeignKey("Product.ProductID"))
     Quantity = Column(Integer, nullable=False)
     store = relationship("Store", back_populates="inventories")
     product = relationship("Product", back_populates="inventories")
+
+
+# Агрегаты продаж для отчётов (см. rollup.py); 0 в StoreID/CategoryID — не указан
+class SalesDailyStore(Base):
+    __tablename__ = "SalesDailyStore"
+    SaleDay = Column(Date, primary_key=True)
+    StoreID = Column(Integer, primary_key=True)
+    Revenue = Column(DECIMAL(14,2), nullable=False)
+    Units = Column(Integer, nullable=False)
+    Receipts = Column(Integer, nullable=False)
+
+
+class SalesDailyCategory(Base):
+    __tablename__ = "SalesDailyCategory"
+    SaleDay = Column(Date, primary_key=True)
+    StoreID = Column(Integer, primary_key=True)
+    CategoryID = Column(Integer, primary_key=True)
+    Revenue = Column(DECIMAL(14,2), nullable=False)
+    Units = Column(Integer, nullable=False)
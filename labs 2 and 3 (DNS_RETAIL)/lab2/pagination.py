@@ -0,0 +1,111 @@
+import base64
+import inspect
+import json
+from datetime import date, datetime
+from typing import Optional
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import DateTime
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(after):
+    return base64.urlsafe_b64encode(json.dumps({"after": after}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+    # Страницы идут по целочисленному первичному ключу; иное значение дошло бы до SQL
+    if not isinstance(after, int) or isinstance(after, bool):
+        raise HTTPException(400, "Invalid cursor")
+    return after
+
+
+class Page:
+    """Параметры страницы: limit и непрозрачный курсор из заголовка X-Next-Cursor."""
+
+    def __init__(self, limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), cursor: Optional[str] = None):
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+
+
+def apply_filters(query, model, **values):
+    # None — фильтр не задан
+    for name, value in values.items():
+        if value is not None:
+            query = query.filter(getattr(model, name) == value)
+    return query
+
+
+def apply_range(query, column, start=None, end=None):
+    if start is not None:
+        query = query.filter(column >= start)
+    if end is not None:
+        query = query.filter(column <= end)
+    return query
+
+
+def list_filters(model, names=(), date_column=None):
+    """Зависимость с фильтрами списка: names — Optional[int], для date_column — date_from/date_to
+    типа колонки. Отдаёт функцию, которая добавляет заданные фильтры к select().
+
+    Одна и та же для синхронных и асинхронных обработчиков: типы, ответ 422 на неверное
+    значение и параметры в OpenAPI в обоих режимах совпадают.
+    """
+    parameters = [
+        inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Optional[int])
+        for name in names
+    ]
+    column = getattr(model, date_column) if date_column else None
+    if column is not None:
+        kind = datetime if isinstance(column.type, DateTime) else date
+        parameters += [
+            inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Optional[kind])
+            for name in ("date_from", "date_to")
+        ]
+
+    def dependency(**values):
+        def where(query):
+            query = apply_filters(query, model, **{name: values[name] for name in names})
+            if column is not None:
+                query = apply_range(query, column, values["date_from"], values["date_to"])
+            return query
+        return where
+
+    dependency.__signature__ = inspect.Signature(parameters)
+    return dependency
+
+
+def keyset(query, key, page: Page):
+    if page.after is not None:
+        query = query.filter(key > page.after)
+    return query.order_by(key).limit(page.limit + 1)
+
+
+def cut(rows, key, page: Page, response: Response):
+    # Лишняя строка означает, что есть следующая страница
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(rows[-1], key.key))
+    return rows
+
+
+def paginate(query, key, page: Page, response: Response):
+    """Keyset-пагинация по первичному ключу: WHERE key > :after ORDER BY key LIMIT :limit."""
+    return cut(keyset(query, key, page).all(), key, page, response)
+
+
+def paginate_rows(db, query, key, page: Page, response: Response):
+    """То же для select() колонок: строки — Row-кортежи без ORM-объектов."""
+    return cut(db.execute(keyset(query, key, page)).all(), key, page, response)
+
+
+async def paginate_rows_async(db, query, key, page: Page, response: Response):
+    """То же для AsyncSession."""
+    return cut((await db.execute(keyset(query, key, page))).all(), key, page, response)
@@ -0,0 +1,302 @@
+# rollup.py — дневные агрегаты продаж по магазинам и категориям.
+# Обработчики API меняют их в той же транзакции, что и Sale/SaleItem.
+# Корзины — по текущим магазину чека и категории товара, как в rebuild(): смена категории
+# товара и удаления, после которых ключ становится NULL (корзина 0), переносят строки.
+# Полный пересчёт (после загрузки в обход API): python rollup.py
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import Date, cast, delete, distinct, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+import models
+
+CENT = Decimal("0.01")
+
+
+def sale_day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def money(value):
+    return Decimal(str(value)).quantize(CENT)
+
+
+def increment(db, model, key, values):
+    """UPDATE ... SET col = col + :delta по ключу, а если строки нет — INSERT."""
+    table = model.__table__
+    condition = [table.c[name] == value for name, value in key.items()]
+    statement = update(table).where(*condition).values(
+        {name: table.c[name] + delta for name, delta in values.items()}
+    )
+    if db.execute(statement).rowcount:
+        return
+
+    try:
+        with db.begin_nested():
+            db.execute(insert(table).values(**key, **values))
+    except IntegrityError:
+        # Строку успел вставить параллельный запрос
+        db.execute(statement)
+
+
+def add_sales(db, sales, sign=1):
+    """Чеки: (SaleDate, StoreID); sign=-1 — убрать."""
+    receipts = defaultdict(int)
+    for sale_date, store_id in sales:
+        receipts[sale_day(sale_date), store_id or 0] += sign
+
+    for (day, store_id), count in receipts.items():
+        if count:
+            increment(db, models.SalesDailyStore, {"SaleDay": day, "StoreID": store_id},
+                      {"Revenue": Decimal(0), "Units": 0, "Receipts": count})
+
+
+def add_items(db, items, sign=1, sales=None):
+    """Позиции: dict с SaleID, ProductID, Quantity, Price.
+
+    sales — {SaleID: (SaleDate, StoreID)}, если чек ещё не записан или уже изменён.
+    """
+    items = [item for item in items if item["SaleID"] is not None]
+    if not items:
+        return
+
+    sales = dict(sales or {})
+    missing = {item["SaleID"] for item in items} - sales.keys()
+    if missing:
+        sales.update({
+            sale_id: (sale_date, store_id)
+            for sale_id, sale_date, store_id in db.execute(
+                select(models.Sale.SaleID, models.Sale.SaleDate, models.Sale.StoreID)
+                .where(models.Sale.SaleID.in_(missing))
+            )
+        })
+    categories = dict(db.execute(
+        select(models.Product.ProductID, models.Product.CategoryID)
+        .where(models.Product.ProductID.in_({item["ProductID"] for item in items}))
+    ).all())
+
+    by_store = defaultdict(lambda: [Decimal(0), 0])
+    by_category = defaultdict(lambda: [Decimal(0), 0])
+    for item in items:
+        if item["SaleID"] not in sales:
+            continue
+        sale_date, store_id = sales[item["SaleID"]]
+        key = (sale_day(sale_date), store_id or 0)
+        revenue = sign * money(item["Price"]) * item["Quantity"]
+        units = sign * item["Quantity"]
+        for totals in (by_store[key], by_category[key + (categories.get(item["ProductID"]) or 0,)]):
+            totals[0] += revenue
+            totals[1] += units
+
+    for (day, store_id), (revenue, units) in by_store.items():
+        increment(db, models.SalesDailyStore, {"SaleDay": day, "StoreID": store_id},
+                  {"Revenue": revenue, "Units": units, "Receipts": 0})
+    for (day, store_id, category_id), (revenue, units) in by_category.items():
+        increment(db, models.SalesDailyCategory,
+                  {"SaleDay": day, "StoreID": store_id, "CategoryID": category_id},
+                  {"Revenue": revenue, "Units": units})
+
+
+def item_values(item):
+    return {"SaleID": item.SaleID, "ProductID": item.ProductID, "Quantity": item.Quantity, "Price": item.Price}
+
+
+def sale_items(db, sale_id):
+    return [item_values(item) for item in db.scalars(select(models.SaleItem).where(models.SaleItem.SaleID == sale_id))]
+
+
+def move_sale(db, sale_id, old, new):
+    """Чек поменял дату или магазин: переносим его и позиции в другие корзины."""
+    if sale_day(old[0]) == sale_day(new[0]) and old[1] == new[1]:
+        return
+    items = sale_items(db, sale_id)
+    add_sales(db, [old], -1)
+    add_items(db, items, -1, {sale_id: old})
+    add_sales(db, [new])
+    add_items(db, items, 1, {sale_id: new})
+
+
+def remove_sale(db, sale_id, sale):
+    add_items(db, sale_items(db, sale_id), -1, {sale_id: sale})
+    add_sales(db, [sale], -1)
+
+
+def move_product(db, product_id, old, new):
+    """Товар сменил категорию (None — без категории): его продажи переходят в другую корзину."""
+    old, new = old or 0, new or 0
+    if old == new:
+        return
+
+    totals = defaultdict(lambda: [Decimal(0), 0])
+    for sale_date, store_id, price, quantity in db.execute(
+        select(models.Sale.SaleDate, models.Sale.StoreID, models.SaleItem.Price, models.SaleItem.Quantity)
+        .join(models.Sale, models.SaleItem.SaleID == models.Sale.SaleID)
+        .where(models.SaleItem.ProductID == product_id)
+    ):
+        totals[sale_day(sale_date), store_id or 0][0] += money(price) * quantity
+        totals[sale_day(sale_date), store_id or 0][1] += quantity
+
+    for (day, store_id), (revenue, units) in totals.items():
+        for category_id, sign in ((old, -1), (new, 1)):
+            increment(db, models.SalesDailyCategory,
+                      {"SaleDay": day, "StoreID": store_id, "CategoryID": category_id},
+                      {"Revenue": sign * revenue, "Units": sign * units})
+
+
+def merge_into_unknown(db, model, column, id):
+    """Строки агрегатов с column == id переходят в корзину 0 — ключ в Sale/Product стал NULL."""
+    table = model.__table__
+    condition = table.c[column] == id
+    for row in db.execute(select(table).where(condition)).mappings().all():
+        increment(db, model,
+                  {c.name: 0 if c.name == column else row[c.name] for c in table.primary_key},
+                  {c.name: row[c.name] for c in table.columns if not c.primary_key})
+    db.execute(delete(table).where(condition))
+
+
+def snapshot(obj):
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+# Вызываются обработчиками до commit; old — snapshot() до изменения
+def sale_created(db, sale):
+    add_sales(db, [(sale.SaleDate, sale.StoreID)])
+
+
+def sale_updated(db, sale, old):
+    move_sale(db, sale.SaleID, (old["SaleDate"], old["StoreID"]), (sale.SaleDate, sale.StoreID))
+
+
+def sale_deleted(db, sale):
+    remove_sale(db, sale.SaleID, (sale.SaleDate, sale.StoreID))
+
+
+def item_created(db, item):
+    add_items(db, [item_values(item)])
+
+
+def item_updated(db, item, old):
+    add_items(db, [old], -1)
+    add_items(db, [item_values(item)])
+
+
+def item_deleted(db, item):
+    add_items(db, [item_values(item)], -1)
+
+
+def product_updated(db, product, old):
+    move_product(db, product.ProductID, old["CategoryID"], product.CategoryID)
+
+
+def product_deleted(db, product):
+    # SaleItem.ProductID станет NULL, а позиции без товара rebuild() относит к категории 0
+    move_product(db, product.ProductID, product.CategoryID, None)
+
+
+def category_deleted(db, category):
+    # Товары категории остаются с CategoryID = NULL
+    merge_into_unknown(db, models.SalesDailyCategory, "CategoryID", category.CategoryID)
+
+
+def store_deleted(db, store):
+    # Чеки магазина остаются со StoreID = NULL
+    merge_into_unknown(db, models.SalesDailyStore, "StoreID", store.StoreID)
+    merge_into_unknown(db, models.SalesDailyCategory, "StoreID", store.StoreID)
+
+
+# Для обобщённых обработчиков async_api.py: (created, updated, deleted)
+HOOKS = {
+    "sales": (sale_created, sale_updated, sale_deleted),
+    "sale-items": (item_created, item_updated, item_deleted),
+    "products": (None, product_updated, product_deleted),
+    "categories": (None, None, category_deleted),
+    "stores": (None, None, store_deleted)
+}
+
+
+def day_expression(db, column):
+    # CAST(datetime AS DATE) в SQLite даёт число, там нужна date()
+    return func.date(column) if db.get_bind().dialect.name == "sqlite" else cast(column, Date)
+
+
+def rebuild(db):
+    """Пересчитывает агрегаты из Sale/SaleItem целиком."""
+    sale = models.Sale
+    item = models.SaleItem
+    day = day_expression(db, sale.SaleDate)
+    store_id = func.coalesce(sale.StoreID, 0)
+    category_id = func.coalesce(models.Product.CategoryID, 0)
+    revenue = func.coalesce(func.sum(item.Price * item.Quantity), 0)
+    units = func.coalesce(func.sum(item.Quantity), 0)
+
+    db.execute(delete(models.SalesDailyCategory))
+    db.execute(delete(models.SalesDailyStore))
+
+    db.execute(insert(models.SalesDailyStore).from_select(
+        ["SaleDay", "StoreID", "Revenue", "Units", "Receipts"],
+        select(day, store_id, revenue, units, func.count(distinct(sale.SaleID)))
+        .select_from(sale).outerjoin(item, item.SaleID == sale.SaleID)
+        .group_by(day, store_id)
+    ))
+    db.execute(insert(models.SalesDailyCategory).from_select(
+        ["SaleDay", "StoreID", "CategoryID", "Revenue", "Units"],
+        select(day, store_id, category_id, revenue, units)
+        .select_from(item).join(sale, item.SaleID == sale.SaleID)
+        .outerjoin(models.Product, item.ProductID == models.Product.ProductID)
+        .group_by(day, store_id, category_id)
+    ))
+    db.commit()
+
+
+def report(db, by, date_from=None, date_to=None, StoreID=None, CategoryID=None):
+    """Выручка, штуки и средний чек по store/category/day из агрегатов."""
+    # Чеки считаются только в разрезе магазина и дня, без фильтра по категории
+    model = models.SalesDailyStore if by != "category" and CategoryID is None else models.SalesDailyCategory
+    group = {"store": model.StoreID, "category": getattr(model, "CategoryID", None), "day": model.SaleDay}[by]
+
+    counts = [func.sum(model.Units)]
+    if model is models.SalesDailyStore:
+        counts.append(func.sum(model.Receipts))
+    # После удалений в агрегатах остаются нулевые строки — в отчёт их не берём
+    query = (
+        select(group, func.sum(model.Revenue), *counts)
+        .group_by(group)
+        .having(or_(*(count != 0 for count in counts)))
+        .order_by(group)
+    )
+
+    if date_from is not None:
+        query = query.where(model.SaleDay >= date_from)
+    if date_to is not None:
+        query = query.where(model.SaleDay <= date_to)
+    if StoreID is not None:
+        query = query.where(model.StoreID == StoreID)
+    if CategoryID is not None:
+        query = query.where(model.CategoryID == CategoryID)
+
+    rows = []
+    for key, revenue, units, *receipts in db.execute(query):
+        receipts = receipts[0] if receipts else None
+        rows.append({
+            "key": key,
+            "revenue": float(revenue),
+            "units": units,
+            "receipts": receipts,
+            "avg_receipt": round(float(revenue) / receipts, 2) if receipts else None
+        })
+    return rows
+
+
+def main():
+    from db import SessionLocal, engine
+    from common import migrations
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        rebuild(db)
+        print("SalesDailyStore:", db.scalar(select(func.count()).select_from(models.SalesDailyStore)))
+        print("SalesDailyCategory:", db.scalar(select(func.count()).select_from(models.SalesDailyCategory)))
+
+
+if __name__ == "__main__":
+    main()
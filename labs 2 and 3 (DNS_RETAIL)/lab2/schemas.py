@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, Union
 from datetime import datetime, date
 
 
@@ -100,6 +100,8 @@ class ProductCreate(ProductBase):
 
 class ProductRead(ProductBase):
     ProductID: int
+    # Удаление категории оставляет товар без неё
+    CategoryID: Optional[int]
 
     class Config:
         orm_mode = True
@@ -124,6 +126,16 @@ class SaleRead(SaleBase):
         orm_mode = True
 
 
+class SaleLineCreate(BaseModel):
+    ProductID: int
+    Quantity: int
+    Price: float
+
+
+class SaleWithItemsCreate(SaleBase):
+    items: list[SaleLineCreate]
+
+
 # --- SaleItem ---
 class SaleItemBase(BaseModel):
     SaleID: int
@@ -194,3 +206,50 @@ class InventoryRead(InventoryBase):
 
     class Config:
         orm_mode = True
+
+
+class InventoryAdjust(BaseModel):
+    Delta: int
+
+
+# --- Bulk ---
+class BulkRowResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkRowResult]
+
+
+# --- Reports ---
+class SalesReportRow(BaseModel):
+    key: Union[int, date]
+    revenue: float
+    units: int
+    receipts: Optional[int] = None
+    avg_receipt: Optional[float] = None
+
+
+# --- Expanded reads (?expand=...) ---
+class ProductExpanded(ProductRead):
+    category: Optional[ProductCategoryRead] = None
+
+
+class SaleItemExpanded(SaleItemRead):
+    product: Optional[ProductExpanded] = None
+
+
+class SaleExpanded(SaleRead):
+    items: Optional[list[SaleItemExpanded]] = None
+    store: Optional[StoreRead] = None
+    employee: Optional[EmployeeRead] = None
+    customer: Optional[CustomerRead] = None
+
+
+class InventoryExpanded(InventoryRead):
+    product: Optional[ProductExpanded] = None
+    store: Optional[StoreRead] = None
@@ -0,0 +1,377 @@
+# search.py — поиск товаров по части названия и названию категории в памяти процесса.
+# Индекс строится при старте (или при первом поиске) и меняется обработчиками товаров
+# и категорий после commit. Загрузка ETL в обход API и записи через другие воркеры
+# uvicorn в индекс этого процесса не попадают — до перезапуска или products.build().
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from heapq import nsmallest
+from sqlalchemy import select
+import models
+
+WORD = re.compile(r"\w+")
+
+# Сколько товаров отдаёт /products/search без limit и больше какого числа не отдаёт
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# SQL Server принимает не больше 2100 параметров в запросе
+IN_BATCH_SIZE = 1000
+
+# Сколько ID суммарно держать в кэше объединений по префиксу/подстроке
+MAX_CACHED_IDS = 5_000_000
+
+ID_MASK = (1 << 32) - 1
+
+EMPTY = frozenset()
+
+
+def words(text):
+    """Слова в порядке появления без повторов: регистр и ё не различаются."""
+    return list(dict.fromkeys(WORD.findall((text or "").casefold().replace("ё", "е"))))
+
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def prefix_end(prefix):
+    # Первая строка после всех строк, начинающихся с prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def intersect(sets):
+    # Результат только читается, поэтому единственное множество отдаётся без копии
+    sets = sorted(sets, key=len)
+    return sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+
+def common(window, others, skip):
+    # Ключи окна, которые есть во всех others и которых нет в skip
+    found = set(window)
+    for other in others:
+        found &= other
+    return found - skip
+
+
+def top(matches, limit, skip=EMPTY):
+    """Первые limit ключей из пересечения совпадений без skip по возрастанию.
+
+    matches — (множество ключей, те же ключи списком по возрастанию) каждого слова.
+    Просмотрев начало списка одного слова, мы знаем все общие товары с ключами не
+    больше последнего просмотренного, поэтому найденное по началам списков — уже
+    первые по порядку общие товары. Первые limit ключей берём у каждого слова (длина
+    названия связана со словами: "128 ГБ" — в длинных, и такой список сразу уходит
+    далеко), а дальше окнами растущего размера идём только по самому короткому списку.
+    """
+    if not all(ids for ids, _ in matches):
+        return []
+    matches = sorted(matches, key=lambda match: len(match[0]))
+    found = set()
+    for number, (_, ranked) in enumerate(matches):
+        window = ranked[:limit]
+        found |= common(window, [ids for ids, _ in matches[:number] + matches[number + 1:]], skip)
+        if len(window) < limit:
+            # Список слова просмотрен целиком — пересечение известно полностью
+            return nsmallest(limit, found)
+    ranked = matches[0][1]
+    others = [ids for ids, _ in matches[1:]]
+    start = limit
+    while len(found) < limit:
+        window = ranked[start:start * 2]
+        found |= common(window, others, skip)
+        if len(window) < start:
+            break
+        start *= 2
+    return nsmallest(limit, found)
+
+
+class SearchIndex:
+    """Слово -> множество ключей товаров (длина названия и ProductID одним числом)
+    и те же ключи списком по возрастанию; словарь слов отсортирован для поиска по
+    префиксу, а для поиска по подстроке слова есть триграммный индекс по словарю.
+
+    Товар находится, если каждое слово запроса — начало какого-то слова в названии
+    товара или его категории. Порядок: сначала совпадение всех слов целиком, затем
+    по началу слов, затем по подстроке внутри слова; внутри группы — короче название,
+    затем меньший ProductID.
+    """
+
+    def __init__(self):
+        # Повторный вход нужен поиску, который повторяется под блокировкой
+        self.lock = threading.RLock()
+        # Растёт при каждом изменении: поиск без блокировки по нему узнаёт, что его прервали
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        self.version += 1
+        self.postings = defaultdict(set)
+        # ID -> ключ ранжирования: длина названия, затем ID (в младших 32 битах)
+        self.rank = {}
+        # Слово -> ключи его товаров по возрастанию
+        self.ranked = defaultdict(list)
+        self.vocabulary = []
+        self.word_trigrams = defaultdict(set)
+        self.category_words = {}
+        self.category_products = defaultdict(set)
+        self.clear_unions()
+        self.built = False
+        self.searches = 0
+
+    def clear_unions(self):
+        # Объединения по префиксу или подстроке: у коротких префиксов сотни слов.
+        # Готовые объединения не меняются, а только выбрасываются из кэша
+        self.unions = {}
+        self.cached_ids = 0
+
+    def forget_unions(self, word):
+        for key in [key for key in self.unions if key[1] in word]:
+            del self.unions[key]
+
+    # --- изменение индекса ---
+    def add_word(self, word, keys):
+        self.version += 1
+        posting = self.postings[word]
+        if not posting:
+            insort(self.vocabulary, word)
+            for trigram in trigrams(word):
+                self.word_trigrams[trigram].add(word)
+        new = [key for key in keys if key not in posting]
+        posting.update(new)
+        ranked = self.ranked[word]
+        if len(new) == 1:
+            insort(ranked, new[0])
+        elif new:
+            ranked += new
+            ranked.sort()
+        self.forget_unions(word)
+
+    def remove_word(self, word, keys):
+        posting = self.postings.get(word)
+        if posting is None:
+            return
+        self.version += 1
+        keys = posting.intersection(keys)
+        posting -= keys
+        if not posting:
+            del self.postings[word]
+            del self.ranked[word]
+            del self.vocabulary[bisect_left(self.vocabulary, word)]
+            for trigram in trigrams(word):
+                self.word_trigrams[trigram].discard(word)
+        elif len(keys) == 1:
+            ranked = self.ranked[word]
+            del ranked[bisect_left(ranked, next(iter(keys)))]
+        elif keys:
+            self.ranked[word] = [key for key in self.ranked[word] if key not in keys]
+        self.forget_unions(word)
+
+    def product_words(self, name, category_id):
+        return dict.fromkeys(words(name) + self.category_words.get(category_id, []))
+
+    def add(self, product_id, name, category_id):
+        key = self.rank[product_id] = len(name) << 32 | product_id
+        for word in self.product_words(name, category_id):
+            self.add_word(word, (key,))
+        self.category_products[category_id].add(product_id)
+
+    def remove(self, product_id, name, category_id):
+        if product_id not in self.rank:
+            return
+        for word in self.product_words(name, category_id):
+            self.remove_word(word, (self.rank[product_id],))
+        del self.rank[product_id]
+        self.category_products[category_id].discard(product_id)
+
+    def set_category(self, category_id, name, products=()):
+        """Новая, переименованная (name) или удалённая (name=None) категория.
+
+        products — (ProductID, Name) её товаров: слово старого названия категории
+        остаётся у товара, если оно есть в названии самого товара.
+        """
+        old = set(self.category_words.pop(category_id, []))
+        new = words(name) if name is not None else []
+        if name is not None:
+            self.category_words[category_id] = new
+        ids = self.category_products.get(category_id, set())
+        gone = defaultdict(list)
+        for product_id, product_name in products:
+            for word in old - set(words(product_name)) - set(new):
+                gone[word].append(self.rank.get(product_id))
+        for word, keys in gone.items():
+            self.remove_word(word, keys)
+        for word in new:
+            self.add_word(word, [self.rank[product_id] for product_id in ids])
+        if name is None:
+            # Товары удалённой категории остаются без неё (CategoryID = NULL)
+            self.category_products[None] |= self.category_products.pop(category_id, set())
+
+    def load(self, products, categories):
+        """Полная перестройка: products — (ProductID, Name, CategoryID), categories — (CategoryID, Name)."""
+        self.clear()
+        self.category_words = {category_id: words(name) for category_id, name in categories}
+        ranked = defaultdict(list)
+        for product_id, name, category_id in products:
+            key = len(name) << 32 | product_id
+            for word in self.product_words(name, category_id):
+                ranked[word].append(key)
+            self.rank[product_id] = key
+            self.category_products[category_id].add(product_id)
+        # Пачкой быстрее, чем add_word() на каждое слово каждого товара
+        for word, keys in ranked.items():
+            keys.sort()
+            self.postings[word] = set(keys)
+        self.ranked = ranked
+        self.vocabulary = sorted(self.postings)
+        for word in self.vocabulary:
+            for trigram in trigrams(word):
+                self.word_trigrams[trigram].add(word)
+        self.built = True
+
+    # --- поиск ---
+    # Совпадение слова запроса: (множество ключей, те же ключи списком по возрастанию)
+    def exact(self, token):
+        return self.postings.get(token, EMPTY), self.ranked.get(token, ())
+
+    def union(self, key, matched):
+        if len(matched) == 1:
+            return self.exact(matched[0])
+        if key not in self.unions:
+            if self.cached_ids > MAX_CACHED_IDS:
+                self.clear_unions()
+            ids = set().union(*(self.postings[word] for word in matched))
+            self.unions[key] = ids, sorted(ids)
+            self.cached_ids += len(ids)
+        return self.unions[key]
+
+    def prefix(self, token):
+        start = bisect_left(self.vocabulary, token)
+        end = bisect_left(self.vocabulary, prefix_end(token), start)
+        return self.union(("prefix", token), self.vocabulary[start:end])
+
+    def substring(self, token):
+        if len(token) < 3:
+            return self.prefix(token)
+        candidates = intersect([self.word_trigrams.get(trigram, EMPTY) for trigram in trigrams(token)])
+        return self.union(("substring", token), sorted(word for word in candidates if token in word))
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        tokens = words(query)
+        if not tokens or limit <= 0:
+            return []
+
+        with self.lock:
+            self.searches += 1
+            version = self.version
+        found = self.find(tokens, limit, version)
+        if found is None:
+            # Индекс изменился посреди поиска: повторяем, не отпуская блокировку
+            with self.lock:
+                found = self.find(tokens, limit, self.version)
+        return [key & ID_MASK for key in found]
+
+    def find(self, tokens, limit, version):
+        """Ключи найденных товаров или None, если индекс изменился после version.
+
+        Под блокировкой берутся только множества и списки слов запроса, а пересекаются
+        они уже без неё.
+        """
+        groups = [self.exact, self.prefix]
+        if any(len(token) >= 3 for token in tokens):
+            groups.append(self.substring)
+        found = []
+        for group in groups:
+            with self.lock:
+                if self.version != version:
+                    return None
+                matches = [group(token) for token in tokens]
+            found += top(matches, limit - len(found), set(found))
+            # Следующая группа нужна, только если предыдущая вошла целиком
+            if len(found) == limit:
+                break
+        with self.lock:
+            return found if self.version == version else None
+
+    def stats(self):
+        return {
+            "built": self.built,
+            "products": len(self.rank),
+            "words": len(self.vocabulary),
+            "trigrams": len(self.word_trigrams),
+            "cached_unions": len(self.unions),
+            "searches": self.searches
+        }
+
+
+products = SearchIndex()
+
+
+def build(db):
+    rows = db.execute(
+        select(models.Product.ProductID, models.Product.Name, models.Product.CategoryID)
+        .execution_options(yield_per=10000)
+    )
+    categories = db.execute(select(models.ProductCategory.CategoryID, models.ProductCategory.Name)).all()
+    with products.lock:
+        products.load(rows, categories)
+
+
+def search(db, query, limit=DEFAULT_LIMIT):
+    """ProductID в порядке ранжирования; индекс строится при первом вызове, если не построен при старте."""
+    if not products.built:
+        build(db)
+    return products.search(query, limit)
+
+
+def names_by_id(db, ids):
+    ids = sorted(ids)
+    names = []
+    for start in range(0, len(ids), IN_BATCH_SIZE):
+        names += db.execute(
+            select(models.Product.ProductID, models.Product.Name)
+            .where(models.Product.ProductID.in_(ids[start:start + IN_BATCH_SIZE]))
+        ).all()
+    return names
+
+
+# Вызываются обработчиками после commit; old — rollup.snapshot() до изменения или удаления
+def product_saved(db, product, old=None):
+    if not products.built:
+        return
+    with products.lock:
+        if old is not None:
+            products.remove(old["ProductID"], old["Name"], old["CategoryID"])
+        products.add(product.ProductID, product.Name, product.CategoryID)
+
+
+def product_deleted(db, old):
+    if not products.built:
+        return
+    with products.lock:
+        products.remove(old["ProductID"], old["Name"], old["CategoryID"])
+
+
+def category_saved(db, category, old=None):
+    if not products.built or (old is not None and old["Name"] == category.Name):
+        return
+    names = names_by_id(db, products.category_products.get(category.CategoryID, ())) if old is not None else []
+    with products.lock:
+        products.set_category(category.CategoryID, category.Name, names)
+
+
+def category_deleted(db, old):
+    if not products.built:
+        return
+    # После commit у товаров уже CategoryID = NULL, поэтому ищем их по ID из индекса
+    names = names_by_id(db, products.category_products.get(old["CategoryID"], ()))
+    with products.lock:
+        products.set_category(old["CategoryID"], None, names)
+
+
+# Для обобщённых обработчиков async_api.py: (created/updated, deleted)
+HOOKS = {
+    "products": (product_saved, product_deleted),
+    "categories": (category_saved, category_deleted)
+}
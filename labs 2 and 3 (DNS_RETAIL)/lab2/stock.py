@@ -0,0 +1,124 @@
+# stock.py — списание остатков при продаже.
+# Остаток меняется одним UPDATE ... SET Quantity = Quantity - :n WHERE ... AND Quantity >= :n:
+# проверка и списание атомарны в базе, поэтому параллельные кассы не теряют списания
+# и не уводят остаток в минус. Вызывается обработчиками до commit, как и rollup.
+from collections import defaultdict
+from fastapi import HTTPException
+from sqlalchemy import select, update
+import models
+import rollup
+
+
+class OutOfStock(HTTPException):
+    """Остатка не хватает или товара нет в магазине — продажа отклоняется целиком."""
+
+    def __init__(self, store_id, product_id, quantity):
+        super().__init__(409, f"Not enough stock: product {product_id} in store {store_id}, need {quantity}")
+
+
+def inventory_row(store_id, product_id):
+    # Строка остатка одна на пару (UQ_Inventory_Store_Product)
+    return (models.Inventory.StoreID == store_id, models.Inventory.ProductID == product_id)
+
+
+def take(db, store_id, product_id, quantity):
+    statement = (
+        update(models.Inventory)
+        .where(*inventory_row(store_id, product_id), models.Inventory.Quantity >= quantity)
+        .values(Quantity=models.Inventory.Quantity - quantity)
+    )
+    if db.execute(statement).rowcount != 1:
+        raise OutOfStock(store_id, product_id, quantity)
+
+
+def put_back(db, store_id, product_id, quantity):
+    # Строку могли удалить после продажи — тогда возврат создаёт её заново
+    rollup.increment(db, models.Inventory, {"StoreID": store_id, "ProductID": product_id}, {"Quantity": quantity})
+
+
+def apply(db, changes):
+    """changes — {(StoreID, ProductID): сколько списать}; отрицательное число — вернуть на склад.
+
+    Сначала возвраты, потом списания: правка позиции 2 -> 5 при остатке 3 должна пройти.
+    Пары идут по порядку, чтобы параллельные чеки блокировали строки в одном порядке.
+    """
+    changes = {pair: quantity for pair, quantity in changes.items() if pair[0] is not None and quantity}
+    for (store_id, product_id), quantity in sorted(changes.items()):
+        if quantity < 0:
+            put_back(db, store_id, product_id, -quantity)
+    for (store_id, product_id), quantity in sorted(changes.items()):
+        if quantity > 0:
+            take(db, store_id, product_id, quantity)
+
+
+def sale_stores(db, sale_ids):
+    sale_ids = {sale_id for sale_id in sale_ids if sale_id is not None}
+    if not sale_ids:
+        return {}
+    return dict(db.execute(select(models.Sale.SaleID, models.Sale.StoreID).where(models.Sale.SaleID.in_(sale_ids))).all())
+
+
+def items_changes(db, items, sign=1, stores=None):
+    """Позиции (dict с SaleID, ProductID, Quantity) -> {(StoreID, ProductID): sign * Quantity}.
+
+    stores — {SaleID: StoreID}, если чек ещё не записан или уже изменён. Чек без магазина
+    остатков не трогает.
+    """
+    stores = dict(stores or {})
+    stores.update(sale_stores(db, {item["SaleID"] for item in items} - stores.keys()))
+
+    changes = defaultdict(int)
+    for item in items:
+        changes[stores.get(item["SaleID"]), item["ProductID"]] += sign * item["Quantity"]
+    return changes
+
+
+def adjust(db, inventory_id, delta):
+    """Приход или списание по строке остатка без чтения в Python; в минус не уходит."""
+    statement = (
+        update(models.Inventory)
+        .where(models.Inventory.InventoryID == inventory_id, models.Inventory.Quantity + delta >= 0)
+        .values(Quantity=models.Inventory.Quantity + delta)
+    )
+    if db.execute(statement).rowcount != 1:
+        if db.get(models.Inventory, inventory_id) is None:
+            raise HTTPException(404, "Inventory not found")
+        raise HTTPException(409, f"Not enough stock in inventory {inventory_id} for {delta}")
+
+
+# Вызываются обработчиками до commit; old — rollup.snapshot() до изменения
+def item_created(db, item):
+    apply(db, items_changes(db, [rollup.item_values(item)]))
+
+
+def item_updated(db, item, old):
+    changes = items_changes(db, [old], -1)
+    for pair, quantity in items_changes(db, [rollup.item_values(item)]).items():
+        changes[pair] += quantity
+    apply(db, changes)
+
+
+def item_deleted(db, item):
+    apply(db, items_changes(db, [rollup.item_values(item)], -1))
+
+
+def sale_updated(db, sale, old):
+    # Чек перенесли в другой магазин: позиции возвращаются на старый склад и списываются с нового
+    if old["StoreID"] == sale.StoreID:
+        return
+    items = rollup.sale_items(db, sale.SaleID)
+    changes = items_changes(db, items, -1, {sale.SaleID: old["StoreID"]})
+    for pair, quantity in items_changes(db, items, 1, {sale.SaleID: sale.StoreID}).items():
+        changes[pair] += quantity
+    apply(db, changes)
+
+
+def sale_deleted(db, sale):
+    apply(db, items_changes(db, rollup.sale_items(db, sale.SaleID), -1, {sale.SaleID: sale.StoreID}))
+
+
+# Для обобщённых обработчиков async_api.py: (created, updated, deleted)
+HOOKS = {
+    "sales": (None, sale_updated, sale_deleted),
+    "sale-items": (item_created, item_updated, item_deleted)
+}
@@ -0,0 +1,58 @@
+# Тесты API на временной SQLite со схемой из common/migrations.py. Из каталога lab2:
+#   python -m pytest -q tests
+#   API_MODE=async python -m pytest -q tests
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+
+# До импорта db: движок создаётся при импорте по DATABASE_URL
+WORKDIR = tempfile.mkdtemp(prefix="dns_retail_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'api.db')}"
+os.environ["API_LOG_FILE"] = os.path.join(WORKDIR, "api.log")
+LAB2 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# lab2 — для импортов API, каталог выше — для common, как в db.py
+sys.path[:0] = [LAB2, os.path.join(LAB2, "..")]
+
+
+def clear_tables():
+    from db import engine
+    from common import migrations
+
+    with engine.begin() as connection:
+        for table in reversed(migrations.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from db import engine
+    from common import migrations
+
+    migrations.upgrade(engine)
+    yield
+    engine.dispose()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """Сессия к пустой базе; после теста таблицы очищаются."""
+    from db import SessionLocal
+
+    with SessionLocal() as session:
+        yield session
+    clear_tables()
+
+
+@pytest.fixture
+def client(db):
+    """TestClient на пустой базе: startup строит индекс поиска заново, кэш чтений очищается."""
+    from fastapi.testclient import TestClient
+    import cache
+    import main
+
+    cache.reads.clear()
+    with TestClient(main.app) as test_client:
+        yield test_client
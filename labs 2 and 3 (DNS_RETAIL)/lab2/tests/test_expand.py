@@ -0,0 +1,65 @@
+# Число SQL-запросов на раскрытый ответ (expand=...) не растёт с числом позиций чека
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+import db as database
+import models
+
+EXPANDED = [
+    "/sales/{sale}?expand=items.product.category,store,employee,customer",
+    "/sales/{sale}?expand=items",
+    "/stores/{store}/inventory?expand=product.category&limit=1000"
+]
+ITEMS = [1, 10, 100]
+
+
+def seed(db, items):
+    store = models.Store(Name=f"Магазин {items}", Address="Адрес")
+    position = models.EmployeePosition(Name=f"Кассир {items}")
+    db.add_all([store, position])
+    db.flush()
+    employee = models.Employee(FullName="Кассир", PositionID=position.PositionID, StoreID=store.StoreID)
+    sale = models.Sale(SaleDate=datetime(2024, 1, 1, 10), store=store, employee=employee)
+    for i in range(items):
+        category = models.ProductCategory(Name=f"Категория {items}-{i}")
+        product = models.Product(Name=f"Товар {items}-{i}", Price=10, category=category)
+        sale.items.append(models.SaleItem(product=product, Quantity=1, Price=10))
+        db.add(models.Inventory(store=store, product=product, Quantity=5))
+    db.add(sale)
+    db.commit()
+    return sale.SaleID, store.StoreID
+
+
+@pytest.fixture
+def statements():
+    """Счётчик запросов ко всем движкам API."""
+    engines = [database.engine]
+    if database.API_MODE == "async":
+        # /stores/{id}/inventory синхронный и в async-режиме
+        import async_db
+        engines.append(async_db.async_engine.sync_engine)
+
+    counter = [0]
+
+    def count(*args):
+        counter[0] += 1
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+    yield counter
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.mark.parametrize("url", EXPANDED)
+def test_query_count_does_not_grow_with_items(client, db, statements, url):
+    counts = []
+    for items in ITEMS:
+        sale, store = seed(db, items)
+        statements[0] = 0
+        response = client.get(url.format(sale=sale, store=store))
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert len(body["items"] if isinstance(body, dict) else body) == items
+        counts.append(statements[0])
+    assert len(set(counts)) == 1, f"запросов при {ITEMS} позициях: {counts}"
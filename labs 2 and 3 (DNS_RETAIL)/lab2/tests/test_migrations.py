@@ -0,0 +1,103 @@
+# Версия 3 на базе, заполненной до уникальных ключей: дубли сливаются, ссылки не теряются
+from datetime import date, datetime
+import pytest
+from sqlalchemy import create_engine, insert, inspect, select
+from common import migrations
+
+TABLES = migrations.metadata.tables
+
+
+@pytest.fixture
+def old_engine(tmp_path):
+    """База на версии 2 с дублями, какие оставлял прежний загрузчик lab3."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    migrations.schema_version.create(engine)
+    with engine.begin() as connection:
+        migrations.create_tables(connection)
+        migrations.create_indexes(connection)
+        connection.execute(insert(migrations.schema_version), [
+            {"Version": version, "Name": name, "AppliedAt": datetime.now()}
+            for version, name, _ in migrations.MIGRATIONS[:2]
+        ])
+        # Категория 3 — дубль 1, поэтому товар 3 после слияния категорий — тоже дубль товара 1
+        connection.execute(insert(TABLES["ProductCategory"]), [{"Name": "A"}, {"Name": "B"}, {"Name": "A"}])
+        connection.execute(insert(TABLES["Store"]), [{"Name": "S", "Address": ""}, {"Name": "S", "Address": ""}])
+        connection.execute(insert(TABLES["Supplier"]), [{"Name": "P"}, {"Name": "P"}])
+        connection.execute(insert(TABLES["Product"]), [
+            {"Name": "X", "Price": 1, "CategoryID": 1}, {"Name": "X", "Price": 2, "CategoryID": 1},
+            {"Name": "X", "Price": 3, "CategoryID": 3}, {"Name": "Y", "Price": 4, "CategoryID": 2}
+        ])
+        connection.execute(insert(TABLES["Sale"]), [{"SaleDate": datetime(2024, 1, 1), "StoreID": 2}])
+        connection.execute(insert(TABLES["SaleItem"]), [
+            {"SaleID": 1, "ProductID": 2, "Quantity": 1, "Price": 1},
+            {"SaleID": 1, "ProductID": 3, "Quantity": 2, "Price": 1}
+        ])
+        connection.execute(insert(TABLES["Supply"]), [
+            {"SupplierID": 2, "ProductID": 3, "SupplyDate": date(2024, 1, 1), "Quantity": 4}
+        ])
+        connection.execute(insert(TABLES["Inventory"]), [
+            {"StoreID": 1, "ProductID": 1, "Quantity": 5}, {"StoreID": 2, "ProductID": 2, "Quantity": 7},
+            {"StoreID": 1, "ProductID": 3, "Quantity": 1}, {"StoreID": 2, "ProductID": 4, "Quantity": 2}
+        ])
+        connection.execute(insert(TABLES["SalesDailyStore"]), [
+            {"SaleDay": date(2024, 1, 1), "StoreID": 1, "Revenue": 1, "Units": 1, "Receipts": 1},
+            {"SaleDay": date(2024, 1, 1), "StoreID": 2, "Revenue": 2, "Units": 2, "Receipts": 1}
+        ])
+        connection.execute(insert(TABLES["SalesDailyCategory"]), [
+            {"SaleDay": date(2024, 1, 1), "StoreID": 2, "CategoryID": 3, "Revenue": 2, "Units": 2},
+            {"SaleDay": date(2024, 1, 1), "StoreID": 1, "CategoryID": 1, "Revenue": 1, "Units": 1}
+        ])
+    yield engine
+    engine.dispose()
+
+
+def rows(engine, table, *columns):
+    table = TABLES[table]
+    with engine.connect() as connection:
+        return connection.execute(select(*(table.c[column] for column in columns)).order_by(*table.primary_key)).all()
+
+
+def test_upgrade_merges_duplicates(old_engine):
+    assert migrations.upgrade(old_engine) == [version for version, _, _ in migrations.MIGRATIONS[2:]]
+
+    assert rows(old_engine, "ProductCategory", "CategoryID", "Name") == [(1, "A"), (2, "B")]
+    assert rows(old_engine, "Store", "StoreID") == [(1,)]
+    assert rows(old_engine, "Supplier", "SupplierID") == [(1,)]
+    assert rows(old_engine, "Product", "ProductID", "CategoryID") == [(1, 1), (4, 2)]
+    assert rows(old_engine, "Sale", "StoreID") == [(1,)]
+    assert rows(old_engine, "SaleItem", "ProductID", "Quantity") == [(1, 1), (1, 2)]
+    assert rows(old_engine, "Supply", "SupplierID", "ProductID") == [(1, 1)]
+    assert rows(old_engine, "Inventory", "StoreID", "ProductID", "Quantity") == [(1, 1, 13), (1, 4, 2)]
+    assert rows(old_engine, "SalesDailyStore", "StoreID", "Units", "Receipts") == [(1, 3, 2)]
+    assert rows(old_engine, "SalesDailyCategory", "StoreID", "CategoryID", "Units") == [(1, 1, 3)]
+    assert migrations.upgrade(old_engine) == []
+
+
+def test_unmerged_duplicates_are_listed(old_engine, monkeypatch):
+    monkeypatch.setattr(migrations, "merge_duplicates", lambda connection, table, columns: 0)
+    with pytest.raises(RuntimeError, match=r"UQ_ProductCategory_Name.*\('A',\) x2"):
+        migrations.upgrade(old_engine)
+    assert 3 not in migrations.applied(old_engine)
+
+
+def test_product_name_key(old_engine):
+    # Старый ключ различал регистр и пробелы: такие товары версия 4 сливает
+    with old_engine.begin() as connection:
+        connection.execute(insert(TABLES["Product"]), [
+            {"Name": "Ноутбук  Модель 1", "Price": 5, "CategoryID": 2},
+            {"Name": "ноутбук модель 1", "Price": 6, "CategoryID": 2}
+        ])
+        connection.execute(insert(TABLES["Inventory"]), [
+            {"StoreID": 1, "ProductID": 5, "Quantity": 1}, {"StoreID": 1, "ProductID": 6, "Quantity": 2}
+        ])
+    migrations.upgrade(old_engine)
+
+    product = migrations.product_name_key
+    with old_engine.connect() as connection:
+        products = connection.execute(
+            select(product.c.ProductID, product.c.NameKey, product.c.CategoryID).order_by(product.c.ProductID)
+        ).all()
+        indexes = {index["name"] for index in inspect(connection).get_indexes("Product")}
+    assert products == [(1, "x", 1), (4, "y", 2), (5, "ноутбук модель 1", 2)]
+    assert rows(old_engine, "Inventory", "ProductID", "Quantity")[-1] == (5, 3)
+    assert "UQ_Product_NameKey_Category" in indexes and "UQ_Product_Name_Category" not in indexes
@@ -0,0 +1,26 @@
+# Товар — (название без регистра и лишних пробелов, категория), как в ETL: ключ в Product.NameKey
+import json
+
+
+def test_same_name_in_other_case_conflicts(client):
+    client.post("/categories/", json={"Name": "Ноутбуки"})
+    client.post("/categories/", json={"Name": "Планшеты"})
+    created = client.post("/products/", json={"Name": "Ноутбук  Модель 1", "Price": 100, "CategoryID": 1})
+    assert created.status_code == 200
+
+    assert client.post("/products/", json={"Name": "ноутбук модель 1", "Price": 90, "CategoryID": 1}).status_code == 409
+    # В другой категории — другой товар
+    assert client.post("/products/", json={"Name": "ноутбук модель 1", "Price": 90, "CategoryID": 2}).status_code == 200
+
+    other = client.post("/products/", json={"Name": "Планшет", "Price": 50, "CategoryID": 1}).json()
+    renamed = client.put(f"/products/{other['ProductID']}", json={"Name": " НОУТБУК модель 1", "Price": 50, "CategoryID": 1})
+    assert renamed.status_code == 409
+
+
+def test_name_key_is_not_exposed(client):
+    client.post("/categories/", json={"Name": "Ноутбуки"})
+    product = client.post("/products/", json={"Name": "Ноутбук Модель 1", "Price": 100, "CategoryID": 1}).json()
+    assert "NameKey" not in product
+    exported = [json.loads(line) for line in client.get("/export/products").text.splitlines()]
+    assert [row["Name"] for row in exported] == ["Ноутбук Модель 1"]
+    assert "NameKey" not in exported[0]
@@ -0,0 +1,21 @@
+# Горячие запросы API и ETL идут по индексам из common/migrations.py (см. bench/query_plans.py)
+import pytest
+from bench import query_plans
+from conftest import clear_tables
+
+CASES = query_plans.cases()
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    query_plans.seed(query_plans.SALES)
+    yield
+    clear_tables()
+
+
+@pytest.mark.parametrize("name, run, expected, full_scan", CASES, ids=[case[0] for case in CASES])
+def test_query_uses_index(seeded, name, run, expected, full_scan):
+    plans, problems = query_plans.plan_problems(run, expected, full_scan)
+    assert not problems, "\n".join(
+        [name, *problems] + [f"{' '.join(statement.split())}: {plan}" for statement, plan in plans]
+    )
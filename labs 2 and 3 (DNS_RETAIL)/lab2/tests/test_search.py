@@ -0,0 +1,102 @@
+# Индекс search.SearchIndex отдаёт то же, что перебор всех товаров, и после изменений
+import random
+import pytest
+import search
+
+WORDS = ["galaxy", "galaxies", "note", "notebook", "ёлка", "елочный", "s2", "s23", "128", "гб", "x1", "pro"]
+CATEGORIES = {1: "Смартфоны", 2: "Ноутбуки", 3: "Ёлочные игрушки"}
+QUERIES = ["galaxy", "gal", "note s2", "s", "128 гб", "ёлк", "алак", "otebo", "x1 pro", "елка смартф",
+           "г", "pro ноут", "игрушки", "нет"]
+
+
+def expected(catalog, categories, query, limit):
+    """Перебор: группа совпадения, затем длина названия и ProductID."""
+    tokens = search.words(query)
+
+    def group(name, category_id):
+        product = search.words(name) + search.words(categories.get(category_id))
+        checks = [
+            lambda token, word: token == word,
+            lambda token, word: word.startswith(token),
+            lambda token, word: token in word if len(token) >= 3 else word.startswith(token)
+        ]
+        for number, check in enumerate(checks):
+            if all(any(check(token, word) for word in product) for token in tokens):
+                return number
+
+    found = []
+    for product_id, (name, category_id) in catalog.items():
+        number = group(name, category_id)
+        if number is not None and (number < 2 or any(len(token) >= 3 for token in tokens)):
+            found.append((number, len(name), product_id))
+    return [product_id for *_, product_id in sorted(found)[:limit]]
+
+
+def name(rnd):
+    return " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 4)))
+
+
+@pytest.fixture
+def catalog():
+    rnd = random.Random(0)
+    return {product_id: (name(rnd), rnd.choice([1, 2, 3, None])) for product_id in range(1, 3001)}
+
+
+@pytest.fixture
+def index(catalog):
+    index = search.SearchIndex()
+    index.load(((product_id, *product) for product_id, product in catalog.items()), CATEGORIES.items())
+    return index
+
+
+def check(index, catalog, categories):
+    for query in QUERIES:
+        for limit in (1, 20, 100):
+            assert index.search(query, limit) == expected(catalog, categories, query, limit), (query, limit)
+
+
+def test_search_matches_brute_force(index, catalog):
+    check(index, catalog, CATEGORIES)
+
+
+def test_search_after_changes(index, catalog):
+    rnd = random.Random(1)
+    categories = dict(CATEGORIES)
+    with index.lock:
+        for product_id in rnd.sample(sorted(catalog), 300):
+            old = catalog.pop(product_id)
+            index.remove(product_id, *old)
+            if rnd.random() < 0.5:
+                catalog[product_id] = (name(rnd), old[1])
+                index.add(product_id, *catalog[product_id])
+        for product_id in range(3001, 3101):
+            catalog[product_id] = (name(rnd), rnd.choice([1, 2, 3]))
+            index.add(product_id, *catalog[product_id])
+        # Переименование и удаление категории
+        products = [(product_id, product[0]) for product_id, product in catalog.items() if product[1] == 1]
+        categories[1] = "Планшеты galaxy"
+        index.set_category(1, categories[1], products)
+        products = [(product_id, product[0]) for product_id, product in catalog.items() if product[1] == 2]
+        del categories[2]
+        index.set_category(2, None, products)
+        catalog.update({product_id: (name, None) for product_id, name in products})
+    check(index, catalog, categories)
+
+
+def test_search_repeats_when_index_changes(index, catalog, monkeypatch):
+    """Товар, добавленный посреди поиска без блокировки, попадает в результат повтора."""
+    top = search.top
+    added = []
+
+    def top_and_add(*args):
+        found = top(*args)
+        if not added:
+            added.append(0)
+            catalog[0] = ("galaxy", None)
+            with index.lock:
+                index.add(0, *catalog[0])
+        return found
+
+    monkeypatch.setattr(search, "top", top_and_add)
+    assert index.search("galaxy", 5) == expected(catalog, CATEGORIES, "galaxy", 5)
+    assert index.search("galaxy", 5)[0] == 0
@@ -0,0 +1,30 @@
+# Параллельные продажи одного товара в одном магазине: остаток не теряет списаний и не уходит
+# в минус. Продаж больше, чем остаток, поэтому часть касс должна получить 409.
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import func, select
+import models
+
+SALES = 300
+STOCK = 200
+CLIENTS = 16
+
+
+def test_concurrent_sales_do_not_oversell(client, db):
+    db.add_all([
+        models.ProductCategory(Name="Категория"),
+        models.Store(Name="Магазин", Address="Адрес"),
+        models.Product(Name="Товар", Price=100, CategoryID=1),
+        models.Inventory(StoreID=1, ProductID=1, Quantity=STOCK),
+        models.Sale(SaleDate=datetime(2024, 1, 1, 10), StoreID=1)
+    ])
+    db.commit()
+    item = {"SaleID": 1, "ProductID": 1, "Quantity": 1, "Price": 100}
+
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        statuses = Counter(pool.map(lambda _: client.post("/sale-items/", json=item).status_code, range(SALES)))
+
+    assert statuses == {200: STOCK, 409: SALES - STOCK}
+    assert db.scalar(select(models.Inventory.Quantity).where(models.Inventory.InventoryID == 1)) == 0
+    assert db.scalar(select(func.sum(models.SaleItem.Quantity))) == STOCK
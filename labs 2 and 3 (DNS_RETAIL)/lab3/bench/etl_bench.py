@@ -0,0 +1,166 @@
+# Бенчмарк ETL по стадиям на синтетических файлах и локальной SQLite.
+# Запуск из каталога lab3:
+#   python -m bench.etl_bench --rows 10000 1000000 [--stages extract transform load end_to_end]
+#                             [--chunk-size N] [--output bench.json] [генератор: --stores ...]
+# Результат — JSON, который удобно сравнивать между коммитами.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from bench import generate
+from bench.stream_bench import peak_rss_mb
+
+STAGES = ["extract", "transform", "load", "end_to_end"]
+
+
+class Timed:
+    """Обёртка над итератором: сколько времени ушло на получение элементов."""
+
+    def __init__(self, items):
+        self.items = iter(items)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self.items)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def run_stage(stage, input_file, chunk_size, workdir):
+    from sqlalchemy import event
+    from db.session import engine
+    from common import migrations
+    from etl.extract import extract
+    from etl.transform import transform
+    from etl.load import load_stream, CHUNK_SIZE
+    from etl.pipeline import run, transform_stream
+
+    chunk_size = chunk_size or CHUNK_SIZE
+    migrations.upgrade(engine)
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    rows = 0
+    start = time.perf_counter()
+
+    if stage == "extract":
+        for chunk in extract(input_file, chunk_size):
+            rows += len(chunk)
+        seconds = time.perf_counter() - start
+
+    elif stage == "transform":
+        seconds = 0.0
+        for chunk in extract(input_file, chunk_size):
+            started = time.perf_counter()
+            transform(chunk)
+            seconds += time.perf_counter() - started
+            rows += len(chunk)
+
+    elif stage == "load":
+        batches = Timed(transform_stream(enumerate(extract(input_file, chunk_size))))
+        for _, valid_data, _ in load_stream(batches):
+            rows += len(valid_data)
+        # Время чтения и проверки не входит в стадию загрузки
+        seconds = time.perf_counter() - start - batches.seconds
+
+    else:
+        success_count, error_count = run(
+            input_file, chunk_size,
+            os.path.join(workdir, "loaded_data.csv"), os.path.join(workdir, "errors.csv")
+        )
+        rows = success_count + error_count
+        seconds = time.perf_counter() - start
+
+    return {
+        "stage": stage,
+        "chunk_size": chunk_size,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(rows / seconds) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "sql_statements": statements
+    }
+
+
+def measure(stage, input_file, chunk_size, workdir):
+    database = os.path.join(workdir, f"{stage}.db")
+    if os.path.exists(database):
+        os.remove(database)
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+    command = [sys.executable, "-m", "bench.etl_bench", "--child", stage,
+               "--input", input_file, "--workdir", workdir]
+    if chunk_size:
+        command += ["--chunk-size", str(chunk_size)]
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    # По умолчанию — etl.load.CHUNK_SIZE; db.* импортируется только в дочернем процессе
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--output")
+    parser.add_argument("--child", choices=STAGES)
+    parser.add_argument("--input")
+    parser.add_argument("--workdir")
+    generate.add_options(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.input, args.chunk_size, args.workdir)))
+        return
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "generator": generate.options(args),
+        "results": []
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            input_file = os.path.join(workdir, f"import_{rows}.csv")
+            generate.generate(input_file, rows, **generate.options(args))
+            for stage in args.stages:
+                result = measure(stage, input_file, args.chunk_size, workdir)
+                result["file_rows"] = rows
+                report["results"].append(result)
+                print(f"{rows:>10} {stage:<11} {result['rows_per_s'] or 0:>10,} rows/s "
+                      f"{result['peak_rss_mb']:>5} MB {result['sql_statements']:>7} SQL", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
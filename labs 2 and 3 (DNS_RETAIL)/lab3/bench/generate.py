@@ -0,0 +1,102 @@
+# Генератор синтетических файлов импорта в формате data/input/products_import.csv.
+# Запуск из каталога lab3: python -m bench.generate out.csv --rows 1000000 [--stores 50 ...]
+import argparse
+import numpy as np
+import pandas as pd
+
+CITIES = ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань",
+          "Нижний Новгород", "Владивосток", "Самара", "Омск", "Ростов-на-Дону"]
+CATEGORIES = ["Смартфоны", "Ноутбуки", "Телевизоры", "Комплектующие", "Мониторы",
+              "Планшеты", "Бытовая техника", "Периферия", "Аудиотехника", "Сетевое оборудование"]
+BRANDS = ["Samsung", "Apple", "ASUS", "Lenovo", "HP", "LG", "Xiaomi", "MSI", "Acer", "Huawei"]
+
+# Какие ошибки встречаются в реальных выгрузках поставщиков
+ERRORS = ["store_name", "product_name", "category", "supplier", "price_text", "price_negative",
+          "quantity_negative"]
+
+# Строк в одном блоке генерации: файлы на 10М строк не держатся в памяти целиком
+BLOCK_SIZE = 100_000
+
+
+def make_frame(rows, stores=20, suppliers=10, categories=8, products=10_000,
+               duplicate_ratio=0.3, error_ratio=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+
+    store_names = np.array([f"ДНС {CITIES[i % len(CITIES)]} – ТЦ №{i + 1}" for i in range(stores)])
+    supplier_names = np.array([f"ООО Поставщик {i + 1}" for i in range(suppliers)])
+    category_names = np.array([CATEGORIES[i % len(CATEGORIES)] + ("" if i < len(CATEGORIES) else f" {i}")
+                               for i in range(categories)])
+    product_names = np.array([f"{BRANDS[i % len(BRANDS)]} Модель {i}" for i in range(products)])
+
+    product = rng.integers(0, products, rows)
+    df = pd.DataFrame({
+        "store_name": store_names[rng.integers(0, stores, rows)],
+        # Категория и поставщик привязаны к товару, как в реальном каталоге
+        "product_name": product_names[product],
+        "category": category_names[product % categories],
+        "price": (product * 37 % 150_000 + 990).astype(object),
+        "quantity": rng.integers(0, 50, rows),
+        "supplier": supplier_names[product % suppliers]
+    })
+
+    # --- дубликаты: копии уже встречавшихся строк ---
+    duplicates = np.flatnonzero(rng.random(rows) < duplicate_ratio)
+    duplicates = duplicates[duplicates > 0]
+    if len(duplicates):
+        sources = (rng.random(len(duplicates)) * duplicates).astype(int)
+        df.iloc[duplicates] = df.iloc[sources].to_numpy()
+
+    # --- ошибочные строки ---
+    broken = np.flatnonzero(rng.random(rows) < error_ratio)
+    kinds = rng.choice(ERRORS, len(broken))
+    for kind in ERRORS:
+        index = df.index[broken[kinds == kind]]
+        if kind == "price_text":
+            df.loc[index, "price"] = "abc"
+        elif kind == "price_negative":
+            df.loc[index, "price"] = -1000
+        elif kind == "quantity_negative":
+            df.loc[index, "quantity"] = -1
+        else:
+            df.loc[index, kind] = ""
+
+    return df
+
+
+def generate(path, rows, block_size=BLOCK_SIZE, seed=0, **options):
+    """Пишет CSV блоками, чтобы генерация 10М строк шла в постоянной памяти."""
+    for number, start in enumerate(range(0, rows, block_size)):
+        block = make_frame(min(block_size, rows - start), seed=seed + number, **options)
+        block.to_csv(path, mode="w" if number == 0 else "a", header=number == 0, index=False)
+    return path
+
+
+def add_options(parser):
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--suppliers", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--error-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def options(args):
+    return {
+        "stores": args.stores,
+        "suppliers": args.suppliers,
+        "categories": args.categories,
+        "products": args.products,
+        "duplicate_ratio": args.duplicate_ratio,
+        "error_ratio": args.error_ratio,
+        "seed": args.seed
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10_000)
+    add_options(parser)
+    args = parser.parse_args()
+    generate(args.path, args.rows, **options(args))
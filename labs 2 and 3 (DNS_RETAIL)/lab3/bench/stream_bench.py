@@ -0,0 +1,64 @@
+# Пиковая память потокового ETL на файлах разного размера (SQLite).
+# Запуск из каталога lab3: python -m bench.stream_bench [rows ...] [--chunk-size N]
+# Что память не растёт с размером файла, проверяет tests/test_stream.py.
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from bench.generate import generate
+
+
+def peak_rss_mb():
+    # ru_maxrss наследуется через exec от родителя, VmHWM — нет
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def child(input_file, chunk_size, workdir):
+    from db.session import engine
+    from common import migrations
+    from etl.pipeline import run
+
+    migrations.upgrade(engine)
+    run(input_file, chunk_size,
+        os.path.join(workdir, "loaded_data.csv"), os.path.join(workdir, "errors.csv"))
+    print(peak_rss_mb())
+
+
+def measure(rows, chunk_size, workdir):
+    input_file = os.path.join(workdir, f"import_{rows}.csv")
+    generate(input_file, rows)
+
+    database = os.path.join(workdir, f"etl_{rows}.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+    result = subprocess.run(
+        [sys.executable, "-m", "bench.stream_bench", "--child", input_file,
+         "--chunk-size", str(chunk_size), "--workdir", workdir],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return int(result.stdout.split()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="*", type=int, default=[20_000, 80_000])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--child")
+    parser.add_argument("--workdir")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.chunk_size, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            for rows in args.rows:
+                print(f"rows: {rows:>10}  chunk: {args.chunk_size}  "
+                      f"peak RSS: {measure(rows, args.chunk_size, workdir)} MB")
@@ -0,0 +1,119 @@
+# Сравнение скорости transform(): построчный iterrows (как было) и векторный.
+# Перед замером — сверка результатов обоих на пограничных значениях (код выхода 1 при расхождении).
+# Запуск из каталога lab3: python -m bench.transform_bench [rows]
+import io
+import math
+import sys
+import time
+import pandas as pd
+from bench.generate import make_frame
+from etl.transform import transform
+
+
+def legacy_transform(df):
+    valid_data = []
+    errors = []
+
+    df["category"] = df["category"].astype(str).str.strip().str.capitalize()
+    df["store_name"] = df["store_name"].astype(str).str.strip()
+    df["product_name"] = df["product_name"].astype(str).str.strip()
+    df["supplier"] = df["supplier"].astype(str).str.strip()
+
+    for idx, row in df.iterrows():
+        try:
+            if not row["store_name"] or row["store_name"] == "nan":
+                raise ValueError("store_name пустой")
+            if not row["product_name"] or row["product_name"] == "nan":
+                raise ValueError("product_name пустой")
+            if not row["category"] or row["category"] == "nan":
+                raise ValueError("category пустая")
+            if not row["supplier"] or row["supplier"] == "nan":
+                raise ValueError("supplier пустой")
+
+            price = float(row["price"])
+            quantity = int(row["quantity"])
+
+            if math.isnan(price) or price <= 0:
+                raise ValueError("Цена некорректна")
+            if quantity < 0:
+                raise ValueError("Количество отрицательное")
+
+            valid_data.append({
+                "store_name": row["store_name"],
+                "product_name": row["product_name"],
+                "category": row["category"],
+                "price": price,
+                "quantity": quantity,
+                "supplier": row["supplier"]
+            })
+        except Exception as e:
+            errors.append({"row": idx, "error": str(e)})
+
+    return valid_data, errors
+
+
+# Колонка quantity так, как её отдаёт read_csv: текстом, если в ней есть не числа
+TEXT_QUANTITY = ["3", "0", "-1", "abc", "", "2.5", "5.0", "-2.5", "1e3", "\" 7 \"", "+4"]
+# и числами: int() молча обрезал бы 2.5 до 2, новая версия считает это ошибкой
+NUMERIC_QUANTITY = ["3", "2.5", "5.0", "-1.5", ""]
+NOT_INTEGER = {"2.5": "invalid literal for int() with base 10: '2.5'",
+               "-1.5": "invalid literal for int() with base 10: '-1.5'"}
+
+
+def edge_frame(quantities):
+    lines = ["store_name,product_name,category,price,quantity,supplier"]
+    lines += [f"Магазин,Товар {i},Ноутбуки,100,{quantity},Поставщик" for i, quantity in enumerate(quantities)]
+    return pd.read_csv(io.StringIO("\n".join(lines)))
+
+
+def results(df):
+    legacy_valid, legacy_errors = legacy_transform(df.copy())
+    valid, errors = transform(df.copy())
+    legacy = ([(row["product_name"], row["quantity"]) for row in legacy_valid],
+              {error["row"]: error["error"] for error in legacy_errors})
+    new = (list(zip(valid["product_name"], valid["quantity"].tolist())), dict(zip(errors["row"], errors["error"])))
+    return legacy, new
+
+
+def parity():
+    problems = []
+    legacy, new = results(edge_frame(TEXT_QUANTITY))
+    if legacy != new:
+        problems.append(f"текстовая quantity: iterrows {legacy}, векторный {new}")
+
+    # Как iterrows, только дробные строки ушли в ошибки (первым сработавшим правилом)
+    legacy, new = results(edge_frame(NUMERIC_QUANTITY))
+    fractional = {row: NOT_INTEGER[quantity] for row, quantity in enumerate(NUMERIC_QUANTITY) if quantity in NOT_INTEGER}
+    expected = ([(name, quantity) for name, quantity in legacy[0] if int(name.split()[-1]) not in fractional],
+                legacy[1] | fractional)
+    if expected != new:
+        problems.append(f"числовая quantity: ожидалось {expected}, векторный {new}")
+
+    legacy, new = results(make_frame(5000, seed=1))
+    if legacy != new:
+        problems.append("make_frame(5000): результаты расходятся")
+    return problems
+
+
+def measure(func, df):
+    start = time.perf_counter()
+    func(df.copy())
+    return len(df) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    problems = parity()
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("parity: ok")
+
+    df = make_frame(rows)
+
+    before = measure(legacy_transform, df)
+    after = measure(transform, df)
+    print(f"rows: {rows}")
+    print(f"iterrows:   {before:,.0f} rows/s")
+    print(f"vectorized: {after:,.0f} rows/s ({after / before:.1f}x)")
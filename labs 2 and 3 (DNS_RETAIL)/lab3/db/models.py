@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DECIMAL, ForeignKey, Date, DateTime, UniqueConstraint
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -10,8 +10,13 @@ class ProductCategory(Base):
 
 class Product(Base):
     __tablename__ = "Product"
+    __table_args__ = (
+        UniqueConstraint("NameKey", "CategoryID", name="UQ_Product_NameKey_Category"),
+    )
     ProductID = Column(Integer, primary_key=True)
     Name = Column(String(150))
+    # Название без регистра и лишних пробелов, см. etl/dimensions.product_key
+    NameKey = Column(String(300))
     Price = Column(DECIMAL(10,2))
     CategoryID = Column(Integer, ForeignKey("ProductCategory.CategoryID"))
 
@@ -30,6 +35,9 @@ class Supplier(Base):
 
 class Inventory(Base):
     __tablename__ = "Inventory"
+    __table_args__ = (
+        UniqueConstraint("StoreID", "ProductID", name="UQ_Inventory_Store_Product"),
+    )
     InventoryID = Column(Integer, primary_key=True)
     StoreID = Column(Integer, ForeignKey("Store.StoreID"))
     ProductID = Column(Integer, ForeignKey("Product.ProductID"))
@@ -43,3 +51,25 @@ class Supply(Base):
     ProductID = Column(Integer, ForeignKey("Product.ProductID"))
     SupplyDate = Column(Date)
     Quantity = Column(Integer)
+
+
+# Журнал загрузок: какие файлы и чанки уже в БД
+class ImportFile(Base):
+    __tablename__ = "ImportFile"
+    FileHash = Column(String(64), primary_key=True)
+    FileName = Column(String(255))
+    ChunkSize = Column(Integer)
+    Writers = Column(Integer)
+    Status = Column(String(20))
+    StartedAt = Column(DateTime)
+    FinishedAt = Column(DateTime)
+
+
+class ImportChunk(Base):
+    __tablename__ = "ImportChunk"
+    FileHash = Column(String(64), ForeignKey("ImportFile.FileHash"), primary_key=True)
+    ChunkNumber = Column(Integer, primary_key=True)
+    Part = Column(Integer, primary_key=True)
+    RowsHash = Column(String(64))
+    Rows = Column(Integer)
+    LoadedAt = Column(DateTime)
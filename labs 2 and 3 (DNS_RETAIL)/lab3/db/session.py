@@ -1,13 +1,11 @@
-from sqlalchemy import create_engine
+import os
+import sys
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = (
-    "mssql+pyodbc://@MSI\\SQLEXPRESS/DNS_RETAIL"
-    "?driver=ODBC+Driver+17+for+SQL+Server"
-    "&trusted_connection=yes"
-    "&TrustServerCertificate=yes"
-)
+# Общая с lab2 фабрика движков лежит в ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.database import make_engine
 
 
-engine = create_engine(DATABASE_URL, echo=False)
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine)
@@ -0,0 +1,268 @@
+from collections import OrderedDict
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import IntegrityError
+from db.models import ProductCategory, Product, Store, Supplier
+from common.keys import name_key
+
+DEFAULT_STORE_ADDRESS = "Адрес не указан"
+
+# Сколько раз повторять вставку при гонке с другим запуском ETL
+INSERT_ATTEMPTS = 3
+
+# SQL Server принимает не больше 2100 параметров в запросе
+IN_BATCH_SIZE = 1000
+
+
+def batches(names):
+    names = sorted(names)
+    for start in range(0, len(names), IN_BATCH_SIZE):
+        yield names[start:start + IN_BATCH_SIZE]
+
+
+class DimensionCache:
+    """Кэш справочника: натуральный ключ (Name) -> суррогатный ID."""
+
+    def __init__(self, model, maxsize=None, **defaults):
+        self.model = model
+        self.key = model.__mapper__.primary_key[0]
+        self.maxsize = maxsize
+        self.defaults = defaults
+        self.ids = OrderedDict()
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    def remember(self, name, id_):
+        self.ids[name] = id_
+        self.ids.move_to_end(name)
+        if self.maxsize is not None and len(self.ids) > self.maxsize:
+            self.ids.popitem(last=False)
+
+    def clear(self):
+        self.ids.clear()
+        self.warmed = False
+
+    def warm(self, db):
+        self.clear()
+        query = select(self.model.Name, self.key)
+        if self.maxsize is not None:
+            query = query.limit(self.maxsize)
+
+        for name, id_ in db.execute(query):
+            self.remember(name, id_)
+        self.queries += 1
+        self.warmed = True
+
+    def select(self, db, names):
+        found = {}
+        for batch in batches(names):
+            self.queries += 1
+            found.update(db.execute(
+                select(self.model.Name, self.key).where(self.model.Name.in_(batch))
+            ).all())
+        return found
+
+    def insert(self, db, names):
+        found = {}
+        pending = list(names)
+        error = None
+
+        for _ in range(INSERT_ATTEMPTS):
+            try:
+                with db.begin_nested():
+                    self.queries += 1
+                    db.execute(insert(self.model), [{"Name": name, **self.defaults} for name in pending])
+                error = None
+            except IntegrityError as e:
+                # Другой запуск успел вставить то же имя — перечитываем
+                error = e
+
+            selected = self.select(db, pending)
+            if error is not None and not selected:
+                # Ни одного из имён в таблице нет: ошибка не из-за гонки (NOT NULL, внешний ключ...)
+                raise error
+            found.update(selected)
+            pending = [name for name in pending if name not in found]
+            if not pending:
+                return found
+
+        if error is not None:
+            raise error
+        raise RuntimeError(f"{self.model.__tablename__}: не удалось вставить {pending}")
+
+    def resolve(self, db, names):
+        """Возвращает {Name: ID}, недостающие записи вставляются пачкой."""
+        if not self.warmed:
+            self.warm(db)
+
+        ids = {}
+        missing = set()
+        for name in set(names):
+            if name in self.ids:
+                self.ids.move_to_end(name)
+                ids[name] = self.ids[name]
+                self.hits += 1
+            else:
+                missing.add(name)
+                self.misses += 1
+
+        if missing:
+            # Имя могло быть вытеснено из LRU или добавлено другим запуском
+            found = self.select(db, missing)
+            new = sorted(missing - found.keys())
+            if new:
+                found.update(self.insert(db, new))
+
+            for name, id_ in found.items():
+                self.remember(name, id_)
+            ids.update(found)
+
+        return ids
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "queries": self.queries,
+            "size": len(self.ids)
+        }
+
+
+def product_key(name, category_id):
+    # Регистр и лишние пробелы в названии не делают товар новым; в БД это Product.NameKey
+    return name_key(name), category_id
+
+
+class ProductIndex:
+    """Индекс товаров по натуральному ключу (название, категория) -> (ProductID, Price)."""
+
+    def __init__(self):
+        self.products = {}
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+        self.price_updates = 0
+
+    def clear(self):
+        self.products.clear()
+        self.warmed = False
+
+    def remember(self, rows):
+        for product_id, key, category_id, price in rows:
+            self.products[key, category_id] = (product_id, float(price))
+
+    def warm(self, db):
+        self.clear()
+        self.remember(db.execute(select(Product.ProductID, Product.NameKey, Product.CategoryID, Product.Price)))
+        self.queries += 1
+        self.warmed = True
+
+    def select(self, db, name_keys):
+        # По NameKey: тот же товар другой загрузки мог прийти с другим регистром и пробелами
+        for batch in batches(name_keys):
+            self.queries += 1
+            self.remember(db.execute(
+                select(Product.ProductID, Product.NameKey, Product.CategoryID, Product.Price)
+                .where(Product.NameKey.in_(batch))
+            ))
+
+    def insert(self, db, incoming):
+        pending = dict(incoming)
+        error = None
+
+        for _ in range(INSERT_ATTEMPTS):
+            try:
+                with db.begin_nested():
+                    self.queries += 1
+                    db.execute(insert(Product), [
+                        {"Name": name, "NameKey": key[0], "Price": price, "CategoryID": key[1]}
+                        for key, (name, price) in pending.items()
+                    ])
+                error = None
+            except IntegrityError as e:
+                # Другой запуск успел вставить тот же товар — перечитываем
+                error = e
+
+            self.select(db, {key[0] for key in pending})
+            left = {key: value for key, value in pending.items() if key not in self.products}
+            if error is not None and len(left) == len(pending):
+                # Ни один из товаров не нашёлся: ошибка не из-за гонки
+                raise error
+            pending = left
+            if not pending:
+                return
+
+        if error is not None:
+            raise error
+        raise RuntimeError(f"Product: не удалось вставить {list(pending)}")
+
+    def resolve(self, db, names, category_ids, prices):
+        """Возвращает ProductID для каждой строки; новые товары и новые цены пишутся пачкой."""
+        if not self.warmed:
+            self.warm(db)
+
+        keys = [product_key(name, category_id) for name, category_id in zip(names, category_ids)]
+
+        # Последняя цена в чанке — актуальная
+        incoming = {}
+        for key, name, price in zip(keys, names, prices):
+            incoming[key] = (incoming.get(key, (name,))[0], round(float(price), 2))
+
+        missing = {key: value for key, value in incoming.items() if key not in self.products}
+        self.hits += len(incoming) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            self.select(db, {key[0] for key in missing})
+            missing = {key: value for key, value in missing.items() if key not in self.products}
+            if missing:
+                self.insert(db, missing)
+
+        changed = {
+            key: price for key, (_, price) in incoming.items()
+            if self.products[key][1] != price
+        }
+        if changed:
+            self.queries += 1
+            self.price_updates += len(changed)
+            db.execute(update(Product), [
+                {"ProductID": self.products[key][0], "Price": price}
+                for key, price in changed.items()
+            ])
+            for key, price in changed.items():
+                self.products[key] = (self.products[key][0], price)
+
+        return [self.products[key][0] for key in keys]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "queries": self.queries,
+            "price_updates": self.price_updates,
+            "size": len(self.products)
+        }
+
+
+stores = DimensionCache(Store, Address=DEFAULT_STORE_ADDRESS)
+categories = DimensionCache(ProductCategory)
+suppliers = DimensionCache(Supplier)
+
+products = ProductIndex()
+
+CACHES = {"store": stores, "category": categories, "supplier": suppliers, "product": products}
+
+
+def warm(db):
+    for cache in CACHES.values():
+        cache.warm(db)
+
+
+def clear():
+    for cache in CACHES.values():
+        cache.clear()
+
+
+def stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
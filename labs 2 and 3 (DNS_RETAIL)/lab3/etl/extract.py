@@ -1,7 +1,11 @@
+from typing import Iterator, Optional, Union
 import pandas as pd
 from utils.logger import logger
 
-def extract(file_path: str) -> pd.DataFrame:
+def extract(file_path: str, chunk_size: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
     logger.info(f"Extract: чтение файла {file_path}")
-    df = pd.read_csv(file_path)
-    return df
+    if chunk_size is None:
+        return pd.read_csv(file_path)
+
+    # Индекс строк сквозной, поэтому номера строк в errors.csv не меняются
+    return pd.read_csv(file_path, chunksize=chunk_size)
@@ -0,0 +1,65 @@
+import pandas as pd
+from sqlalchemy import Table, Column, Integer, MetaData, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from db.models import Inventory
+
+# Временная таблица SQL Server (#) живёт до конца соединения
+staging = Table(
+    "#InventoryStaging", MetaData(),
+    Column("StoreID", Integer, nullable=False),
+    Column("ProductID", Integer, nullable=False),
+    Column("Quantity", Integer, nullable=False)
+)
+
+MERGE_SQL = text("""
+MERGE [Inventory] WITH (HOLDLOCK) AS target
+USING [#InventoryStaging] AS source
+    ON target.StoreID = source.StoreID AND target.ProductID = source.ProductID
+WHEN MATCHED THEN
+    UPDATE SET Quantity = target.Quantity + source.Quantity
+WHEN NOT MATCHED THEN
+    INSERT (StoreID, ProductID, Quantity)
+    VALUES (source.StoreID, source.ProductID, source.Quantity);
+""")
+
+ON_CONFLICT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert
+}
+
+
+def aggregate(store_ids, product_ids, quantities):
+    """Сумма Quantity по паре (StoreID, ProductID) внутри чанка."""
+    df = pd.DataFrame({"StoreID": store_ids, "ProductID": product_ids, "Quantity": quantities})
+    df = df.groupby(["StoreID", "ProductID"], as_index=False, sort=True)["Quantity"].sum()
+    return df.astype(int).to_dict("records")
+
+
+def merge(db, rows):
+    connection = db.connection()
+    staging.create(connection, checkfirst=True)
+    connection.execute(insert(staging), rows)
+    connection.execute(MERGE_SQL)
+    connection.execute(text("TRUNCATE TABLE [#InventoryStaging]"))
+
+
+def insert_on_conflict(db, rows):
+    upsert = ON_CONFLICT_INSERTS[db.get_bind().dialect.name](Inventory)
+    db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[Inventory.StoreID, Inventory.ProductID],
+            set_={"Quantity": Inventory.Quantity + upsert.excluded.Quantity}
+        ),
+        rows
+    )
+
+
+def upsert(db, store_ids, product_ids, quantities):
+    rows = aggregate(store_ids, product_ids, quantities)
+    if not rows:
+        return
+
+    if db.get_bind().dialect.name == "mssql":
+        merge(db, rows)
+    else:
+        insert_on_conflict(db, rows)
@@ -0,0 +1,117 @@
+import hashlib
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select, update
+from db.models import ImportFile, ImportChunk
+from utils.logger import logger
+
+RUNNING = "running"
+DONE = "done"
+
+
+class ImportInterrupted(Exception):
+    pass
+
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def rows_hash(valid_data):
+    # Хэш каждой строки считается векторно, затем они сворачиваются в один
+    hashes = pd.util.hash_pandas_object(valid_data, index=True).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+class ImportRun:
+    """Состояние загрузки одного файла: какие части чанков уже закоммичены."""
+
+    def __init__(self, file_hash, chunk_size, writers, done=None):
+        self.file_hash = file_hash
+        self.chunk_size = chunk_size
+        self.writers = writers
+        # {(ChunkNumber, Part): RowsHash} уже закоммиченных частей
+        self.done = done or {}
+
+    def is_done(self, number, part=None):
+        parts = range(self.writers) if part is None else [part]
+        return all((number, p) in self.done for p in parts)
+
+    def verify(self, number, parts):
+        """Сверяет уже загруженные части чанка с RowsHash; True — чанк загружен целиком."""
+        for part, valid_data in enumerate(parts):
+            loaded = self.done.get((number, part))
+            # Файл тот же (FileHash), значит, строки иначе прошли проверку или разбиение по писателям
+            if loaded is not None and rows_hash(valid_data) != loaded:
+                raise ImportInterrupted(
+                    f"Чанк {number}, часть {part}: строки не совпадают с загруженными прерванным запуском, "
+                    f"продолжать нельзя — загрузите файл заново"
+                )
+        return self.is_done(number)
+
+    def record(self, db, number, part, valid_data):
+        """Пишет отметку о части чанка в той же транзакции, что и сами данные."""
+        db.add(ImportChunk(
+            FileHash=self.file_hash,
+            ChunkNumber=number,
+            Part=part,
+            RowsHash=rows_hash(valid_data),
+            Rows=len(valid_data),
+            LoadedAt=datetime.now()
+        ))
+
+
+def start(session_factory, input_file, chunk_size, writers=1, resume=False):
+    """Регистрирует загрузку файла. None — файл уже загружен целиком."""
+    hash_ = file_hash(input_file)
+
+    with session_factory() as db:
+        imported = db.get(ImportFile, hash_)
+
+        if imported is None:
+            db.add(ImportFile(
+                FileHash=hash_, FileName=input_file, ChunkSize=chunk_size,
+                Writers=writers, Status=RUNNING, StartedAt=datetime.now()
+            ))
+            db.commit()
+            return ImportRun(hash_, chunk_size, writers)
+
+        if imported.Status == DONE:
+            logger.info(f"Import: файл {input_file} уже загружен {imported.FinishedAt}, пропуск")
+            return None
+
+        if not resume:
+            raise ImportInterrupted(
+                f"Загрузка {input_file} прервана {imported.StartedAt}, запустите с --resume"
+            )
+
+        # Разбиение строк по писателям должно совпадать с прерванным запуском
+        if imported.Writers != writers:
+            raise ImportInterrupted(
+                f"Загрузка {input_file} начата с --writers {imported.Writers}, продолжите с ним же"
+            )
+
+        done = {
+            (number, part): hash_
+            for number, part, hash_ in db.execute(
+                select(ImportChunk.ChunkNumber, ImportChunk.Part, ImportChunk.RowsHash)
+                .where(ImportChunk.FileHash == imported.FileHash)
+            )
+        }
+        logger.info(f"Import: продолжение {input_file}, готово частей чанков: {len(done)}")
+        # Размер чанка берётся из прерванного запуска, чтобы совпала нумерация
+        return ImportRun(imported.FileHash, imported.ChunkSize, imported.Writers, done)
+
+
+def finish(session_factory, run):
+    with session_factory() as db:
+        db.execute(
+            update(ImportFile)
+            .where(ImportFile.FileHash == run.file_hash)
+            .values(Status=DONE, FinishedAt=datetime.now())
+        )
+        db.commit()
@@ -1,105 +1,89 @@
 from datetime import date
-from sqlalchemy.exc import IntegrityError
+from itertools import islice
+import pandas as pd
+from sqlalchemy import insert
 from db.session import SessionLocal
-from db.models import (
-    ProductCategory, Product, Store,
-    Inventory, Supplier, Supply
-)
-
-def get_or_create(db, model, **kwargs):
-    with db.no_autoflush:
-        obj = db.query(model).filter_by(**kwargs).first()
-        if obj:
-            return obj
-
-        obj = model(**kwargs)
-        db.add(obj)
-        db.commit()
-        db.refresh(obj)
-        return obj
-
-
-def load(data):
-    db = SessionLocal()
-
-    for row in data:
-        category = db.query(ProductCategory) \
-            .filter_by(Name=row["category"]) \
-            .first()
-
-        if not category:
-            category = ProductCategory(Name=row["category"])
-            db.add(category)
+from db.models import Supply
+from etl import dimensions, inventory
+from utils.logger import logger
+
+# Сколько строк CSV обрабатывается и коммитится за один раз
+CHUNK_SIZE = 1000
+
+
+def chunked(rows, size):
+    if isinstance(rows, pd.DataFrame):
+        for start in range(0, len(rows), size):
+            yield rows.iloc[start:start + size].to_dict("records")
+        return
+
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def load_chunk(db, rows):
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.to_dict("records")
+
+    # --- Справочники ---
+    stores = dimensions.stores.resolve(db, (row["store_name"] for row in rows))
+    categories = dimensions.categories.resolve(db, (row["category"] for row in rows))
+    suppliers = dimensions.suppliers.resolve(db, (row["supplier"] for row in rows))
+
+    # --- Product ---
+    product_ids = dimensions.products.resolve(
+        db,
+        [row["product_name"] for row in rows],
+        [categories[row["category"]] for row in rows],
+        [row["price"] for row in rows]
+    )
+
+    # --- Inventory (UPSERT) ---
+    inventory.upsert(
+        db,
+        [stores[row["store_name"]] for row in rows],
+        product_ids,
+        [row["quantity"] for row in rows]
+    )
+
+    # --- Supply ---
+    db.execute(insert(Supply), [
+        {
+            "SupplierID": suppliers[row["supplier"]],
+            "ProductID": product_id,
+            "SupplyDate": date.today(),
+            "Quantity": row["quantity"]
+        }
+        for row, product_id in zip(rows, product_ids)
+    ])
+
+
+def load_stream(batches, session_factory=SessionLocal, run=None, part=0):
+    """Загружает каждый (number, valid_data, errors) и отдаёт его дальше после коммита."""
+    db = session_factory()
+
+    try:
+        dimensions.warm(db)
+        for number, valid_data, errors in batches:
+            if len(valid_data):
+                load_chunk(db, valid_data)
+            if run is not None:
+                run.record(db, number, part, valid_data)
             db.commit()
-            db.refresh(category)
-
-        product = Product(
-            Name=row["product_name"],
-            Price=row["price"],
-            CategoryID=category.CategoryID
-        )
-        db.add(product)
-
-
-
-
-        # --- Store ---
-        store = get_or_create(
-            db,
-            Store,
-            Name=row["store_name"],
-            Address="Адрес не указан"
-        )
-
-        # --- Category ---
-        category = get_or_create(
-            db,
-            ProductCategory,
-            Name=row["category"]
-        )
-
-        # --- Supplier ---
-        supplier = get_or_create(
-            db,
-            Supplier,
-            Name=row["supplier"]
-        )
-
-        # --- Product ---
-        product = Product(
-            Name=row["product_name"],
-            Price=row["price"],
-            CategoryID=category.CategoryID
-        )
-        db.add(product)
-        db.commit()
-        db.refresh(product)
-
-        # --- Inventory (UPSERT) ---
-        inventory = db.query(Inventory).filter_by(
-            StoreID=store.StoreID,
-            ProductID=product.ProductID
-        ).first()
-
-        if inventory:
-            inventory.Quantity += row["quantity"]
-        else:
-            inventory = Inventory(
-                StoreID=store.StoreID,
-                ProductID=product.ProductID,
-                Quantity=row["quantity"]
-            )
-            db.add(inventory)
-
-        # --- Supply ---
-        supply = Supply(
-            SupplierID=supplier.SupplierID,
-            ProductID=product.ProductID,
-            SupplyDate=date.today(),
-            Quantity=row["quantity"]
-        )
-        db.add(supply)
-
-        db.commit()
-
-    db.close()
+            yield number, valid_data, errors
+    except Exception:
+        # ID из откаченной транзакции не должны остаться в кэше
+        db.rollback()
+        dimensions.clear()
+        raise
+    finally:
+        db.close()
+
+    logger.info(f"Load: кэш справочников {dimensions.stats()}")
+
+
+def load(data, chunk_size=CHUNK_SIZE, session_factory=SessionLocal):
+    batches = ((number, rows, None) for number, rows in enumerate(chunked(data, chunk_size)))
+    for _ in load_stream(batches, session_factory):
+        pass
@@ -0,0 +1,200 @@
+import multiprocessing as mp
+import os
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from etl.extract import extract
+from etl.transform import transform
+from etl.load import load_stream, CHUNK_SIZE
+from etl.pipeline import write_outputs, count_rows, count_transformed, LOADED_FILE, ERRORS_FILE
+from etl import ledger
+from db.session import SessionLocal, engine
+from utils.metrics import metrics
+
+# Сколько чанков может ждать в очереди одного писателя
+QUEUE_SIZE = 4
+
+
+def receive(chunks):
+    # None в очереди — конец данных
+    while (item := chunks.get()) is not None:
+        number, valid_data = item
+        yield number, valid_data, None
+
+
+def write_worker(chunks, commits, reports, run, part):
+    # Процесс создан fork: пул движка — копия родительского, и его соединения (тот же
+    # сеанс на сервере) остаются родителю. close=False — не закрывать их отсюда.
+    engine.dispose(close=False)
+    # Слушатели SQL, унаследованные от родителя, заменяем своими
+    metrics.uninstrument(engine)
+    metrics.reset()
+    metrics.instrument(engine)
+    for number, _, _ in metrics.track("load", load_stream(receive(chunks), run=run, part=part), count_rows):
+        commits.put((number, part))
+    reports.put(metrics.report())
+
+
+def transform_numbered(item):
+    number, chunk = item
+    valid_data, errors = transform(chunk)
+    return number, valid_data, errors
+
+
+def ordered_map(pool, func, items, window):
+    """pool.map с ограниченным числом задач в работе и исходным порядком результатов."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+def put(chunks, writer, item):
+    # Блокируемся, пока писатель не освободит место, но не ждём умерший процесс
+    while True:
+        try:
+            chunks.put(item, timeout=1)
+            return
+        except queue.Full:
+            if not writer.is_alive():
+                raise RuntimeError(f"Load: писатель {writer.name} завершился с кодом {writer.exitcode}")
+
+
+def partition(valid_data, count):
+    """Делит строки между писателями по store_name, чтобы их Inventory не пересекались."""
+    if count == 1:
+        return [valid_data]
+
+    keys = pd.util.hash_pandas_object(valid_data["store_name"], index=False) % count
+    return [valid_data[keys == number] for number in range(count)]
+
+
+def close(queues, writers):
+    for chunks, writer in zip(queues, writers):
+        if writer.is_alive():
+            put(chunks, writer, None)
+        else:
+            # Иначе выход зависнет на недоставленных в очередь чанках
+            chunks.cancel_join_thread()
+
+
+def mark_commit(waiting, commits, timeout=None):
+    """Снимает с чанка из waiting одну закоммиченную часть; False — сообщений нет."""
+    try:
+        number, part = commits.get(timeout=timeout) if timeout else commits.get_nowait()
+    except queue.Empty:
+        return False
+    for item in waiting:
+        if item[0] == number:
+            item[3].discard(part)
+            break
+    return True
+
+
+def committed(waiting):
+    """Чанки из начала waiting, все части которых закоммичены, в исходном порядке."""
+    while waiting and not waiting[0][3]:
+        number, valid_data, errors, _ = waiting.popleft()
+        yield number, valid_data, errors
+
+
+def dispatch(batches, queues, writers, run, commits):
+    # Чанк идёт дальше, в loaded_data.csv, только когда все его части закоммичены: иначе после
+    # падения писателя и --resume его строки попали бы в файл дважды
+    waiting = deque()
+    try:
+        for number, valid_data, errors in batches:
+            parts = partition(valid_data, len(queues))
+            # Загруженные при --resume части сверяются с журналом, целиком загруженный чанк пропускается
+            if run.verify(number, parts):
+                continue
+            left = set()
+            # Пустые части тоже отправляются: писатель отмечает их в журнале загрузок
+            for part, (chunks, writer, rows) in enumerate(zip(queues, writers, parts)):
+                if not run.is_done(number, part):
+                    put(chunks, writer, (number, rows))
+                    left.add(part)
+            waiting.append((number, valid_data, errors, left))
+            while mark_commit(waiting, commits):
+                pass
+            yield from committed(waiting)
+
+        close(queues, writers)
+        while waiting:
+            if not mark_commit(waiting, commits, timeout=1):
+                # Части умершего писателя уже не придут
+                dead = {writers[part].name for *_, left in waiting for part in left if not writers[part].is_alive()}
+                if dead:
+                    raise RuntimeError(f"Load: {', '.join(sorted(dead))} завершился, не закоммитив все чанки")
+            yield from committed(waiting)
+    except Exception:
+        # Закоммиченные до ошибки чанки всё равно пишутся в файл: при --resume их пропустят.
+        # Писатели дорабатывают свои очереди; их сообщения читаются, пока они не выйдут
+        close(queues, writers)
+        while any(writer.is_alive() for writer in writers):
+            mark_commit(waiting, commits, timeout=0.1)
+        while mark_commit(waiting, commits):
+            pass
+        for number, valid_data, errors, left in waiting:
+            if not left:
+                yield number, valid_data, errors
+        raise
+
+
+def run_parallel(input_file, chunk_size=CHUNK_SIZE, workers=None, writers=1,
+                 loaded_file=LOADED_FILE, errors_file=ERRORS_FILE, resume=False):
+    metrics.reset()
+    metrics.instrument(engine)
+
+    with metrics.stage("ledger"):
+        import_run = ledger.start(SessionLocal, input_file, chunk_size, writers, resume)
+    if import_run is None:
+        return 0, 0
+
+    workers = workers or os.cpu_count()
+    queues = [mp.Queue(maxsize=QUEUE_SIZE) for _ in range(writers)]
+    # (ChunkNumber, Part) после коммита и отчёты с метриками от писателей
+    commits = mp.Queue()
+    reports = mp.Queue()
+    processes = [
+        mp.Process(target=write_worker, args=(chunks, commits, reports, import_run, part),
+                   name=f"etl-writer-{part}")
+        for part, chunks in enumerate(queues)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            chunks = metrics.track("extract", enumerate(extract(input_file, import_run.chunk_size)), count_rows)
+            # Для transform это время ожидания результатов пула, а не CPU процессов
+            batches = metrics.track(
+                "transform", ordered_map(pool, transform_numbered, chunks, workers * 2), count_transformed
+            )
+            batches = metrics.track("dispatch", dispatch(batches, queues, processes, import_run, commits))
+            with metrics.stage("write"):
+                counts = write_outputs(batches, loaded_file, errors_file, append=bool(import_run.done))
+    except BaseException:
+        # При обычном завершении очереди закрывает dispatch
+        close(queues, processes)
+        raise
+    finally:
+        for process in processes:
+            process.join()
+
+        # Метрики стадии load приходят от писателей (отчёт маленький, в буфер канала влезает)
+        for _ in range(sum(process.exitcode == 0 for process in processes)):
+            metrics.merge(reports.get(timeout=5))
+
+    failed = [process.name for process in processes if process.exitcode]
+    if failed:
+        raise RuntimeError(f"Load: ошибка в {', '.join(failed)}, см. etl.log")
+
+    with metrics.stage("ledger"):
+        ledger.finish(SessionLocal, import_run)
+    return counts
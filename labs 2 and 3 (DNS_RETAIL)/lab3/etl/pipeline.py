@@ -0,0 +1,74 @@
+from etl.extract import extract
+from etl.transform import transform
+from etl.load import load_stream, CHUNK_SIZE
+from etl import ledger
+from db.session import SessionLocal, engine
+from common.database import pool_status
+from utils.logger import logger
+from utils.metrics import metrics
+
+LOADED_FILE = "data/output/loaded_data.csv"
+ERRORS_FILE = "data/output/errors.csv"
+
+
+def pending_batches(batches, run):
+    """При --resume уже загруженные чанки сверяются с журналом и дальше не идут."""
+    for number, valid_data, errors in batches:
+        if not run.verify(number, [valid_data]):
+            yield number, valid_data, errors
+
+
+def transform_stream(chunks):
+    for number, chunk in chunks:
+        valid_data, errors = transform(chunk)
+        yield number, valid_data, errors
+
+
+def count_rows(stage, item):
+    rows = len(item[1])
+    stage.rows_in += rows
+    stage.rows_out += rows
+
+
+def count_transformed(stage, item):
+    _, valid_data, errors = item
+    stage.rows_in += len(valid_data) + len(errors)
+    stage.rows_out += len(valid_data)
+    stage.count_errors(errors)
+
+
+def write_outputs(batches, loaded_file=LOADED_FILE, errors_file=ERRORS_FILE, append=False):
+    """Дописывает каждый чанк в loaded_data.csv / errors.csv, возвращает счётчики."""
+    success_count = error_count = 0
+
+    for index, (_, valid_data, errors) in enumerate(batches):
+        mode, header = ("w", True) if index == 0 and not append else ("a", False)
+        valid_data.to_csv(loaded_file, mode=mode, header=header, index=False)
+        errors.to_csv(errors_file, mode=mode, header=header, index=False)
+        success_count += len(valid_data)
+        error_count += len(errors)
+
+    return success_count, error_count
+
+
+def run(input_file, chunk_size=CHUNK_SIZE, loaded_file=LOADED_FILE, errors_file=ERRORS_FILE,
+        resume=False):
+    metrics.reset()
+    metrics.instrument(engine)
+
+    with metrics.stage("ledger"):
+        import_run = ledger.start(SessionLocal, input_file, chunk_size, resume=resume)
+    if import_run is None:
+        return 0, 0
+
+    # Загруженные чанки тоже проходят transform: без него нечего сверять с RowsHash
+    chunks = metrics.track("extract", enumerate(extract(input_file, import_run.chunk_size)), count_rows)
+    batches = metrics.track("transform", transform_stream(chunks), count_transformed)
+    batches = metrics.track("load", load_stream(pending_batches(batches, import_run), run=import_run), count_rows)
+    with metrics.stage("write"):
+        counts = write_outputs(batches, loaded_file, errors_file, append=bool(import_run.done))
+
+    with metrics.stage("ledger"):
+        ledger.finish(SessionLocal, import_run)
+    logger.info(f"Pool: {pool_status(engine)}")
+    return counts
@@ -1,54 +1,97 @@
-import math
+import numpy as np
+import pandas as pd
 from utils.logger import logger
 
+TEXT_COLUMNS = ["store_name", "product_name", "category", "supplier"]
+OUTPUT_COLUMNS = ["store_name", "product_name", "category", "price", "quantity", "supplier"]
+
+EMPTY_MESSAGES = {
+    "store_name": "store_name пустой",
+    "product_name": "product_name пустой",
+    "category": "category пустая",
+    "supplier": "supplier пустой"
+}
+
+# Что принимает int() из строки: знак, цифры и пробелы по краям
+INT_LITERAL = r"\s*[+-]?\d+\s*"
+
+
+def clean_text(column):
+    empty = column.isna()
+    column = column.astype(str).str.strip()
+    return column, empty | (column == "") | (column == "nan")
+
+
+def conversion_message(raw, template):
+    # Текст ошибки как у float()/int(), чтобы errors.csv не менялся
+    return raw.astype(object).map(repr).radd(template)
+
+
+def validate(df):
+    """Возвращает очищенный df и список правил (имя, маска, сообщение) в порядке приоритета."""
+    rules = []
+
+    # --- обязательные поля ---
+    for column in TEXT_COLUMNS:
+        df[column], empty = clean_text(df[column])
+        rules.append((f"{column}_empty", empty, EMPTY_MESSAGES[column]))
+
+    df["category"] = df["category"].str.capitalize()
+
+    # --- числовые поля ---
+    price = pd.to_numeric(df["price"], errors="coerce")
+    quantity = pd.to_numeric(df["quantity"], errors="coerce")
+
+    price_not_numeric = price.isna() & df["price"].notna()
+    quantity_missing = df["quantity"].isna()
+    quantity_not_numeric = quantity.isna() & ~quantity_missing
+    # Дробное количество — ошибка, а не обрезка до целого: 2.5 в числовой колонке,
+    # а в текстовой, как у int(), и "5.0"
+    quantity_not_integer = quantity.notna() & (quantity % 1 != 0)
+    if not pd.api.types.is_numeric_dtype(df["quantity"]):
+        quantity_not_integer |= quantity.notna() & ~df["quantity"].astype(str).str.fullmatch(INT_LITERAL)
+
+    rules += [
+        ("price_not_numeric", price_not_numeric,
+         conversion_message(df["price"][price_not_numeric], "could not convert string to float: ")),
+        ("quantity_missing", quantity_missing, "cannot convert float NaN to integer"),
+        ("quantity_not_numeric", quantity_not_numeric,
+         conversion_message(df["quantity"][quantity_not_numeric], "invalid literal for int() with base 10: ")),
+        ("quantity_not_integer", quantity_not_integer,
+         conversion_message(df["quantity"][quantity_not_integer].astype(str), "invalid literal for int() with base 10: ")),
+        ("price_not_positive", ~price_not_numeric & ~(price > 0), "Цена некорректна"),
+        ("quantity_negative", quantity < 0, "Количество отрицательное")
+    ]
+
+    df["price"] = price.astype(float)
+    df["quantity"] = quantity.fillna(0).astype(np.int64)
+    return df, rules
+
+
 def transform(df):
-    valid_data = []
-    errors = []
-
-    df["category"] = df["category"].astype(str).str.strip().str.capitalize()
-    df["store_name"] = df["store_name"].astype(str).str.strip()
-    df["product_name"] = df["product_name"].astype(str).str.strip()
-    df["supplier"] = df["supplier"].astype(str).str.strip()
-
-    for idx, row in df.iterrows():
-        try:
-            # --- обязательные поля ---
-            if not row["store_name"] or row["store_name"] == "nan":
-                raise ValueError("store_name пустой")
-
-            if not row["product_name"] or row["product_name"] == "nan":
-                raise ValueError("product_name пустой")
-
-            if not row["category"] or row["category"] == "nan":
-                raise ValueError("category пустая")
-
-            if not row["supplier"] or row["supplier"] == "nan":
-                raise ValueError("supplier пустой")
-
-            # --- числовые поля ---
-            price = float(row["price"])
-            quantity = int(row["quantity"])
-
-            if math.isnan(price) or price <= 0:
-                raise ValueError("Цена некорректна")
-
-            if quantity < 0:
-                raise ValueError("Количество отрицательное")
-
-            valid_data.append({
-                "store_name": row["store_name"],
-                "product_name": row["product_name"],
-                "category": row["category"],
-                "price": price,
-                "quantity": quantity,
-                "supplier": row["supplier"]
-            })
-
-        except Exception as e:
-            logger.error(f"Transform error (row {idx}): {e}")
-            errors.append({
-                "row": idx,
-                "error": str(e)
-            })
+    df, rules = validate(df)
+
+    invalid = np.zeros(len(df), dtype=bool)
+    error = pd.Series(None, index=df.index, dtype=object)
+    failed_rules = pd.Series("", index=df.index, dtype=object)
+
+    # Сообщение берётся у первого сработавшего правила, как раньше
+    for name, mask, message in reversed(rules):
+        mask = mask.to_numpy()
+        invalid |= mask
+        error = error.mask(mask, message)
+        failed_rules = failed_rules.mask(mask, name + ";" + failed_rules)
+
+    valid_data = df.loc[~invalid, OUTPUT_COLUMNS]
+    errors = pd.DataFrame({
+        "row": df.index[invalid],
+        "error": error[invalid].to_numpy(),
+        "rules": failed_rules[invalid].str.rstrip(";").to_numpy()
+    })
+
+    for name, mask, _ in rules:
+        count = int(mask.sum())
+        if count:
+            logger.error(f"Transform error ({name}): {count} строк")
 
     return valid_data, errors
@@ -1,17 +1,66 @@
-from etl.extract import extract
-from etl.transform import transform
-from etl.load import load
-from visualize import visualize
-import pandas as pd
+# Точка входа ETL: python main.py [input_file] [--workers N] ...
+# pandas, SQLAlchemy и matplotlib импортируются в main() после разбора аргументов:
+# --help и процессы multiprocessing, которые заново импортируют этот модуль, их не грузят.
+import argparse
+import sys
+from utils.metrics import REPORT_FILE, PROMETHEUS_FILE
 
 INPUT_FILE = "data/input/products_import.csv"
 
-df = extract(INPUT_FILE)
-valid_data, errors = transform(df)
 
-load(valid_data)
+def main():
+    parser = argparse.ArgumentParser(description="ETL загрузка товаров DNS_RETAIL")
+    parser.add_argument("input_file", nargs="?", default=INPUT_FILE)
+    parser.add_argument("--chunk-size", type=int,
+                        help="сколько строк CSV читать, проверять и загружать за раз (CHUNK_SIZE из etl/load.py)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="процессов для transform (0 — без распараллеливания)")
+    parser.add_argument("--writers", type=int, default=1,
+                        help="процессов загрузки в БД в параллельном режиме")
+    parser.add_argument("--resume", action="store_true",
+                        help="продолжить прерванную загрузку с последнего закоммиченного чанка")
+    parser.add_argument("--report", default=REPORT_FILE,
+                        help="JSON отчёт о запуске по стадиям")
+    parser.add_argument("--metrics-file", default=PROMETHEUS_FILE,
+                        help="метрики в формате Prometheus textfile")
+    parser.add_argument("--plot", action="store_true",
+                        help="показать график успешных и ошибочных строк (нужен matplotlib)")
+    args = parser.parse_args()
 
-pd.DataFrame(valid_data).to_csv("data/output/loaded_data.csv", index=False)
-pd.DataFrame(errors).to_csv("data/output/errors.csv", index=False)
+    from db.session import engine
+    from etl.ledger import ImportInterrupted
+    from etl.load import CHUNK_SIZE
+    from utils.logger import logger
+    from utils.metrics import metrics
+    from common import migrations
+    from common.database import env_bool
 
-visualize(len(valid_data), len(errors))
+    chunk_size = args.chunk_size or CHUNK_SIZE
+
+    # Та же схема, что у API; DB_MIGRATE=0 — обновляется отдельно (python -m common.migrations)
+    if env_bool("DB_MIGRATE", True):
+        migrations.upgrade(engine)
+
+    try:
+        if args.workers:
+            from etl.parallel import run_parallel
+            success_count, error_count = run_parallel(
+                args.input_file, chunk_size, args.workers, args.writers, resume=args.resume
+            )
+        else:
+            from etl.pipeline import run
+            success_count, error_count = run(args.input_file, chunk_size, resume=args.resume)
+    except ImportInterrupted as e:
+        # Прерванная загрузка: нужен --resume, другой --writers или загрузка заново — не ошибка кода
+        logger.error(f"Import: {e}")
+        sys.exit(f"Загрузка не выполнена: {e}")
+
+    metrics.save(args.report, args.metrics_file)
+    print(f"Загружено строк: {success_count}, с ошибками: {error_count}")
+    if args.plot:
+        from visualize import visualize
+        visualize(success_count, error_count)
+
+
+if __name__ == "__main__":
+    main()
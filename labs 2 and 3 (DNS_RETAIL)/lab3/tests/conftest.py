@@ -0,0 +1,39 @@
+# Тесты ETL на временной SQLite со схемой из common/migrations.py. Из каталога lab3:
+#   python -m pytest -q tests
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+
+# До импорта db.session: движок создаётся при импорте по DATABASE_URL
+WORKDIR = tempfile.mkdtemp(prefix="dns_retail_etl_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'etl.db')}"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# etl.log пишется в текущий каталог
+os.chdir(WORKDIR)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from db.session import engine
+    from common import migrations
+
+    migrations.upgrade(engine)
+    yield
+    engine.dispose()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def database():
+    """Пустая база; после теста таблицы и кэши справочников очищаются."""
+    from db.session import engine
+    from common import migrations
+    from etl import dimensions
+
+    yield engine
+    with engine.begin() as connection:
+        for table in reversed(migrations.metadata.sorted_tables):
+            connection.execute(table.delete())
+    dimensions.clear()
@@ -0,0 +1,118 @@
+# UPSERT остатков из etl/inventory.py: пара (магазин, товар), встреченная много раз внутри
+# чанка и в нескольких чанках подряд, даёт Quantity = сумме всех количеств.
+# ON CONFLICT DO UPDATE выполняется на SQLite. MERGE для SQL Server здесь не выполнить:
+# его команды перехватываются на mssql-диалекте без подключения, проверяется их SQL, а итог
+# считается по смыслу команд — строки во временной таблице, MERGE с суммой к target, TRUNCATE.
+import re
+from collections import Counter
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_mock_engine, insert, select
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.sql.dml import Insert
+from db.session import SessionLocal
+from db.models import Inventory, Product, ProductCategory, Store
+from etl import inventory
+
+STORES = 3
+PRODUCTS = 3
+REPEATS = 50
+CHUNKS = 4
+# Остаток, который уже был до загрузки: ветка UPDATE, а не INSERT
+INITIAL = {(1, 1): 5}
+
+
+def make_chunks():
+    """Чанки (StoreID, ProductID, Quantity): пара (1, 1) REPEATS раз в каждом, остальные — по разу."""
+    result = []
+    for number in range(CHUNKS):
+        rows = [(1, 1, number + i + 1) for i in range(REPEATS)]
+        rows += [(store, product, number + store + product)
+                 for store in range(1, STORES + 1) for product in range(1, PRODUCTS + 1) if (store, product) != (1, 1)]
+        # Повторы пары не подряд, как в файле
+        result.append(rows[::2] + rows[1::2])
+    return result
+
+
+def expected(chunks):
+    total = Counter(INITIAL)
+    for rows in chunks:
+        for store, product, quantity in rows:
+            total[store, product] += quantity
+    return dict(total)
+
+
+@pytest.fixture
+def seeded(database):
+    with SessionLocal() as db:
+        db.execute(insert(ProductCategory), [{"Name": "Ноутбуки"}])
+        db.execute(insert(Store), [{"Name": f"Магазин {i}", "Address": ""} for i in range(STORES)])
+        db.execute(insert(Product), [{"Name": f"Товар {i}", "NameKey": f"товар {i}", "Price": Decimal(100),
+                                      "CategoryID": 1} for i in range(PRODUCTS)])
+        db.execute(insert(Inventory), [{"StoreID": store, "ProductID": product, "Quantity": quantity}
+                                       for (store, product), quantity in INITIAL.items()])
+        db.commit()
+
+
+def test_on_conflict_sums_quantities(seeded):
+    chunks = make_chunks()
+    # Каждый чанк — своя транзакция, как в load_stream
+    for rows in chunks:
+        with SessionLocal() as db:
+            inventory.upsert(db, *zip(*rows))
+            db.commit()
+
+    with SessionLocal() as db:
+        found = db.execute(select(Inventory.StoreID, Inventory.ProductID, Inventory.Quantity)).all()
+    assert len(found) == len({(store, product) for store, product, _ in found}), "несколько строк на одну пару"
+    assert {(store, product): quantity for store, product, quantity in found} == expected(chunks)
+
+
+class RecordingSession:
+    """Вместо Session для inventory.upsert(): соединение — mock-движок mssql, команды записываются."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def connection(self):
+        return self.engine
+
+    def get_bind(self):
+        return self.engine
+
+
+def test_merge_sums_quantities():
+    chunks = make_chunks()
+    statements = []
+    engine = create_mock_engine("mssql+pyodbc://", lambda sql, *multiparams, **params: statements.append(
+        (sql, multiparams[0] if multiparams else None)
+    ))
+    for rows in chunks:
+        inventory.upsert(RecordingSession(engine), *zip(*rows))
+
+    target, staged = dict(INITIAL), []
+    for sql, parameters in statements:
+        compiled = str(sql.compile(dialect=engine.dialect))
+        if isinstance(sql, CreateTable):
+            assert "CREATE TABLE [#InventoryStaging]" in compiled
+        elif isinstance(sql, Insert):
+            assert compiled.startswith("INSERT INTO [#InventoryStaging]")
+            staged += parameters
+        elif re.match(r"\s*MERGE\b", compiled):
+            text = " ".join(compiled.split())
+            assert "MERGE [Inventory] WITH (HOLDLOCK) AS target USING [#InventoryStaging] AS source" in text
+            assert "ON target.StoreID = source.StoreID AND target.ProductID = source.ProductID" in text
+            assert "WHEN MATCHED THEN UPDATE SET Quantity = target.Quantity + source.Quantity" in text
+            assert ("WHEN NOT MATCHED THEN INSERT (StoreID, ProductID, Quantity) "
+                    "VALUES (source.StoreID, source.ProductID, source.Quantity)") in text
+            keys = [(row["StoreID"], row["ProductID"]) for row in staged]
+            # SQL Server отказывает, если MERGE обновляет одну строку target дважды
+            assert len(keys) == len(set(keys)), "во временной таблице повторяются пары"
+            for row in staged:
+                key = row["StoreID"], row["ProductID"]
+                target[key] = target.get(key, 0) + row["Quantity"]
+        else:
+            assert re.match(r"\s*TRUNCATE TABLE \[#InventoryStaging\]", compiled), compiled
+            staged = []
+    assert not staged, "временная таблица не очищена после чанка"
+    assert target == expected(chunks)
@@ -0,0 +1,99 @@
+# Повторная загрузка того же файла не плодит товары и не меняет цены: названия одного товара
+# отличаются только регистром и пробелами. Второй раз — и с тёплыми кэшами справочников
+# (тот же процесс), и после dimensions.clear() (как новый запуск ETL).
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from db.session import SessionLocal
+from db.models import Product, ProductCategory
+from etl import dimensions
+from etl.dimensions import ProductIndex
+from etl.load import load
+from etl.transform import transform
+
+# (магазин, товар, категория, цена); варианты одного товара разнесены по чанкам
+ROWS = [
+    ("Магазин 1", "Ноутбук Модель 1", "Ноутбуки", 1000),
+    ("Магазин 1", "Смартфон Модель 2", "Смартфоны", 500),
+    ("Магазин 2", "ноутбук модель 1", "Ноутбуки", 1100),
+    ("Магазин 2", "Ноутбук  Модель 1", "Ноутбуки", 1200),
+    ("Магазин 1", " НОУТБУК МОДЕЛЬ 1 ", "Ноутбуки", 1250),
+    ("Магазин 3", "СМАРТФОН\tмодель 2", "Смартфоны", 550),
+    # То же название в другой категории — другой товар
+    ("Магазин 3", "Ноутбук модель 1", "Смартфоны", 900),
+    ("Магазин 2", "Смартфон Модель 2", "Смартфоны", 600),
+    ("Магазин 1", "Планшет Модель 3", "Планшеты", 300)
+]
+
+# Товары после загрузки: (название без регистра и лишних пробелов, категория) -> цена из последней строки
+EXPECTED = {
+    ("ноутбук модель 1", "Ноутбуки"): 1250.0,
+    ("смартфон модель 2", "Смартфоны"): 600.0,
+    ("ноутбук модель 1", "Смартфоны"): 900.0,
+    ("планшет модель 3", "Планшеты"): 300.0
+}
+
+
+def make_frame():
+    return pd.DataFrame({
+        "store_name": [row[0] for row in ROWS],
+        "product_name": [row[1] for row in ROWS],
+        "category": [row[2] for row in ROWS],
+        "price": [row[3] for row in ROWS],
+        "quantity": [1] * len(ROWS),
+        "supplier": ["Поставщик"] * len(ROWS)
+    })
+
+
+def snapshot():
+    with SessionLocal() as db:
+        return db.execute(
+            select(Product.ProductID, Product.Name, ProductCategory.Name, Product.Price)
+            .join(ProductCategory, Product.CategoryID == ProductCategory.CategoryID)
+            .order_by(Product.ProductID)
+        ).all()
+
+
+def test_load_twice_keeps_products(database):
+    valid, _ = transform(make_frame())
+
+    load(valid.copy(), chunk_size=3)
+    first = snapshot()
+    products = {(" ".join(name.split()).casefold(), category): float(price) for _, name, category, price in first}
+    assert len(first) == len(EXPECTED)
+    assert products == EXPECTED
+
+    load(valid.copy(), chunk_size=3)
+    assert snapshot() == first, "повтор с тёплыми кэшами"
+
+    dimensions.clear()
+    load(valid.copy(), chunk_size=3)
+    assert snapshot() == first, "повтор после dimensions.clear()"
+
+
+@pytest.mark.parametrize("other_name", ["Ноутбук  Модель 1", "ноутбук модель 1", " НОУТБУК модель 1 "])
+def test_concurrent_run_finds_product_by_name_key(database, other_name):
+    # Второй запуск ETL не видел товар в кэше и при поиске, вставка упирается в UQ_Product_NameKey_Category
+    first, second = ProductIndex(), ProductIndex()
+    with SessionLocal() as db:
+        category = dimensions.categories.resolve(db, ["Ноутбуки"])["Ноутбуки"]
+        first.warm(db)
+        second.warm(db)
+        [product_id] = first.resolve(db, ["Ноутбук Модель 1"], [category], [1000])
+        db.commit()
+
+    # Поиск второго запуска прошёл до коммита первого: товар находится только после ошибки вставки
+    select_by_key = second.select
+    missed = []
+
+    def select_after_race(db, name_keys):
+        if missed:
+            select_by_key(db, name_keys)
+        missed.append(name_keys)
+
+    second.select = select_after_race
+    with SessionLocal() as db:
+        assert second.resolve(db, [other_name], [category], [1100]) == [product_id]
+        db.commit()
+
+    assert [(row[0], float(row[3])) for row in snapshot()] == [(product_id, 1100.0)]
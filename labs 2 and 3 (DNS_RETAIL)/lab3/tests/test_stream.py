@@ -0,0 +1,28 @@
+# Потоковый ETL: пиковая память не растёт с размером файла (см. bench/stream_bench.py)
+import tracemalloc
+from bench.generate import generate
+from etl.pipeline import run
+
+ROWS = 1000
+CHUNK_SIZE = 250
+# Мало товаров: кэш справочников не растёт вместе с файлом
+PRODUCTS = 200
+
+
+def peak_memory(input_file, output_dir):
+    tracemalloc.start()
+    try:
+        run(input_file, CHUNK_SIZE, str(output_dir / "loaded_data.csv"), str(output_dir / "errors.csv"))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_peak_memory_does_not_grow_with_file(database, tmp_path):
+    small = generate(str(tmp_path / "small.csv"), ROWS, products=PRODUCTS)
+    large = generate(str(tmp_path / "large.csv"), ROWS * 8, products=PRODUCTS, seed=1)
+
+    small_peak = peak_memory(small, tmp_path)
+    large_peak = peak_memory(large, tmp_path)
+    # Рост — от кэшей SQLAlchemy и справочников; файл целиком в памяти дал бы его в 8 раз
+    assert large_peak < small_peak * 3, (small_peak, large_peak)
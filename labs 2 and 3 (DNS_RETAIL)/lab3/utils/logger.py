@@ -1,7 +1,8 @@
 import logging
 
+# delay=True: etl.log открывается при первой записи, а не при импорте модуля
 logging.basicConfig(
-    filename="etl.log",
+    handlers=[logging.FileHandler("etl.log", delay=True)],
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(message)s"
 )
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from utils.logger import logger
+
+REPORT_FILE = "data/output/etl_report.json"
+PROMETHEUS_FILE = "data/output/etl_metrics.prom"
+
+# SQL вне какой-либо стадии (например, прогрев кэшей) попадает сюда
+OTHER_STAGE = "other"
+
+PROMETHEUS_METRICS = [
+    ("seconds", "etl_stage_seconds", "Время в стадии ETL, с"),
+    ("rows_in", "etl_stage_rows_in", "Строк на входе стадии"),
+    ("rows_out", "etl_stage_rows_out", "Строк на выходе стадии"),
+    ("sql_statements", "etl_stage_sql_statements", "SQL запросов в стадии"),
+    ("sql_seconds", "etl_stage_sql_seconds", "Время SQL запросов в стадии, с"),
+    ("commits", "etl_stage_commits", "Коммитов в стадии")
+]
+
+
+class StageMetrics:
+    def __init__(self):
+        self.seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.errors = Counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.commits = 0
+
+    def count_errors(self, errors):
+        if errors is not None and len(errors) and "rules" in errors:
+            self.errors.update(errors["rules"].str.split(";").explode().value_counts().to_dict())
+
+    def as_dict(self):
+        return {
+            "seconds": round(self.seconds, 3),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "errors": dict(self.errors),
+            "sql_statements": self.sql_statements,
+            "sql_seconds": round(self.sql_seconds, 3),
+            "commits": self.commits
+        }
+
+    def merge(self, data):
+        self.seconds += data["seconds"]
+        self.rows_in += data["rows_in"]
+        self.rows_out += data["rows_out"]
+        self.errors.update(data["errors"])
+        self.sql_statements += data["sql_statements"]
+        self.sql_seconds += data["sql_seconds"]
+        self.commits += data["commits"]
+
+
+class RunMetrics:
+    """Метрики одного запуска ETL по стадиям; время делится между стадиями без пересечений."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stages = defaultdict(StageMetrics)
+        self.current = None
+        self.started = time.perf_counter()
+        self.started_at = datetime.now()
+        self.mark = self.started
+
+    def switch(self, stage):
+        now = time.perf_counter()
+        if self.current is not None:
+            self.stages[self.current].seconds += now - self.mark
+        self.mark = now
+        previous, self.current = self.current, stage
+        return previous
+
+    @contextmanager
+    def stage(self, name):
+        previous = self.switch(name)
+        try:
+            yield self.stages[name]
+        finally:
+            self.switch(previous)
+
+    def track(self, name, items, count=None):
+        """Оборачивает генератор стадии: время его next() идёт в стадию name."""
+        items = iter(items)
+        while True:
+            previous = self.switch(name)
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self.switch(previous)
+
+            if count is not None:
+                count(self.stages[name], item)
+            yield item
+
+    # --- SQL через события SQLAlchemy ---
+    def instrument(self, engine):
+        from sqlalchemy import event
+
+        if not event.contains(engine, "before_cursor_execute", self.before_execute):
+            event.listen(engine, "before_cursor_execute", self.before_execute)
+            event.listen(engine, "after_cursor_execute", self.after_execute)
+            event.listen(engine, "commit", self.on_commit)
+
+    def uninstrument(self, engine):
+        from sqlalchemy import event
+
+        if event.contains(engine, "before_cursor_execute", self.before_execute):
+            event.remove(engine, "before_cursor_execute", self.before_execute)
+            event.remove(engine, "after_cursor_execute", self.after_execute)
+            event.remove(engine, "commit", self.on_commit)
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stage = self.stages[self.current or OTHER_STAGE]
+        stage.sql_statements += 1
+        stage.sql_seconds += time.perf_counter() - conn.info["query_start"].pop()
+
+    def on_commit(self, conn):
+        self.stages[self.current or OTHER_STAGE].commits += 1
+
+    # --- отчёты ---
+    def report(self):
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "stages": {name: stage.as_dict() for name, stage in self.stages.items()}
+        }
+
+    def merge(self, report):
+        for name, data in report["stages"].items():
+            self.stages[name].merge(data)
+
+    def write_json(self, path=REPORT_FILE):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path=PROMETHEUS_FILE):
+        report = self.report()
+        lines = []
+        for key, metric, help_ in PROMETHEUS_METRICS:
+            lines += [f"# HELP {metric} {help_}", f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{stage="{name}"}} {data[key]}' for name, data in report["stages"].items()]
+
+        errors = Counter()
+        for data in report["stages"].values():
+            errors.update(data["errors"])
+        lines += ["# HELP etl_errors Строк, не прошедших правило проверки", "# TYPE etl_errors gauge"]
+        lines += [f'etl_errors{{rule="{rule}"}} {count}' for rule, count in sorted(errors.items())]
+
+        lines += [
+            "# HELP etl_run_seconds Длительность запуска ETL, с", "# TYPE etl_run_seconds gauge",
+            f"etl_run_seconds {report['seconds']}",
+            "# HELP etl_run_timestamp_seconds Время окончания запуска ETL", "# TYPE etl_run_timestamp_seconds gauge",
+            f"etl_run_timestamp_seconds {time.time():.0f}"
+        ]
+
+        # node_exporter читает textfile целиком, поэтому пишем атомарно
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
+
+    def save(self, report_file=REPORT_FILE, prometheus_file=PROMETHEUS_FILE):
+        self.write_json(report_file)
+        self.write_prometheus(prometheus_file)
+        for name, stage in self.stages.items():
+            logger.info(f"Metrics: {name} {stage.as_dict()}")
+
+
+metrics = RunMetrics()
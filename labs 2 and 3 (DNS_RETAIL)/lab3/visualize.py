@@ -1,6 +1,7 @@
-import matplotlib.pyplot as plt
-
 def visualize(success_count, error_count):
+    # matplotlib грузится секунды — только когда график запрошен (main.py --plot)
+    import matplotlib.pyplot as plt
+
     labels = ["Успешно", "Ошибки"]
     values = [success_count, error_count]
 